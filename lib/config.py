@@ -27,13 +27,14 @@ This library does the handling and parsing of the configuration of SmartHomeNG.
 :Warning: This library is part of the core of SmartHomeNG. It **should not be called directly** from plugins!
 """
 
+import concurrent.futures
 import copy
 import logging
 import collections
 import keyword
 import os
 
-from lib.utils import Utils
+from lib.utils import Utils, get_mp_context
 import lib.shyaml as shyaml
 from lib.constants import YAML_FILE
 
@@ -72,21 +73,31 @@ def parse_basename(basename, configtype=''):
     return config
 
 
-def parse_itemsdir(itemsdir, item_conf, addfilenames=False, struct_dict: dict | None = None):
+# minimum number of item files to parse them in worker processes
+PARALLEL_MIN_FILES = 16
+
+
+def parse_itemsdir(itemsdir, item_conf, addfilenames=False, struct_dict: dict | None = None, workers=1):
     """
     Load and parse item configurations and merge it to the configuration tree
     The configuration is only specified by the name of the directory.
     At the moment it looks for .yaml files and a .conf files
     Both filetypes are read, even if they have the same basename
 
+    If *workers* is greater than 1, the files are loaded by a pool of worker processes.
+    Merging into the configuration tree is always done in the order of the filenames,
+    so the result is the same as loading the files one after another.
+
     :param itemsdir:      Name of folder containing the configuration files
     :param item_conf:     Optional OrderedDict tree, into which the configuration should be merged
     :param addfilenames:
     :param struct_dict:   dict with all defined structs (from /etc/structs.yaml and from loaded plugins)
+    :param workers:       number of worker processes (0 = number of cpus, 1 = no worker processes)
     :type itemsdir:       str
     :type item_conf:      OrderedDict
     :type addfilenames:
     :type struct_dict:    dict / OrderedDict
+    :type workers:        int
 
     :return: The resulting merged OrderedDict tree
     :rtype: OrderedDict
@@ -94,23 +105,118 @@ def parse_itemsdir(itemsdir, item_conf, addfilenames=False, struct_dict: dict |
     if struct_dict is None:
         struct_dict = {}
     logger.info(f'parse_itemsdir: Beginning to parse items directory {itemsdir}')
+    filenames = []
     for item_file in sorted(os.listdir(itemsdir)):
         if not item_file.startswith('.'):
             if item_file.endswith(YAML_FILE):
                 if item_file == 'logic' + YAML_FILE and itemsdir.find(os.path.join('lib', 'env')) > -1:
                     logger.info(f'parse_itemsdir: skipping logic definition file = {itemsdir + item_file}')
-                else:
-                    try:
-                        item_conf = parse(
-                            itemsdir + item_file, item_conf, addfilenames, parseitems=True, struct_dict=struct_dict
-                        )
-                    except Exception as e:
-                        logger.exception(f'Problem reading {item_file}: {e}')
-                        continue
+                elif os.path.isfile(itemsdir + item_file):
+                    filenames.append(itemsdir + item_file)
+
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(filenames))
+    if workers > 1 and len(filenames) >= PARALLEL_MIN_FILES:
+        loaded = _load_yaml_items_parallel(filenames, addfilenames, workers)
+    else:
+        loaded = ((filename, None) for filename in filenames)
+
+    for filename, result in loaded:
+        try:
+            if result is None:
+                items = load_yaml_items(filename, addfilenames)
+            else:
+                items = _replay_worker_result(result)
+            if item_conf is None:
+                item_conf = collections.OrderedDict()
+            if items is not None:
+                merge_yaml_items(items, filename, item_conf, struct_dict)
+        except Exception as e:
+            logger.exception(f'Problem reading {os.path.basename(filename)}: {e}')
+            continue
     logger.info(f'parse_itemsdir: Finished parsing items directory {itemsdir}')
     return item_conf
 
 
+def _load_yaml_items_parallel(filenames, addfilenames, workers):
+    """
+    Load item files in worker processes
+
+    :return: iterator of (filename, result of _load_yaml_items_worker) in the order of *filenames*
+    """
+    log_level = min(logger.getEffectiveLevel(), logging.getLogger(shyaml.__name__).getEffectiveLevel())
+    logger.info(f'parse_itemsdir: Loading {len(filenames)} files with {workers} worker processes')
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=get_mp_context(),
+        initializer=_init_load_worker,
+        initargs=(log_level, shyaml.get_parse_cache_dir()),
+    ) as executor:
+        futures = [executor.submit(_load_yaml_items_worker, filename, addfilenames) for filename in filenames]
+        for filename, future in zip(filenames, futures):
+            try:
+                yield filename, future.result()
+            except Exception as e:
+                # the worker process died, load the file in this process instead
+                logger.warning(f'parse_itemsdir: Worker could not load {os.path.basename(filename)}: {e}')
+                yield filename, None
+
+
+class _RecordCollector(logging.Handler):
+    """
+    Collects the log records of a worker process, they are logged by the main process
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        # make the record picklable
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        self.records.append(record)
+
+
+_worker_log = None
+
+
+def _init_load_worker(log_level, parse_cache_dir):
+    global _worker_log
+    _worker_log = _RecordCollector()
+    root = logging.getLogger()
+    root.handlers = [_worker_log]
+    root.setLevel(log_level)
+    shyaml.set_parse_cache_dir(parse_cache_dir)
+
+
+def _load_yaml_items_worker(filename, addfilenames):
+    _worker_log.records = []
+    try:
+        items = load_yaml_items(filename, addfilenames)
+    except Exception as e:
+        return None, _worker_log.records, e
+    return items, _worker_log.records, None
+
+
+def _replay_worker_result(result):
+    """
+    Log the records of a worker process and return the loaded items (or raise the exception of the worker)
+    """
+    items, records, error = result
+    for record in records:
+        record_logger = logging.getLogger(record.name)
+        if record_logger.isEnabledFor(record.levelno):
+            record_logger.handle(record)
+    if error is not None:
+        raise error
+    return items
+
+
 def parse(filename, config=None, addfilenames=False, parseitems=False, struct_dict: dict | None = None):
     """
     Load and parse a configuration file and merge it to the configuration tree
@@ -836,6 +942,30 @@ def parse_yaml(filename, config=None, addfilenames=False, parseitems=False, stru
     if config is None:
         config = collections.OrderedDict()
 
+    items = load_yaml_items(filename, addfilenames)
+    if items is not None:
+        if parseitems:
+            merge_yaml_items(items, filename, config, struct_dict)
+        else:
+            # if not parsing items
+            config = merge(items, config, os.path.basename(filename), 'Config-Tree')
+    return config
+
+
+def load_yaml_items(filename, addfilenames=False):
+    """
+    Load a yaml configuration file and remove invalid entries
+
+    This step does not depend on other files, so it can be run for several files in parallel.
+
+    :param filename: Name of the configuration file
+    :param addfilenames: add the name of the file to the items
+    :type filename: str
+    :type addfilenames: bool
+
+    :return: loaded configuration or None
+    :rtype: OrderedDict
+    """
     items = shyaml.yaml_load(filename, ordered=True)
     if items is not None:
         sanitize_items(items, filename)
@@ -843,22 +973,29 @@ def parse_yaml(filename, config=None, addfilenames=False, parseitems=False, stru
         if addfilenames:
             # logger.debug(f"parse_yaml: Add filename = {os.path.basename(filename)} to items")
             _add_filenames_to_config(items, os.path.basename(filename))
+    return items
 
-        if parseitems:
-            # test if file contains 'struct' attribute and merge all items into config
-            # logger.debug(f"parse_yaml: Checking if file {os.path.basename(filename)} contains 'struct' attribute")
 
-            search_for_struct_in_items(items, struct_dict, config, os.path.basename(filename))
+def merge_yaml_items(items, filename, config, struct_dict: dict | None = None):
+    """
+    Merge item definitions loaded by load_yaml_items() into the item tree, resolving structs
 
-            global special_listentry_found
-            if special_listentry_found:
-                remove_special_listentries(config, os.path.basename(filename))
-            special_listentry_found = False
+    :param items: loaded item definitions
+    :param filename: Name of the configuration file
+    :param config: OrderedDict tree, into which the items are merged
+    :param struct_dict: dictionary with stuct definitions (templates) for reading item tree
+    """
+    if struct_dict is None:
+        struct_dict = {}
+    # test if file contains 'struct' attribute and merge all items into config
+    # logger.debug(f"parse_yaml: Checking if file {os.path.basename(filename)} contains 'struct' attribute")
 
-        if not parseitems:
-            # if not parsing items
-            config = merge(items, config, os.path.basename(filename), 'Config-Tree')
-    return config
+    search_for_struct_in_items(items, struct_dict, config, os.path.basename(filename))
+
+    global special_listentry_found
+    if special_listentry_found:
+        remove_special_listentries(config, os.path.basename(filename))
+    special_listentry_found = False
 
 
 def _add_filenames_to_config(items, filename, level=0):
@@ -30,6 +30,10 @@ sh.env.core.scheduler.worker_threads(sh.scheduler.get_worker_count(), logic.lnam
 sh.env.core.scheduler.idle_threads(sh.scheduler.get_idle_worker_count(), logic.lname)
 sh.env.core.scheduler.worker_names(sh.scheduler.get_worker_names(), logic.lname)
 
+# Scheduler: latency and throughput metrics
+for name, value in sh.scheduler.get_metrics_summary().items():
+    sh.env.core.scheduler[name](value, logic.lname)
+
 # Memory
 p = psutil.Process(os.getpid())
 mem_info = p.memory_info()
@@ -67,4 +71,14 @@ if sys.version_info > (3, 3):
 if sh.moon:
     sh.env.location.moonlight(sh.moon.light(), logic.lname)
 
+# Log queue
+log_queue_metrics = sh.logs.get_queue_metrics()
+if log_queue_metrics is not None:
+    for name, value in log_queue_metrics.items():
+        sh.env.core.log_queue[name](value, logic.lname)
 
+# MQTT publish queue
+mqtt = sh.modules.get_module('mqtt')
+if mqtt is not None and hasattr(mqtt, 'get_publish_metrics'):
+    for name, value in mqtt.get_publish_metrics().items():
+        sh.env.core.mqtt[name](value, logic.lname)
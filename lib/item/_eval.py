@@ -42,6 +42,11 @@ run_on_change(item, value, caller, source, dest)
     Runs all on_change entries for the item.
     Replaces Item.__run_on_change().
 
+compile_expressions(item)
+    Compiles eval, trigger_condition, on_change and on_update expressions
+    of the item once, so that the runners above do not have to parse the
+    expression strings on every call.
+
 All functions access only single-underscore attributes and public methods on
 the Item to avoid Python name-mangling problems.  The one exception is calling
 item._update_item() — a thin public proxy that Item exposes for this purpose
@@ -51,6 +56,13 @@ Eval namespace
 --------------
 All eval calls use the explicit namespace built by :func:`_make_eval_env`.
 See its docstring for the full list of names available to user expressions.
+
+Compiled expressions
+--------------------
+Code objects are kept in ``item._eval_code`` keyed by the expression string,
+so changing an expression never runs stale code. Syntax errors found while
+compiling are stored in ``item._eval_compile_errors`` (keyed by the attribute
+name) for display in the admin interface.
 """
 
 import logging
@@ -67,6 +79,45 @@ logger = logging.getLogger(__name__)
 # ---------------------------------------------------------------------------
 
 
+def _build_eval_env_base(item) -> dict:
+    """
+    Build the part of the eval namespace that does not change between calls.
+
+    Called once per item by :func:`_make_eval_env`; the result is stored in
+    ``item._eval_env_base``.
+
+    :param item: ``Item`` instance being evaluated.
+    :returns:    Namespace dict without the trigger call parameters.
+    """
+    import math
+    import time
+    import datetime
+    import lib.userfunctions as uf
+    from lib.item.items import Items
+
+    return {
+        # ── documented public API ──────────────────────────────────────────
+        'sh': item._sh,
+        'shtime': item.shtime,
+        'items': Items.get_instance(),
+        'math': math,
+        'uf': uf,
+        'env': lib.env,
+        # ── trigger call parameters ───────────────────────────────────────
+        'value': None,
+        'caller': None,
+        'source': None,
+        'dest': None,
+        # ── modules documented in official examples ────────────────────────
+        'datetime': datetime,
+        'time': time,
+        # ── item itself (not documented but was accessible before) ─────────
+        'item': item,
+        # ── builtins ──────────────────────────────────────────────────────
+        '__builtins__': __builtins__,
+    }
+
+
 def _make_eval_env(item, value=None, caller=None, source=None, dest=None) -> dict:
     """
     Build the standard eval namespace for item expressions.
@@ -93,6 +144,11 @@ def _make_eval_env(item, value=None, caller=None, source=None, dest=None) -> dic
     * ``dest``   — destination or ``None``
     * ``item``   — the ``Item`` instance itself
 
+    The constant part of the namespace is built once per item (see
+    :func:`_build_eval_env_base`). Every call returns a shallow copy of it, so
+    names assigned by an expression (e.g. with ``:=``) never show up in later
+    evaluations of this or any other item.
+
     :param item:   ``Item`` instance being evaluated.
     :param value:  Current trigger value (``None`` for attribute evals).
     :param caller: Caller label (``None`` for attribute evals).
@@ -100,33 +156,86 @@ def _make_eval_env(item, value=None, caller=None, source=None, dest=None) -> dic
     :param dest:   Destination (``None`` for attribute evals).
     :returns:      Namespace dict suitable for passing to ``eval()``.
     """
-    import math
-    import time
-    import datetime
-    import lib.userfunctions as uf
-    from lib.item.items import Items
+    base = item._eval_env_base
+    if base is None:
+        base = item._eval_env_base = _build_eval_env_base(item)
+    env = base.copy()
+    env['value'] = value
+    env['caller'] = caller
+    env['source'] = source
+    env['dest'] = dest
+    return env
 
-    return {
-        # ── documented public API ──────────────────────────────────────────
-        'sh': item._sh,
-        'shtime': item.shtime,
-        'items': Items.get_instance(),
-        'math': math,
-        'uf': uf,
-        'env': lib.env,
-        # ── trigger call parameters ───────────────────────────────────────
-        'value': value,
-        'caller': caller,
-        'source': source,
-        'dest': dest,
-        # ── modules documented in official examples ────────────────────────
-        'datetime': datetime,
-        'time': time,
-        # ── item itself (not documented but was accessible before) ─────────
-        'item': item,
-        # ── builtins ──────────────────────────────────────────────────────
-        '__builtins__': __builtins__,
-    }
+
+# ---------------------------------------------------------------------------
+# compiled expressions
+# ---------------------------------------------------------------------------
+
+
+def get_code(item, expr, context):
+    """
+    Return the compiled code object for an expression of the item.
+
+    The expression is compiled on first use and cached on the item. If it
+    cannot be compiled, the error is recorded in ``item._eval_compile_errors``
+    and the expression string is returned, so that ``eval()`` raises the
+    SyntaxError at the call site as before.
+
+    :param item:    ``Item`` instance the expression belongs to.
+    :param expr:    Expression string.
+    :param context: Attribute name for error reporting (e.g. ``'eval'``).
+    :returns:       Code object, or *expr* if it does not compile.
+    """
+    code = item._eval_code.get(expr)
+    if code is None:
+        try:
+            code = compile(expr, '<string>', 'eval')
+        except SyntaxError as e:
+            item._eval_compile_errors[context] = f'{e.__class__.__name__}: {e}'
+            return expr
+        item._eval_code[expr] = code
+    return code
+
+
+def _inject_caller_source(on_eval, attr, path):
+    """Add caller and source arguments to an on_xxx expression without destination (function call syntax)."""
+    on_eval = on_eval.strip()
+    if on_eval.endswith(')'):
+        test = on_eval.replace(' ', '')
+        if test.lower().find(',caller=') == -1 and test.lower().find(',source=') == -1:
+            on_eval = on_eval[:-1] + ", caller='" + attr + "', source='" + path + "')"
+        if test.lower().find(',caller=') > -1 and test.lower().find(',source=') == -1:
+            on_eval = on_eval[:-1] + ", source='" + path + "')"
+        if test.lower().find(',caller=') == -1 and test.lower().find(',source=') > -1:
+            on_eval = on_eval[:-1] + ", caller='" + attr + "')"
+    return on_eval
+
+
+def compile_expressions(item):
+    """
+    (Re-)compile all expressions of the item.
+
+    Called from ``init_prerun`` (after the eval keywords have been expanded)
+    and whenever an expression is changed through the item's properties.
+    Previously compiled code and recorded compile errors are discarded.
+
+    :param item: ``Item`` instance.
+    """
+    item._eval_code = {}
+    item._eval_compile_errors = {}
+    if item._eval:
+        get_code(item, item._eval, 'eval')
+    if item._trigger_condition is not None:
+        get_code(item, item._trigger_condition, 'trigger_condition')
+    for attr, dest_list, eval_list in (
+        ('On_Change', item._on_change_dest_var, item._on_change),
+        ('On_Update', item._on_update_dest_var, item._on_update),
+    ):
+        if eval_list:
+            for on_dest, on_eval in zip(dest_list, eval_list):
+                if on_dest == '':
+                    on_eval = _inject_caller_source(on_eval, attr, item._path)
+                get_code(item, on_eval, attr.lower())
 
 
 # ---------------------------------------------------------------------------
@@ -177,7 +286,7 @@ def run_eval(item, value=None, caller='Eval', source=None, dest=None):
     if item._trigger_condition is not None:
         try:
             try:
-                cond = eval(item._trigger_condition, _ns)
+                cond = eval(get_code(item, item._trigger_condition, 'trigger_condition'), _ns)
             except Exception as _ce:  # COMPAT-SHIM
                 cond = _eval_with_legacy_fallback(  # COMPAT-SHIM
                     item._trigger_condition, _ns, item, 'trigger_condition', _ce
@@ -226,13 +335,14 @@ def run_eval(item, value=None, caller='Eval', source=None, dest=None):
             # if crontab: init = x is set, x is transferred as a string;
             # re-try eval with x converted to float for that case
             _first_exc = None  # COMPAT-SHIM
+            _code = get_code(item, item._eval, 'eval')
             try:
                 try:
-                    value = eval(item._eval, _ns)
+                    value = eval(_code, _ns)
                 except Exception as _e0:
                     _first_exc = _e0  # COMPAT-SHIM
                     _ns['value'] = item.cast(_ns.get('value'))
-                    value = eval(item._eval, _ns)
+                    value = eval(_code, _ns)
             except Exception as _e:  # COMPAT-SHIM
                 _fb = _eval_with_legacy_fallback(  # COMPAT-SHIM
                     item._eval,
@@ -291,20 +401,13 @@ def run_on_xxx(item, path, value, on_dest, on_eval, attr='?', caller=None, sourc
 
     # if syntax without '=' is used, inject caller and source into the call
     if on_dest == '':
-        on_eval = on_eval.strip()
-        if on_eval.endswith(')'):
-            test = on_eval.replace(' ', '')
-            if test.lower().find(',caller=') == -1 and test.lower().find(',source=') == -1:
-                on_eval = on_eval[:-1] + ", caller='" + attr + "', source='" + path + "')"
-            if test.lower().find(',caller=') > -1 and test.lower().find(',source=') == -1:
-                on_eval = on_eval[:-1] + ", source='" + path + "')"
-            if test.lower().find(',caller=') == -1 and test.lower().find(',source=') > -1:
-                on_eval = on_eval[:-1] + ", caller='" + attr + "')"
+        on_eval = _inject_caller_source(on_eval, attr, path)
+    _code = get_code(item, on_eval, attr.lower())
 
     # evaluate the expression
     dest_value = None
     try:
-        dest_value = eval(on_eval, _ns)
+        dest_value = eval(_code, _ns)
     except Exception as _e:
         dest_value = _eval_with_legacy_fallback(  # COMPAT-SHIM
             on_eval, _ns, item, f'{attr} on_eval', _e
@@ -327,7 +430,7 @@ def run_on_xxx(item, path, value, on_dest, on_eval, attr='?', caller=None, sourc
                     f"Item {path}: '{attr}' has not found dest_item '{on_dest}' = {on_eval}, result={dest_value}"
                 )
         else:
-            _ = eval(on_eval, _ns)
+            _ = eval(_code, _ns)
             logger.debug(f" - : '{attr}' finally evaluating {on_eval}, result={dest_value}")
     else:
         logger.debug(f" - : '{attr}' {on_dest} not set (cause: eval=None)")
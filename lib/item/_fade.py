@@ -29,21 +29,42 @@ Functions
 ---------
 fade(item, dest, step, delta, caller, stop_fade, continue_fade,
      instant_set, update)
-    Smoothly ramp an item's value to *dest* by scheduling repeated
-    ``fadejob`` calls via the SmartHomeNG scheduler.
+    Smoothly ramp an item's value to *dest* by triggering ``fadejob``
+    via the SmartHomeNG scheduler.
 
-The actual step-by-step logic lives in ``fadejob`` (``lib/item/helpers.py``);
-this function only validates parameters, stores fade state, and triggers the
-first scheduler call.
+compile_fade_patterns(patterns)
+    Compiled regexes of a ``stop_fade`` / ``continue_fade`` list, cached so
+    that ``Item.__update`` does not compile them for every update.
+
+The actual step-by-step logic lives in ``fadejob`` and the ``FadeEngine``
+(``lib/item/helpers.py``): once SmartHomeNG is running, ``fadejob`` hands the
+fade to the engine thread, which advances all active fades. This module only
+validates parameters, stores fade state, and triggers ``fadejob``.
 """
 
+import functools
 import logging
+import re
 
 from .helpers import fadejob
 
 logger = logging.getLogger('lib.item')
 
 
+def compile_fade_patterns(patterns):
+    """
+    Return the compiled (case insensitive) regexes of a stop_fade / continue_fade list
+
+    :raises re.error: if a pattern is not a valid regular expression
+    """
+    return _compile_fade_patterns(tuple(patterns))
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_fade_patterns(patterns):
+    return tuple(re.compile(pattern, re.IGNORECASE) for pattern in patterns)
+
+
 def fade(item, dest, step=1, delta=1, caller=None, stop_fade=None, continue_fade=None, instant_set=True, update=False):
     """
     Fade (ramp) *item*'s value to *dest*.
@@ -71,6 +92,20 @@ def fade(item, dest, step=1, delta=1, caller=None, stop_fade=None, continue_fade
     if continue_fade and not isinstance(continue_fade, list):
         logger.warning(f'continue_fade parameter {continue_fade} for fader {item} has to be a list. Ignoring')
         continue_fade = None
+    if stop_fade:
+        try:
+            compile_fade_patterns(stop_fade)
+        except re.error as e:
+            logger.warning(f'stop_fade parameter {stop_fade} for fader {item} is not a valid regex ({e}). Ignoring')
+            stop_fade = None
+    if continue_fade:
+        try:
+            compile_fade_patterns(continue_fade)
+        except re.error as e:
+            logger.warning(
+                f'continue_fade parameter {continue_fade} for fader {item} is not a valid regex ({e}). Ignoring'
+            )
+            continue_fade = None
 
     dest = float(dest)
     if not item._fading or (item._fading and update):
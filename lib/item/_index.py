@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+#########################################################################
+# Copyright 2016-2025   Martin Sinn                         m.sinn@gmx.de
+#########################################################################
+#  This file is part of SmartHomeNG.
+#
+#  SmartHomeNG is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SmartHomeNG is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SmartHomeNG.  If not, see <http://www.gnu.org/licenses/>.
+#########################################################################
+
+"""
+lib/item/_index.py
+==================
+
+Index of the registered items, used by ``Items.find_items()``,
+``Items.find_children()`` and ``Items.match_items()`` instead of scanning all
+items.
+
+Attribute index
+---------------
+Maps an attribute name to the items that have the attribute. For attribute
+names with an instance (``knx_dpt@knx_1``) the parts before and after each
+``@`` are indexed as well (``knx_dpt@`` and ``@knx_1``), so every case of
+``Items._attribute_find()`` is answered by dict lookups.
+
+Path trie
+---------
+One node per level of the item paths. It is used to find the items below an
+item and the items whose path starts with a given string (the literal part
+of a ``match_items()`` pattern). The children of a node keep the order in
+which they were created, which is the order of the item definitions.
+
+The index is updated by ``Items.add_item()`` and ``Items.remove_item()``.
+Results are returned in the order in which the items were registered, like
+the scan of the registry did before.
+"""
+
+import itertools
+
+# characters that end the literal prefix of a match_items() pattern ('*' is the wildcard, '.' is escaped)
+_PATTERN_SPECIAL = frozenset('*\\^$+?{}[]|()')
+
+
+class _Node:
+    __slots__ = ('children', 'item', 'count', 'rank', 'next_rank')
+
+    def __init__(self, rank=0):
+        self.children = {}
+        self.item = None  # item registered with the path ending at this node
+        self.count = 0  # number of items registered at this node and below
+        self.rank = rank  # position among the children of the parent node
+        self.next_rank = 0  # rank of the next child node
+
+
+class ItemIndex:
+    """
+    Attribute index and path trie of the items in *registry*
+
+    :param registry: dict {path: item} of the registered items (Items.__item_dict)
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+        self._seq = {}  # path -> registration number (for the order of results)
+        self._counter = itertools.count()
+        self._keys = {}  # path -> (attributes, prefixes, suffixes) the item is indexed under
+        self._attributes = {}  # 'knx_dpt@knx_1' -> {path: item}
+        self._prefixes = {}  # 'knx_dpt@' -> {path: item}
+        self._suffixes = {}  # '@knx_1' -> {path: item}
+        self._root = _Node()
+        for path, item in registry.items():
+            self.add(path, item)
+
+    # ------------------------------------------------------------------
+    # maintenance
+    # ------------------------------------------------------------------
+
+    def add(self, path, item):
+        """
+        Index an item (or the item replacing an item with the same path)
+        """
+        new = path not in self._keys
+        if new:
+            self._seq[path] = next(self._counter)
+        else:
+            self._unindex_attributes(path)
+        self._index_attributes(path, item)
+
+        node = self._root
+        node.count += new
+        for level in path.split('.'):
+            child = node.children.get(level)
+            if child is None:
+                child = node.children[level] = _Node(node.next_rank)
+                node.next_rank += 1
+            node = child
+            node.count += new
+        node.item = item
+
+    def remove(self, path):
+        """
+        Remove an item from the index
+        """
+        if path not in self._keys:
+            return
+        self._unindex_attributes(path)
+        del self._keys[path]
+        del self._seq[path]
+
+        nodes = [self._root]
+        levels = path.split('.')
+        for level in levels:
+            node = nodes[-1].children.get(level)
+            if node is None:
+                return
+            nodes.append(node)
+        nodes[-1].item = None
+        for node in nodes:
+            node.count -= 1
+        # prune nodes without items from the leaf upwards
+        for i in range(len(levels), 0, -1):
+            if nodes[i].count > 0:
+                break
+            del nodes[i - 1].children[levels[i - 1]]
+
+    def _index_attributes(self, path, item):
+        attributes = [attr for attr in item.property.attributes if isinstance(attr, str)]
+        prefixes = set()
+        suffixes = set()
+        for attr in attributes:
+            pos = attr.find('@')
+            while pos >= 0:
+                prefixes.add(attr[: pos + 1])
+                suffixes.add(attr[pos:])
+                pos = attr.find('@', pos + 1)
+        keys = (attributes, prefixes, suffixes)
+        for index, names in zip((self._attributes, self._prefixes, self._suffixes), keys):
+            for name in names:
+                index.setdefault(name, {})[path] = item
+        self._keys[path] = keys
+
+    def _unindex_attributes(self, path):
+        for index, names in zip((self._attributes, self._prefixes, self._suffixes), self._keys[path]):
+            for name in names:
+                bucket = index.get(name)
+                if bucket is not None:
+                    bucket.pop(path, None)
+                    if not bucket:
+                        del index[name]
+
+    def _find_node(self, path):
+        node = self._root
+        for level in path.split('.'):
+            node = node.children.get(level)
+            if node is None:
+                return None
+        return node
+
+    # ------------------------------------------------------------------
+    # queries
+    # ------------------------------------------------------------------
+
+    def _ordered(self, buckets):
+        """
+        Return the items of the buckets ({path: item}) in the order of their registration
+        """
+        if len(buckets) == 1:
+            found = buckets[0]
+        else:
+            found = {}
+            for bucket in buckets:
+                found.update(bucket)
+        seq = self._seq
+        return [found[path] for path in sorted(found, key=seq.__getitem__)]
+
+    def find(self, conf):
+        """
+        Return the items having the attribute *conf* (same rules as Items._attribute_find())
+        """
+        if conf.endswith('@'):
+            buckets = [self._prefixes.get(conf, {}), self._attributes.get(conf[:-1], {})]
+        elif conf.startswith('@'):
+            buckets = [self._suffixes.get(conf, {})]
+        else:
+            buckets = [self._attributes.get(conf, {})]
+        return self._ordered(buckets)
+
+    def find_below(self, path, conf):
+        """
+        Return the items below *path* having the attribute *conf*, in the order of the item tree
+        """
+        if self._find_node(path) is None:
+            return []
+        prefix = path + '.'
+        found = [item for item in self.find(conf) if item.property.path.startswith(prefix)]
+        found.sort(key=lambda item: self._tree_position(item.property.path))
+        return found
+
+    def _tree_position(self, path):
+        node = self._root
+        position = []
+        for level in path.split('.'):
+            node = node.children[level]
+            position.append(node.rank)
+        return position
+
+    def match(self, pattern, attr=''):
+        """
+        Return the candidates for a match_items() pattern
+
+        The candidates are the items whose path starts with the literal prefix of
+        *pattern* or, if fewer, the items having the attribute *attr*. They still
+        have to be matched against the pattern by the caller.
+
+        :return: list of items (in the order of their registration)
+        """
+        prefix = ''
+        for char in pattern:
+            if char in _PATTERN_SPECIAL:
+                break
+            prefix += char
+        else:
+            # no wildcard: the pattern is an item path
+            item = self.registry.get(pattern)
+            if item is None or (attr != '' and pattern not in self._attributes.get(attr, {})):
+                return []
+            return [item]
+
+        roots = self._prefix_nodes(prefix) if prefix else None
+        if attr != '':
+            bucket = self._attributes.get(attr, {})
+            if roots is None or len(bucket) <= sum(node.count for node in roots):
+                return self._ordered([bucket])
+        if roots is None:
+            return list(self.registry.values())
+
+        found = {}
+        stack = list(roots)
+        while stack:
+            node = stack.pop()
+            if node.item is not None:
+                found[node.item.property.path] = node.item
+            stack.extend(node.children.values())
+        return self._ordered([found])
+
+    def _prefix_nodes(self, prefix):
+        """
+        Return the trie nodes whose subtrees hold the paths starting with *prefix*
+        """
+        *levels, partial = prefix.split('.')
+        node = self._root
+        for level in levels:
+            node = node.children.get(level)
+            if node is None:
+                return []
+        return [child for name, child in node.children.items() if name.startswith(partial)]
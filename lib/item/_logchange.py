@@ -28,6 +28,10 @@ Entry point: ``log_on_change(item, value, caller, source, dest)``
 Called from Item._set_value() for every value write (when the item has
 ``log_change`` configured) — but skipped when caller is 'Fader'.
 
+The log level is checked before anything else is done. The log rules are
+compiled once per item and kept in ``item._log_rules_cache`` until
+``item._log_rules`` is replaced.
+
 Accesses only single-underscore attributes and public methods on the Item
 so the extraction avoids Python name-mangling issues.
 """
@@ -52,15 +56,136 @@ def log_on_change(item, value, caller, source=None, dest=None):
     Write an entry to the item's log_change logger, applying all configured
     rules (lowlimit, highlimit, filter, exclude).
 
+    The log level is checked first, the rules are only applied and the text is
+    only built, if the logger will emit the entry.
+
     :param item:   the Item instance
     :param value:  new item value
     :param caller: caller string
     :param source: source string (may be None)
     :param dest:   destination string (may be None)
     """
-    if item._log_change_logger is None:
+    log_change_logger = item._log_change_logger
+    if log_change_logger is None:
         return
 
+    level = get_log_level(item, value, caller, source, dest)
+    if not log_change_logger.isEnabledFor(level):
+        return
+
+    rules = get_rules(item, value)
+    low_limit = rules['lowlimit']
+    high_limit = rules['highlimit']
+    filter_list = rules['filter']
+    exclude_list = rules['exclude']
+
+    if item._type == 'num':
+        if low_limit is not None and low_limit > float(value):
+            return
+        if high_limit is not None and high_limit <= float(value):
+            return
+        if filter_list and float(value) not in filter_list:
+            return
+        if exclude_list and float(value) in exclude_list:
+            return
+    else:
+        if filter_list and value not in filter_list:
+            return
+        if exclude_list and value in exclude_list:
+            return
+
+    if item._log_text is None:
+        txt = build_standardtext(item, value, caller, source, dest)
+    else:
+        txt = build_text(item, value, caller, source, dest)
+
+    log_change_logger.log(level, txt)
+
+
+# ---------------------------------------------------------------------------
+# Log level
+# ---------------------------------------------------------------------------
+
+
+def get_log_level(item, value, caller, source=None, dest=None):
+    """
+    Return the numeric log level from the item's log_level attribute
+
+    A log_level without a template (``{...}``) is resolved only once, until the
+    attribute changes. Templates are evaluated on every change and may use
+    item, value, caller, source and dest.
+    """
+    attrib = item._log_level_attrib
+    cache = item._log_rules_cache
+    if cache.get('level_attrib') == attrib:
+        return item._log_level
+
+    # Resolve the log level from the template attribute (may contain f-string)
+    try:
+        val = attrib.replace("'", '"')
+        log_level = eval(
+            f"f'{val}'", globals(), {'item': item, 'value': value, 'caller': caller, 'source': source, 'dest': dest}
+        )
+    except Exception as e:
+        log_level = attrib
+        logger.error(f"Item {item._path}: Invalid log_level template '{log_level}' - (Exception: {e})")
+
+    level = log_level.upper()
+    level_name = level
+    if Utils.is_int(level):
+        level = int(level)
+        level_name = logging.getLevelName(level)
+    if logging.getLevelName(level) == 'Level ' + str(level):
+        logger.warning(
+            f"Item {item._path}: Invalid loglevel '{log_level}' defined in log_level attribute "
+            f"- Level 'INFO' will be used instead"
+        )
+        item._log_level_name = 'INFO'
+        item._log_level = logging.getLevelName('INFO')
+    else:
+        item._log_level_name = level_name
+        item._log_level = logging.getLevelName(level_name)
+
+    if '{' not in attrib:
+        cache['level_attrib'] = attrib
+    return item._log_level
+
+
+# ---------------------------------------------------------------------------
+# Compiled log rules
+# ---------------------------------------------------------------------------
+
+_RULE_KEYS = ('lowlimit', 'highlimit', 'filter', 'exclude')
+
+
+def get_rules(item, value):
+    """
+    Return the cleaned log rules of an item for a value
+
+    The rules are compiled once and cached in item._log_rules_cache until
+    item._log_rules is replaced. Rules that refer to an item (string entries)
+    are compiled on every change, because the value of the referenced item may
+    change. Filter and exclude entries are checked against the type of the value,
+    the result is cached per type.
+
+    :return: item._log_rules_cache with the keys lowlimit, highlimit, filter, exclude and issues
+    """
+    cache = item._log_rules_cache
+    if cache.get('rules') is not item._log_rules or cache.get('dynamic'):
+        cache = compile_rules(item)
+
+    typed = cache['typed'].get(type(value))
+    if typed is None:
+        typed = _compile_typed_rules(item, cache, value)
+    cache['issues'], cache['filter'], cache['exclude'] = typed
+    return cache
+
+
+def compile_rules(item):
+    """
+    Compile the value independent part of the log rules of an item
+    """
+    old_cache = item._log_rules_cache
     issue_list = []
 
     low_limit = get_rule(item, 'lowlimit')
@@ -87,90 +212,62 @@ def log_on_change(item, value, caller, source=None, dest=None):
     if isinstance(filter_list, dict):
         issue_list.append(filter_list.get('issue'))
         filter_list = []
-    f_list = []
-    for f in filter_list:
-        if type(value) is not type(f):
-            issue_list.append(f'Filter entry {f} is type {type(f)}, item is {item._type} - ignoring')
-        else:
-            f_list.append(f)
-    filter_list = f_list
 
     exclude_list = get_rule(item, 'exclude')
     if isinstance(exclude_list, dict):
         issue_list.append(exclude_list.get('issue'))
         exclude_list = []
-    e_list = []
-    for e in exclude_list:
+
+    cache = {
+        'rules': item._log_rules,
+        'dynamic': any(isinstance(item._log_rules.get(key), str) for key in _RULE_KEYS),
+        'base_issues': issue_list,
+        'filter_rule': filter_list or [],
+        'exclude_rule': exclude_list or [],
+        'typed': {},
+        'issues': old_cache.get('issues'),
+        'filter': [],
+        'exclude': [],
+        'lowlimit': low_limit,
+        'highlimit': high_limit,
+    }
+    if 'level_attrib' in old_cache:
+        cache['level_attrib'] = old_cache['level_attrib']
+    item._log_rules_cache = cache
+    return cache
+
+
+def _compile_typed_rules(item, cache, value):
+    issue_list = list(cache['base_issues'])
+
+    filter_list = []
+    for f in cache['filter_rule']:
+        if type(value) is not type(f):
+            issue_list.append(f'Filter entry {f} is type {type(f)}, item is {item._type} - ignoring')
+        else:
+            filter_list.append(f)
+
+    exclude_list = []
+    for e in cache['exclude_rule']:
         if type(value) is not type(e):
             issue_list.append(f'Exclude entry {e} is type {type(e)}, item is {item._type} - ignoring')
         else:
-            e_list.append(e)
-    exclude_list = e_list
+            exclude_list.append(e)
 
     if filter_list and exclude_list:
         issue_list.append('Defining filter AND exclude does not work - ignoring exclude list')
         exclude_list = []
 
-    if issue_list and item._log_rules_cache.get('issues') != issue_list:
+    if issue_list and cache.get('issues') != issue_list:
         logger.warning(
             f'Item {item._path} log_rules has issues: {", ".join(issue_list)}. '
-            f'Cleaned log_rules: lowlimit = {low_limit}, highlimit = {high_limit}, '
+            f'Cleaned log_rules: lowlimit = {cache["lowlimit"]}, highlimit = {cache["highlimit"]}, '
             f'filter = {filter_list}, exclude = {exclude_list}'
         )
 
-    item._log_rules_cache = {
-        'issues': issue_list,
-        'filter': filter_list,
-        'exclude': exclude_list,
-        'lowlimit': low_limit,
-        'highlimit': high_limit,
-    }
-
-    if item._type == 'num':
-        if low_limit is not None and low_limit > float(value):
-            return
-        if high_limit is not None and high_limit <= float(value):
-            return
-        if filter_list and float(value) not in filter_list:
-            return
-        if exclude_list and float(value) in exclude_list:
-            return
-    else:
-        if filter_list and value not in filter_list:
-            return
-        if exclude_list and value in exclude_list:
-            return
-
-    if item._log_text is None:
-        txt = build_standardtext(item, value, caller, source, dest)
-    else:
-        txt = build_text(item, value, caller, source, dest)
-
-    # Resolve the log level from the template attribute (may contain f-string)
-    try:
-        val = item._log_level_attrib.replace("'", '"')
-        log_level = eval(f"f'{val}'")
-    except Exception as e:
-        log_level = item._log_level_attrib
-        logger.error(f"Item {item._path}: Invalid log_level template '{log_level}' - (Exception: {e})")
-
-    level = log_level.upper()
-    level_name = level
-    if Utils.is_int(level):
-        level = int(level)
-        level_name = logging.getLevelName(level)
-    if logging.getLevelName(level) == 'Level ' + str(level):
-        logger.warning(
-            f"Item {item._path}: Invalid loglevel '{log_level}' defined in log_level attribute "
-            f"- Level 'INFO' will be used instead"
-        )
-        item._log_level_name = 'INFO'
-        item._log_level = logging.getLevelName('INFO')
-    else:
-        item._log_level_name = level_name
-        item._log_level = logging.getLevelName(level_name)
-
-    item._log_change_logger.log(item._log_level, txt)
+    typed = (issue_list, filter_list, exclude_list)
+    cache['typed'][type(value)] = typed
+    return typed
 
 
 # ---------------------------------------------------------------------------
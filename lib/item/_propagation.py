@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+#########################################################################
+# Copyright 2016-2025   Martin Sinn                         m.sinn@gmx.de
+#########################################################################
+#  This file is part of SmartHomeNG.
+#
+#  SmartHomeNG is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SmartHomeNG is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SmartHomeNG.  If not, see <http://www.gnu.org/licenses/>.
+#########################################################################
+
+"""
+lib/item/_propagation.py
+========================
+
+Propagation of item changes to the items that depend on them
+(``eval_trigger`` and ``hysteresis_input``).
+
+Functions
+---------
+build_trigger_graph(items)
+    Called once after all items ran ``_init_prerun``. Assigns a topological
+    rank (``item._trigger_rank``) to every item that is not part of a trigger
+    cycle and reports the cycles that were found.
+
+trigger_dependents(item, value, caller, source, dest)
+    Called from ``Item.__update`` when the item changed. Dependent items
+    with a rank are evaluated in a batch; dependents without a rank (cycle
+    members, items created after startup) are triggered one by one through
+    the scheduler as before.
+
+Batches
+-------
+A change that does not happen inside a batch (a root change) is added to an
+:class:`EvalBatch`, which is worked through in rank order by a scheduler task.
+Root changes that arrive close together - while the task of the batch waits in
+the run queue of the scheduler - are collected in the same batch. Once the
+task runs, the batch is closed for root changes and the next root change
+starts a new batch, so batches of independent changes are still evaluated in
+parallel by different worker threads. No delay is added to collect changes:
+the coalescing window is the time a batch waits for a free worker thread,
+which grows with the load of the scheduler.
+
+Changes caused by an evaluation of the batch (in the thread running it) are
+added to the same batch, so every dependent item is evaluated once per batch,
+even for diamond shaped dependencies.
+
+A batch task runs at most ``EvalBatch.max_evaluations`` evaluations and then
+queues itself again, so a long batch does not keep a worker thread busy and
+other tasks can run in between.
+
+If a dependent item is added while it is already pending, only the latest
+value/source is kept, unless its ``eval`` or ``trigger_condition`` uses
+``value`` or ``source``. Such items, and hysteresis items, are evaluated once
+for every trigger, so counters and accumulators do not lose triggers.
+"""
+
+import functools
+import heapq
+import itertools
+import logging
+import threading
+import types
+
+from ._eval import run_eval
+from ._hysteresis import run_hysteresis
+
+logger = logging.getLogger('lib.item')
+
+KIND_EVAL = 'eval'
+KIND_HYSTERESIS = 'hysteresis'
+
+
+# ---------------------------------------------------------------------------
+# dependency graph
+# ---------------------------------------------------------------------------
+
+
+def _dependents(item):
+    """Return the items that are evaluated when *item* changes."""
+    return list(item._items_to_trigger) + list(item._hysteresis_items_to_trigger)
+
+
+def _find_cycles(items):
+    """
+    Find the strongly connected components of the trigger graph that form cycles.
+
+    Iterative version of Tarjan's algorithm (item trees can be too deep for
+    recursion).
+
+    :param items: list of all ``Item`` instances
+    :returns:     list of cycles, each a list of items
+    """
+    index = {}
+    lowlink = {}
+    on_stack = set()
+    stack = []
+    cycles = []
+    counter = itertools.count()
+
+    for root in items:
+        if root in index:
+            continue
+        index[root] = lowlink[root] = next(counter)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(_dependents(root)))]
+        while work:
+            node, children = work[-1]
+            for child in children:
+                if child not in index:
+                    index[child] = lowlink[child] = next(counter)
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(_dependents(child))))
+                    break
+                elif child in on_stack:
+                    lowlink[node] = min(lowlink[node], index[child])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member is node:
+                            break
+                    if len(component) > 1 or node in _dependents(node):
+                        cycles.append(component)
+    return cycles
+
+
+def build_trigger_graph(items):
+    """
+    Rank all items by their position in the trigger graph.
+
+    For every edge ``a -> b`` (``b`` is evaluated when ``a`` changes) between
+    ranked items ``a._trigger_rank < b._trigger_rank`` holds. Items that are
+    part of a trigger cycle get no rank (``None``) and keep being triggered
+    one by one.
+
+    :param items: list of all ``Item`` instances
+    :returns:     list of cycles, each a list of item paths
+    """
+    cycles = _find_cycles(items)
+    in_cycle = set()
+    for component in cycles:
+        in_cycle.update(component)
+        paths = sorted(member._path for member in component)
+        logger.warning(
+            f'Items {paths} trigger each other (eval_trigger/hysteresis_input cycle).'
+            ' They are evaluated one by one instead of in batches'
+        )
+
+    indegree = {}
+    for item in items:
+        if item in in_cycle:
+            continue
+        indegree.setdefault(item, 0)
+        for dependent in _dependents(item):
+            if dependent not in in_cycle:
+                indegree[dependent] = indegree.get(dependent, 0) + 1
+
+    rank = {item: 0 for item, degree in indegree.items() if degree == 0}
+    ready = list(rank)
+    while ready:
+        item = ready.pop()
+        for dependent in _dependents(item):
+            if dependent in in_cycle:
+                continue
+            rank[dependent] = max(rank.get(dependent, 0), rank[item] + 1)
+            indegree[dependent] -= 1
+            if indegree[dependent] == 0:
+                ready.append(dependent)
+
+    for item in items:
+        item._trigger_rank = rank.get(item)
+    return [sorted(member._path for member in component) for component in cycles]
+
+
+# ---------------------------------------------------------------------------
+# batched evaluation
+# ---------------------------------------------------------------------------
+
+
+_TRIGGER_ARGS = frozenset(('value', 'source'))
+
+
+@functools.lru_cache(maxsize=None)
+def _uses_trigger_args(expr):
+    """
+    Return True, if the expression uses the trigger parameters ``value`` or ``source``
+
+    Expressions that cannot be compiled count as using them.
+    """
+    try:
+        code = compile(expr, '<string>', 'eval')
+    except SyntaxError:
+        return True
+    stack = [code]
+    while stack:
+        code = stack.pop()
+        if _TRIGGER_ARGS.intersection(code.co_names):
+            return True
+        stack.extend(const for const in code.co_consts if isinstance(const, types.CodeType))
+    return False
+
+
+def _mergeable(item, kind):
+    """
+    Return True, if pending evaluations of *item* can be merged (only the latest trigger is kept)
+    """
+    if kind == KIND_HYSTERESIS:
+        return False
+    for expr in (getattr(item, '_eval', None), getattr(item, '_trigger_condition', None)):
+        if isinstance(expr, str) and _uses_trigger_args(expr):
+            return False
+    return True
+
+
+_current = threading.local()  # .batch is the EvalBatch run by the current thread
+_open_lock = threading.Lock()
+_open_batch = None  # batch that collects root changes, until its scheduler task starts
+
+
+class EvalBatch:
+    """
+    Collects the pending evaluations caused by root changes that arrive close together and runs them in rank order
+    """
+
+    max_evaluations = 100  # evaluations per scheduler task, the rest is queued again
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._heap = []  # (rank, seq, item, kind, args), args is None for merged evaluations
+        self._pending = {}  # (item, kind) -> (value, caller, source) of merged evaluations
+        self._seq = itertools.count()
+        self._scheduled = False  # a scheduler task for run() is queued or running
+        self._sh = None
+        self.batches = 0
+        self.evaluations = 0
+
+    def add(self, sh, item, kind, value, caller, source):
+        """
+        Add an evaluation of *item* to the batch
+
+        Schedules a batch run, if none is queued or running.
+
+        :param sh:     SmartHomeNG instance (used to trigger the batch run)
+        :param item:   item to be evaluated
+        :param kind:   ``KIND_EVAL`` or ``KIND_HYSTERESIS``
+        :param value:  value of the item that changed
+        :param caller: caller of the change
+        :param source: path of the item that changed
+        """
+        with self._lock:
+            if _mergeable(item, kind):
+                key = (item, kind)
+                if key not in self._pending:
+                    heapq.heappush(self._heap, (item._trigger_rank, next(self._seq), item, kind, None))
+                self._pending[key] = (value, caller, source)
+            else:
+                heapq.heappush(self._heap, (item._trigger_rank, next(self._seq), item, kind, (value, caller, source)))
+            self._sh = sh
+            if self._scheduled:
+                return
+            self._scheduled = True
+        sh.trigger(name='items.eval-batch', obj=self.run, by='Items', source=source)
+
+    def run(self):
+        """
+        Evaluate the pending items, lowest rank first
+
+        Runs until no evaluations are pending anymore, including the ones added
+        by the evaluations of this batch, or until ``max_evaluations`` are done.
+        In the latter case the batch queues a new scheduler task for the rest.
+        """
+        global _open_batch
+        with _open_lock:
+            if _open_batch is self:
+                # root changes from now on start a new batch
+                _open_batch = None
+        thread = threading.current_thread()
+        thread_name = thread.name
+        outer_batch = getattr(_current, 'batch', None)
+        _current.batch = self
+        self.batches += 1
+        try:
+            for __ in range(self.max_evaluations):
+                with self._lock:
+                    if not self._heap:
+                        self._scheduled = False
+                        return
+                    item, kind, args = heapq.heappop(self._heap)[2:]
+                    if args is None:
+                        args = self._pending.pop((item, kind))
+                value, caller, source = args
+                self.evaluations += 1
+                thread.name = 'items.' + item._path
+                try:
+                    if kind == KIND_HYSTERESIS:
+                        run_hysteresis(item, value=value, caller=caller, source=source)
+                    else:
+                        run_eval(item, value=value, caller=caller, source=source)
+                except Exception as e:
+                    logger.exception(f'Item {item._path}: problem running {kind} in eval batch: {e}')
+            with self._lock:
+                if not self._heap:
+                    self._scheduled = False
+                    return
+            self._sh.trigger(name='items.eval-batch', obj=self.run, by='Items')
+        finally:
+            _current.batch = outer_batch
+            thread.name = thread_name
+
+    def pending(self):
+        """Return the number of pending evaluations"""
+        with self._lock:
+            return len(self._heap)
+
+
+def get_current_batch():
+    """Return the eval batch run by the current thread, None if the thread does not run a batch"""
+    return getattr(_current, 'batch', None)
+
+
+def get_batch():
+    """
+    Return the batch a change has to be added to
+
+    Changes caused by an evaluation join the running batch. Root changes join the batch
+    that collects root changes, or start a new one if its scheduler task has started.
+    """
+    global _open_batch
+    batch = get_current_batch()
+    if batch is not None:
+        return batch
+    with _open_lock:
+        if _open_batch is None:
+            _open_batch = EvalBatch()
+        return _open_batch
+
+
+def trigger_dependents(item, value, caller, source, dest, run_eval_obj, run_hysteresis_obj):
+    """
+    Evaluate the items that depend on *item* after it changed.
+
+    :param item:               item that changed
+    :param value:              new value of the item
+    :param caller:             caller of the change
+    :param source:             source of the change
+    :param dest:               dest of the change
+    :param run_eval_obj:       returns the bound eval method of a dependent item (for unbatched triggers)
+    :param run_hysteresis_obj: returns the bound hysteresis method of a dependent item (for unbatched triggers)
+    """
+    batch = None
+    for kind, dependents, get_obj in (
+        (KIND_EVAL, item._items_to_trigger, run_eval_obj),
+        (KIND_HYSTERESIS, item._hysteresis_items_to_trigger, run_hysteresis_obj),
+    ):
+        for dependent in dependents:
+            if dependent._trigger_rank is not None:
+                if batch is None:
+                    batch = get_batch()
+                batch.add(item._sh, dependent, kind, value, caller, item._path)
+            else:
+                args = {'value': value, 'source': item._path}
+                item._sh.trigger(
+                    name='items.' + dependent.property.path,
+                    obj=get_obj(dependent),
+                    value=args,
+                    by=caller,
+                    source=source,
+                    dest=dest,
+                )
@@ -24,7 +24,13 @@
 import logging
 import os
 import datetime
+import heapq
+import io
 import json
+import sqlite3
+import tempfile
+import threading
+import time
 from lib.shtime import Shtime
 
 from ast import literal_eval
@@ -309,70 +315,574 @@ def cache_read(filename, tz, cformat=CACHE_FORMAT):
     return (dt, value)
 
 
-def cache_write(filename, value, cformat=CACHE_FORMAT):
+def _cache_dump(f, value, cformat):
+    if cformat == CACHE_PICKLE:
+        pickle.dump(value, f)
+    elif cformat == CACHE_JSON:
+        f.write(json.dumps(value, default=json_serialize).encode('UTF-8'))
+
+
+def _cache_load(data, cformat):
+    if cformat == CACHE_JSON:
+        return json.loads(data.decode('UTF-8'), object_hook=json_obj_hook)
+    return pickle.loads(data)
+
+
+def cache_write(filename, value, cformat=CACHE_FORMAT, fsync=False):
+    """
+    Write a cache file atomically
+
+    The value is written to a temporary file in the cache directory, which then
+    replaces the old cache file. A crash while writing never leaves a truncated
+    cache file behind. The name of the temporary file starts with a dot, so it can
+    not be the cache file of another item.
+
+    :param filename: path of the cache file
+    :param value:    value to write
+    :param cformat:  CACHE_PICKLE or CACHE_JSON
+    :param fsync:    flush the data to disk before the file is replaced
+    :returns:        True, if the value has been written
+    """
+    tmpname = None
     try:
-        if cformat == CACHE_PICKLE:
-            with open(filename, 'wb') as f:
-                pickle.dump(value, f)
+        fd, tmpname = tempfile.mkstemp(dir=os.path.dirname(filename) or None, prefix='.', suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            _cache_dump(f, value, cformat)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmpname, filename)
+        return True
+    except Exception as e:
+        # IOError, but also values that cannot be pickled or serialized to json
+        logger.warning(f'Could not write to {filename}: {e}')
+        if tmpname is not None:
+            try:
+                os.remove(tmpname)
+            except OSError:
+                pass
+        return False
+
+
+#####################################################################
+# Cache Writer
+#####################################################################
+
+CACHE_WRITE_INTERVAL = 5  # default seconds between two flushes of the cache writer
+CACHE_STORE_FILES = 'files'
+CACHE_STORE_SQLITE = 'sqlite'
+CACHE_STORE_FILENAME = 'item_cache.db'  # in var/db, var/cache must only contain the cache files of items
+
+
+class SQLiteCacheStore:
+    """
+    Keeps the cached values of all items in one SQLite database
 
-        elif cformat == CACHE_JSON:
-            with open(filename, 'w', encoding='UTF-8') as f:
-                json.dump(value, f, default=json_serialize)
-    except IOError:
-        logger.warning('Could not write to {}'.format(filename))
+    Values are stored pickled (or as json) together with the time they were written,
+    keyed by the item path (the name of the cache file the item would use otherwise).
+
+    At startup :meth:`preload` reads all values with one query. Until the preloaded
+    values are released, :meth:`read` and :meth:`exists` are answered from memory.
+
+    :param filename: path of the database file
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._lock = threading.Lock()
+        self._preloaded = None  # path -> (ts, format, value), filled by preload()
+        con = self._connect()
+        try:
+            with con:
+                con.execute(
+                    'CREATE TABLE IF NOT EXISTS cache (path TEXT PRIMARY KEY, ts REAL, format TEXT, value BLOB)'
+                )
+        finally:
+            con.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.filename, timeout=10)
+
+    @staticmethod
+    def key(filename):
+        return os.path.basename(filename)
+
+    def preload(self):
+        """
+        Read all stored values with a single query
+
+        :returns: number of preloaded values
+        """
+        with self._lock:
+            con = self._connect()
+            try:
+                self._preloaded = {row[0]: row[1:] for row in con.execute('SELECT path, ts, format, value FROM cache')}
+            finally:
+                con.close()
+            return len(self._preloaded)
+
+    def release_preloaded(self):
+        """Drop the preloaded values (after all items have been initialized)"""
+        with self._lock:
+            self._preloaded = None
+
+    def read(self, filename, tz):
+        """
+        Read the cached value of one item, same return value as :func:`cache_read`
+
+        :raises FileNotFoundError: if no value is stored for the item
+        """
+        key = self.key(filename)
+        with self._lock:
+            if self._preloaded is not None:
+                row = self._preloaded.get(key)
+            else:
+                con = self._connect()
+                try:
+                    row = con.execute('SELECT ts, format, value FROM cache WHERE path = ?', (key,)).fetchone()
+                finally:
+                    con.close()
+        if row is None:
+            raise FileNotFoundError(f'[Errno 2] No cached value for {self.key(filename)} in {self.filename}')
+        ts, cformat, data = row
+        return (datetime.datetime.fromtimestamp(ts, tz), _cache_load(data, cformat))
+
+    def exists(self, filename):
+        with self._lock:
+            if self._preloaded is not None:
+                return self.key(filename) in self._preloaded
+            con = self._connect()
+            try:
+                row = con.execute('SELECT 1 FROM cache WHERE path = ?', (self.key(filename),)).fetchone()
+            finally:
+                con.close()
+        return row is not None
+
+    def write_many(self, entries, fsync=False):
+        """
+        Write several values in one transaction
+
+        Values that cannot be serialized are logged and skipped.
+
+        :param entries: list of (filename, value, cformat) tuples
+        :param fsync:   use synchronous=FULL instead of NORMAL
+        :returns:       number of written values
+        """
+        rows = []
+        now = time.time()
+        for filename, value, cformat in entries:
+            f = io.BytesIO()
+            try:
+                _cache_dump(f, value, cformat)
+            except Exception as e:
+                logger.warning(f'Could not write cached value of {self.key(filename)} to {self.filename}: {e}')
+                continue
+            rows.append((self.key(filename), now, cformat, f.getvalue()))
+        with self._lock:
+            if self._preloaded is not None:
+                self._preloaded.update({row[0]: row[1:] for row in rows})
+            con = self._connect()
+            try:
+                con.execute('PRAGMA synchronous = ' + ('FULL' if fsync else 'NORMAL'))
+                with con:
+                    con.executemany('INSERT OR REPLACE INTO cache (path, ts, format, value) VALUES (?, ?, ?, ?)', rows)
+            finally:
+                con.close()
+        return len(rows)
+
+    def import_rows(self, rows):
+        """
+        Store already serialized values, keeping their timestamps (used for migration)
+
+        :param rows: list of (path, ts, format, data) tuples
+        """
+        with self._lock:
+            con = self._connect()
+            try:
+                with con:
+                    con.executemany('INSERT OR REPLACE INTO cache (path, ts, format, value) VALUES (?, ?, ?, ?)', rows)
+            finally:
+                con.close()
+
+
+def migrate_cache_files(cache_dir, store, cformat=CACHE_FORMAT):
+    """
+    Copy the per item cache files of *cache_dir* into *store*
+
+    The files are left untouched, so switching back to ``item_cache_store: files``
+    is possible. The modification time of each file is kept as timestamp of the value.
+
+    :param cache_dir: directory with one cache file per item (var/cache)
+    :param store:     :class:`SQLiteCacheStore` to fill
+    :param cformat:   format of the cache files
+    :returns:         tuple (number of migrated files, list of files that could not be read)
+    """
+    rows = []
+    failed = []
+    db_name = os.path.basename(store.filename)
+    with os.scandir(cache_dir) as it:
+        for entry in it:
+            if not entry.is_file() or entry.name.startswith('.') or entry.name.startswith(db_name):
+                continue
+            try:
+                with open(entry.path, 'rb') as f:
+                    data = f.read()
+                _cache_load(data, cformat)  # only store values that can be read back
+            except Exception:
+                failed.append(entry.name)
+                continue
+            rows.append((entry.name, entry.stat().st_mtime, cformat, data))
+    store.import_rows(rows)
+    return len(rows), failed
+
+
+class CacheWriter:
+    """
+    Writes the cache of items in the background
+
+    ``write()`` only remembers the latest value of an item. A background thread
+    writes the changed (dirty) items every *interval* seconds and when the writer
+    is stopped, so an item that changes every second is written once per interval.
+    As long as the writer is not started (or after it has been stopped) values are
+    written immediately.
+
+    :param interval: seconds between two flushes, 0 writes every value immediately
+    :param fsync:    flush every written cache file to disk
+    :param store:    optional :class:`SQLiteCacheStore` that holds all values instead of one file per item
+    """
+
+    def __init__(self, interval=CACHE_WRITE_INTERVAL, fsync=False, store=None):
+        self.interval = interval
+        self.fsync = fsync
+        self.store = store
+        self._lock = threading.Lock()
+        self._dirty = {}  # filename -> (value, cformat)
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.writes = 0  # values written to disk
+        self.coalesced = 0  # values that were replaced by a newer value before being written
+        self.flushes = 0
+
+    def configure(self, interval=None, fsync=None, store=None):
+        """
+        Change the settings of the writer (used while initializing SmartHomeNG)
+        """
+        if interval is not None:
+            self.interval = float(interval)
+        if fsync is not None:
+            self.fsync = fsync
+        if store is not None:
+            self.store = store if store != CACHE_STORE_FILES else None
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.store is not None:
+            self.store.release_preloaded()
+        if self.is_running() or not self.interval:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='items.cachewriter', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the background thread and write all dirty items
+
+        Never raises, so a failing cache write does not keep SmartHomeNG from shutting down.
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(10)
+            self._thread = None
+        try:
+            self.flush()
+        except Exception as e:
+            logger.exception(f'Problem writing item cache: {e}')
+
+    def write(self, filename, value, cformat=CACHE_FORMAT):
+        """
+        Queue the value of an item for writing
+
+        :param filename: path of the cache file of the item
+        :param value:    new value of the item
+        :param cformat:  CACHE_PICKLE or CACHE_JSON
+        """
+        if not self.is_running():
+            self._write([(filename, value, cformat)])
+            return
+        with self._lock:
+            if filename in self._dirty:
+                self.coalesced += 1
+            self._dirty[filename] = (value, cformat)
+
+    def preload(self):
+        """
+        Read all cached values of the store at once (before the items are created)
+
+        :returns: number of preloaded values, None if no store is used
+        """
+        if self.store is None:
+            return None
+        return self.store.preload()
+
+    def read(self, filename, tz, cformat=CACHE_FORMAT):
+        """
+        Read the cached value of an item, same return value as :func:`cache_read`
+        """
+        if self.store is not None:
+            return self.store.read(filename, tz)
+        return cache_read(filename, tz, cformat)
+
+    def exists(self, filename):
+        """
+        Return True, if a cached value for the item exists
+        """
+        with self._lock:
+            if filename in self._dirty:
+                return True
+        if self.store is not None:
+            return self.store.exists(filename)
+        return os.path.isfile(filename)
+
+    def pending(self):
+        """Return the number of items waiting to be written"""
+        with self._lock:
+            return len(self._dirty)
+
+    def flush(self):
+        """
+        Write all dirty items now
+        """
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+        if dirty:
+            self._write([(filename, value, cformat) for filename, (value, cformat) in dirty.items()])
+        self.flushes += 1
+
+    def _write(self, entries):
+        # a value that cannot be written is logged and does not affect the other entries
+        if self.store is not None:
+            try:
+                self.writes += self.store.write_many(entries, self.fsync)
+            except Exception as e:
+                logger.warning(f'Could not write {len(entries)} cached values to {self.store.filename}: {e}')
+        else:
+            for filename, value, cformat in entries:
+                if cache_write(filename, value, cformat, self.fsync):
+                    self.writes += 1
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.exception(f'Problem writing item cache: {e}')
+
+
+_cache_writer = CacheWriter()
+
+
+def get_cache_writer():
+    """Return the writer that is used for the cache of all items"""
+    return _cache_writer
 
 
 #####################################################################
 # Fade Method
 #####################################################################
 def fadejob(item):
+    """
+    Fade the value of an item according to ``item._fadingdetails``
+
+    If the fade engine is running, the fade is handed to the engine and the
+    function returns immediately. Otherwise the fade is done step by step in
+    the calling thread.
+    """
     if item._fading:
         return
     else:
         item._fading = True
 
+    if _fade_engine.is_running():
+        _fade_engine.add(item)
+        return
+
     # Determine if instant_set is needed
     instant_set = item._fadingdetails.get('instant_set', False)
     while item._fading:
-        current_value = item._value
-        target_dest = item._fadingdetails.get('dest')
-        fade_step = item._fadingdetails.get('step')
-        delta_time = item._fadingdetails.get('delta')
-        caller = item._fadingdetails.get('caller')
-
-        # Determine the direction of the fade (increase or decrease)
-        if current_value < target_dest:
-            # If fading upwards, but next step overshoots, set value to target_dest
-            if (current_value + fade_step) >= target_dest:
-                break
-            else:
-                fade_value = current_value + fade_step
-        elif current_value > target_dest:
-            # If fading downwards, but next step overshoots, set value to target_dest
-            if (current_value - fade_step) <= target_dest:
-                break
-            else:
-                fade_value = current_value - fade_step
-        else:
-            # If the current value has reached the destination, stop fading
+        fade_value = _next_fade_value(item)
+        if fade_value is None:
             break
 
         # Set the new value at the beginning
         if instant_set and item._fading:
             item._fadingdetails['value'] = fade_value
-            item(fade_value, 'Fader', caller)
+            item(fade_value, 'Fader', item._fadingdetails.get('caller'))
         else:
             instant_set = True  # Enable instant_set for the next loop iteration
 
         # Wait for the delta time before continuing to the next step
         item._lock.acquire()
-        item._lock.wait(delta_time)
+        item._lock.wait(item._fadingdetails.get('delta'))
         item._lock.release()
 
-        if fade_value == target_dest:
-            break
+    _finish_fade(item)
+
 
+def _next_fade_value(item):
+    """
+    Return the next value of a fade, None if the next step would reach or overshoot the destination
+    """
+    current_value = item._value
+    target_dest = item._fadingdetails.get('dest')
+    fade_step = item._fadingdetails.get('step')
+
+    # Determine the direction of the fade (increase or decrease)
+    if current_value < target_dest:
+        # If fading upwards, but next step overshoots, set value to target_dest
+        if (current_value + fade_step) >= target_dest:
+            return None
+        return current_value + fade_step
+    elif current_value > target_dest:
+        # If fading downwards, but next step overshoots, set value to target_dest
+        if (current_value - fade_step) <= target_dest:
+            return None
+        return current_value - fade_step
+    # If the current value has reached the destination, stop fading
+    return None
+
+
+def _finish_fade(item):
     # Stop fading
     if item._fading:
         item._fading = False
         item(item._fadingdetails.get('dest'), 'Fader', item._fadingdetails.get('caller'))
+
+
+class FadeEngine:
+    """
+    Runs all active fades in one thread
+
+    Every fade has a due time for its next step. The engine thread sleeps until
+    the earliest due time, advances all fades that are due and schedules their
+    next step *delta* seconds later. A fade that has been stopped (``item._fading``
+    set to False by an update) is dropped at its next due time.
+
+    As long as the engine is not started (or after it has been stopped),
+    :func:`fadejob` does the fade in the calling thread.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._queue = []  # heap of (due time, sequence number, fade entry)
+        self._active = {}  # item -> fade entry of the active fade
+        self._seq = 0
+        self._thread = None
+        self._alive = False
+        self.fades = 0  # fades handled by the engine
+        self.steps = 0  # fade steps done
+
+    def is_running(self):
+        return self._alive and self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.is_running():
+            return
+        self._alive = True
+        self._thread = threading.Thread(target=self._run, name='items.fader', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the engine thread, active fades are dropped
+        """
+        with self._cond:
+            self._alive = False
+            self._queue = []
+            self._active = {}
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(5)
+            self._thread = None
+
+    def add(self, item):
+        """
+        Start the fade of an item (``item._fadingdetails`` has to be set)
+        """
+        # entry: [item, instant_set]
+        entry = [item, item._fadingdetails.get('instant_set', False)]
+        with self._cond:
+            self._active[item] = entry
+            self.fades += 1
+            self._schedule(entry, time.monotonic())
+
+    def active(self):
+        """Return the number of active fades"""
+        with self._cond:
+            return len(self._active)
+
+    def _schedule(self, entry, due):
+        self._seq += 1
+        heapq.heappush(self._queue, (due, self._seq, entry))
+        if self._queue[0][2] is entry:
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._alive and (not self._queue or self._queue[0][0] > time.monotonic()):
+                    self._cond.wait(self._queue[0][0] - time.monotonic() if self._queue else None)
+                if not self._alive:
+                    return
+                now = time.monotonic()
+                due = []
+                while self._queue and self._queue[0][0] <= now:
+                    due.append(heapq.heappop(self._queue)[2])
+            for entry in due:
+                self._advance(entry)
+
+    def _advance(self, entry):
+        item = entry[0]
+        with self._cond:
+            if self._active.get(item) is not entry:
+                # replaced by a new fade of the item
+                return
+            if not item._fading:
+                # stopped by an update
+                del self._active[item]
+                return
+        try:
+            fade_value = _next_fade_value(item)
+            if fade_value is not None:
+                if entry[1]:
+                    item._fadingdetails['value'] = fade_value
+                    item(fade_value, 'Fader', item._fadingdetails.get('caller'))
+                else:
+                    entry[1] = True  # Enable instant_set for the next step
+                self.steps += 1
+        except Exception as e:
+            logger.exception(f'Item {item._path}: Problem fading: {e}')
+            fade_value = None
+            item._fading = False
+
+        with self._cond:
+            if self._active.get(item) is not entry:
+                return
+            if fade_value is not None and item._fading:
+                self._schedule(entry, time.monotonic() + item._fadingdetails.get('delta'))
+                return
+            del self._active[item]
+        try:
+            _finish_fade(item)
+        except Exception as e:
+            logger.exception(f'Item {item._path}: Problem finishing fade: {e}')
+
+
+_fade_engine = FadeEngine()
+
+
+def get_fade_engine():
+    """Return the engine that runs the fades of all items"""
+    return _fade_engine
@@ -32,7 +32,6 @@ import copy
 import json
 import threading
 import ast
-import re
 import sys
 
 import inspect
@@ -105,6 +104,7 @@ from .helpers import (  # noqa - cast_foo methods are accessed via globals()
     split_duration_value_string,
     cache_read,
     cache_write,
+    get_cache_writer,
     fadejob,
     cast_timestamp,
     cast_datetime,
@@ -112,7 +112,7 @@ from .helpers import (  # noqa - cast_foo methods are accessed via globals()
 from ._typehandler import TypeHandler, ListHandler, DictHandler, HANDLER_MAP  # noqa: F401
 from ._history import ItemHistory
 from ._logchange import log_on_change
-from ._eval import run_eval, run_on_xxx, run_on_update, run_on_change
+from ._eval import run_eval, run_on_xxx, run_on_update, run_on_change, compile_expressions
 from ._hysteresis import run_hysteresis, get_hysteresis_state, get_hysteresis_data
 from ._pathresolution import (
     get_absolutepath as _get_absolutepath,
@@ -166,7 +166,8 @@ from ._stackinfo import (
     get_calling_item_from_frame as _get_calling_item_from_frame,
     get_stack_info as _get_stack_info,
 )
-from ._fade import fade as _fade
+from ._fade import fade as _fade, compile_fade_patterns
+from ._propagation import trigger_dependents
 from ._json import jsonvars as _jsonvars, to_json as _to_json
 
 _items_instance = None
@@ -259,6 +260,9 @@ class Item:
         self._trigger_unexpanded = []
         self._trigger_condition_raw = []
         self._trigger_condition = None
+        self._eval_code = {}  # compiled eval/trigger_condition/on_xxx expressions, keyed by expression string
+        self._eval_compile_errors = {}  # compile errors of the expressions, keyed by attribute name
+        self._eval_env_base = None  # constant part of the eval namespace, built on first eval
 
         self._hysteresis_state_set = None  # is internally set, when the output value is set (e.g. for initialization)
         self._hysteresis_input = None
@@ -293,6 +297,7 @@ class Item:
         self._fading = False
         self._fadingdetails = {}
         self._items_to_trigger = []
+        self._trigger_rank = None  # position in the trigger graph, None if not batched (see _propagation.py)
         self._history = ItemHistory(self.shtime.now())
         self._lock = threading.Condition()
         self.__logics_to_trigger = []
@@ -327,8 +332,10 @@ class Item:
         #  if 'item_change_log' is set in etc/smarthome.yaml, set loglevel for logging every item change to INFO (instead of DEBUG)
         if hasattr(smarthome, '_item_change_log'):
             self._change_logger = logger.info
+            self._change_log_level = logging.INFO
         else:
             self._change_logger = logger.debug
+            self._change_log_level = logging.DEBUG
 
         if not self._sh._ignore_item_collision:
             if self._path.split('.')[-1] in _items_instance._item_methods:
@@ -630,7 +637,7 @@ class Item:
         if self._cache:
             self._cache = os.path.join(self._sh._cache_dir, self._path)
             try:
-                cache_time, self._value = cache_read(self._cache, self.shtime.tzinfo())
+                cache_time, self._value = get_cache_writer().read(self._cache, self.shtime.tzinfo())
                 self._value = self.cast(self._value)
                 self._history.set_from_cache(cache_time, 'Init:Cache')
 
@@ -642,7 +649,7 @@ class Item:
                 if str(e).startswith('[Errno 2]'):
                     logger.info(f'Item {self._path}: No cached value: {e}')
                 else:
-                    if os.stat(self._cache).st_size == 0:
+                    if os.path.isfile(self._cache) and os.stat(self._cache).st_size == 0:
                         logger.warning(
                             f'Item {self._path}: Problem reading cache: Filesize is 0 bytes. Deleting invalid cache file'
                         )
@@ -654,8 +661,8 @@ class Item:
         # Cache write/init
         #############################################################
         if self._cache:
-            if not os.path.isfile(self._cache):
-                cache_write(self._cache, self._value)
+            if not get_cache_writer().exists(self._cache):
+                get_cache_writer().write(self._cache, self._value)
                 logger.notice(f'Created cache for item {self._cache} in file {self._cache}')
 
         #############################################################
@@ -1177,6 +1184,11 @@ class Item:
     def _init_prerun(self):
         """Wire eval/hysteresis triggers before first run — delegates to _parsing.init_prerun()."""
         _init_prerun_fn(self)
+        self._compile_expressions()
+
+    def _compile_expressions(self):
+        """(Re-)compile eval, trigger_condition and on_xxx expressions — delegates to _eval.compile_expressions()."""
+        compile_expressions(self)
 
     def _init_start_scheduler(self):
         """Start crontab/cycle schedulers — delegates to _autotimer.init_start_scheduler()."""
@@ -1281,15 +1293,15 @@ class Item:
             # huge int values (created e.g. by eval) get dimensions above 4300 digits
             # when converted to strings and will raise a Value error.
             # This will stop threads and kill SHNG
-            if isinstance(value, int) and value.bit_length() > 14300:
-                logger.warning(
-                    f'int value is too large to convert to string: {value.bit_length()} bits → ignored for logging'
-                )
-                self._change_logger(
-                    'Item {} = {} via {} {} {}'.format(self._path, 'too large int', caller, source, dest)
-                )
-            else:
-                self._change_logger('Item {} = {} via {} {} {}'.format(self._path, value, caller, source, dest))
+            # the message is only formatted, if the logger is enabled for the level
+            if logger.isEnabledFor(self._change_log_level):
+                if isinstance(value, int) and value.bit_length() > 14300:
+                    logger.warning(
+                        f'int value is too large to convert to string: {value.bit_length()} bits → ignored for logging'
+                    )
+                    self._change_logger('Item %s = %s via %s %s %s', self._path, 'too large int', caller, source, dest)
+                else:
+                    self._change_logger('Item %s = %s via %s %s %s', self._path, value, caller, source, dest)
 
             # Write item value to log, if Item has attribute log_change set
             log_on_change(self, value, caller, source, dest)
@@ -1322,9 +1334,9 @@ class Item:
     def __update(self, value, caller='Logic', source=None, dest=None, key=None, index=None):
         def check_external_change(entry_type, entry_value):
             matches = []
-            for pattern in entry_value:
-                regex = re.compile(pattern, re.IGNORECASE)
-                if regex.match(f'{caller}:{source}'):
+            caller_source = f'{caller}:{source}'
+            for regex in compile_fade_patterns(entry_value):
+                if regex.match(caller_source):
                     if entry_type == 'stop_fade':
                         matches.append(True)  # Match in stop_fade, should stop
                     else:
@@ -1451,32 +1463,15 @@ class Item:
                     self.__trigger_logics(trigger_source_details)
             elif self.__logics_to_trigger:
                 self.__trigger_logics(trigger_source_details)
-            for item in self._items_to_trigger:
-                args = {'value': value, 'source': self._path}
-                self._sh.trigger(
-                    name='items.' + item.property.path,
-                    obj=item.__run_eval,
-                    value=args,
-                    by=caller,
-                    source=source,
-                    dest=dest,
-                )
-            for item in self._hysteresis_items_to_trigger:
-                args = {'value': value, 'source': self._path}
-                self._sh.trigger(
-                    name='items.' + item.property.path,
-                    obj=item.__run_hysteresis,
-                    value=args,
-                    by=caller,
-                    source=source,
-                    dest=dest,
-                )
+            trigger_dependents(
+                self, value, caller, source, dest, lambda item: item.__run_eval, lambda item: item.__run_hysteresis
+            )
             # ms: call run_on_change() from here - after eval is run
             self.__run_on_change(value, caller=caller, source=source, dest=dest)
 
         if _changed and self._cache and not self._fading:
             try:
-                cache_write(self._cache, self._value)
+                get_cache_writer().write(self._cache, self._value)
             except Exception as e:
                 logger.warning('Item: {}: could not update cache {}'.format(self._path, e))
 
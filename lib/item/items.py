@@ -53,11 +53,22 @@ They can be used the following way: To call eg. **get_toplevel_items()**, use th
 """
 
 import logging
+import os
 import re
 
 import lib.utils
 
 from .item import Item
+from ._index import ItemIndex
+from ._propagation import build_trigger_graph
+from .helpers import (
+    get_cache_writer,
+    get_fade_engine,
+    SQLiteCacheStore,
+    CACHE_STORE_FILES,
+    CACHE_STORE_SQLITE,
+    CACHE_STORE_FILENAME,
+)
 from .structs import Structs
 
 
@@ -75,8 +86,9 @@ class Items:
     :type smarthome: object
     """
 
-    __items = []  # list with the paths of all items that are defined
     __item_dict = {}  # dict with all the items that are defined in the form: {"<item-path>": "<item-object>", ...}
+    __sorted_paths = None  # cached sorted list of the item paths, reset when an item is added or removed
+    __index = None  # attribute index and path trie of the items in __item_dict (see _index.py)
 
     _children = []  # List of top level items
 
@@ -86,6 +98,8 @@ class Items:
 
     structs = None
 
+    _trigger_cycles = []  # lists of item paths that trigger each other (found by build_trigger_graph)
+
     _item_methods = [name for name in dir(Item) if name[0] != '_']
 
     def __init__(self, smarthome):
@@ -105,6 +119,7 @@ class Items:
             )
 
         _items_instance = self
+        self.__sorted_paths = None
         self.structs = Structs(self._sh)
 
         self._sh._ignore_item_collision = getattr(self._sh, '_ignore_item_collision', 'False') == 'True'
@@ -181,6 +196,11 @@ class Items:
         self._sh.shng_status['details'] = 'Structs'
         self.structs.load_struct_definitions()
 
+        self.configure_cache_writer()
+        preloaded = get_cache_writer().preload()
+        if preloaded is not None:
+            self.logger.info(f'Preloaded {preloaded} cached item values from {get_cache_writer().store.filename}')
+
         # --------------------------------------------------------------------
         # Read in item definitions
         #
@@ -188,7 +208,11 @@ class Items:
         item_conf = None
         item_conf = lib.config.parse_itemsdir(env_dir, item_conf)
         item_conf = lib.config.parse_itemsdir(
-            items_dir, item_conf, addfilenames=True, struct_dict=self.structs._struct_definitions
+            items_dir,
+            item_conf,
+            addfilenames=True,
+            struct_dict=self.structs._struct_definitions,
+            workers=self.get_parse_workers(),
         )
 
         for attr, value in item_conf.items():
@@ -220,6 +244,9 @@ class Items:
         for item in self.return_items():
             item._init_prerun()
 
+        # Rank items by their eval/hysteresis triggers for batched evaluation and report trigger cycles
+        self._trigger_cycles = build_trigger_graph(self.return_items())
+
         self._sh.shng_status = {'code': 14, 'text': 'Starting: Preparing loaded items', 'details': 'start scheduler'}
         # Start schedulers of the items which have a crontab or a cycle attribute
         for item in self.return_items():
@@ -243,6 +270,11 @@ class Items:
         # gend = time.time()
         # self.logger.warning(f"_init_run: Totals: duration {gend-gstart}, eval execution time = {gduration} for {gcount} items")
 
+        # From now on cache values are written in the background
+        get_cache_writer().start()
+        # and fades are run by the fade engine
+        get_fade_engine().start()
+
         self._sh.shng_status = {'code': 14, 'text': 'Starting: Preparing loaded items'}
 
     #        self.item_count = len(self.__items)
@@ -263,9 +295,20 @@ class Items:
         :type item: object
         """
 
-        if path not in self.__items:
-            self.__items.append(path)
+        index = self._get_index()
+        if path not in self.__item_dict:
+            self.__sorted_paths = None
         self.__item_dict[path] = item
+        index.add(path, item)
+
+    def _get_index(self):
+        """
+        Return the index of the registered items (it is rebuilt if the registry has been replaced)
+        """
+        index = self.__index
+        if index is None or index.registry is not self.__item_dict:
+            index = self.__index = ItemIndex(self.__item_dict)
+        return index
 
     # aus bin/smarthome.py
     #    def __iter__(self):
@@ -281,13 +324,14 @@ class Items:
         :type item: object
         """
 
-        if item.property.path not in self.__items:
+        if item.property.path not in self.__item_dict:
             return
 
         # remove item from Items data
         try:
+            self._get_index().remove(item.property.path)
             del self.__item_dict[item.property.path]
-            self.__items.remove(item.property.path)
+            self.__sorted_paths = None
         except Exception as e:
             self.logger.warning(f'Error occured while trying to remove item {item.property.path}: {e}')
 
@@ -324,8 +368,7 @@ class Items:
         :rtype: object
         """
 
-        if string in self.__items:
-            return self.__item_dict[string]
+        return self.__item_dict.get(string)
 
     def return_items(self, ordered=False):
         """
@@ -339,11 +382,17 @@ class Items:
         """
 
         if ordered:
-            for item in sorted(self.__items):
-                yield self.__item_dict[item]
+            sorted_paths = self.__sorted_paths
+            if sorted_paths is None:
+                sorted_paths = self.__sorted_paths = sorted(self.__item_dict)
+            for path in sorted_paths:
+                item = self.__item_dict.get(path)
+                if item is not None:
+                    yield item
         else:
-            for item in self.__items:
-                yield self.__item_dict[item]
+            # iterate over a copy, items may be added or removed while the caller iterates
+            for item in list(self.__item_dict.values()):
+                yield item
 
     def match_items(self, regex):
         """
@@ -356,34 +405,26 @@ class Items:
         :rtype: list
         """
 
-        regex, __, attr = regex.partition(':')
+        pattern, __, attr = regex.partition(':')
         # regex = regex.replace('.', '\.').replace('*', '.*') + '$'
-        regex = regex.replace('.', r'\.').replace('*', '.*') + '$'
+        regex = pattern.replace('.', r'\.').replace('*', '.*') + '$'
         regex = re.compile(regex)
         attr, __, val = attr.partition('[')
         val = val.rstrip(']')
+        # the index returns the items matching the literal start of the pattern (or having the attribute)
+        items = self._get_index().match(pattern, attr)
         if attr != '' and val != '':
             return [
-                self.__item_dict[item]
-                for item in self.__items
-                if regex.match(item)
-                and attr in self.__item_dict[item].conf
-                and (
-                    (
-                        type(self.__item_dict[item].conf[attr]) in [list, dict]
-                        and val in self.__item_dict[item].conf[attr]
-                    )
-                    or (val == self.__item_dict[item].conf[attr])
-                )
+                item
+                for item in items
+                if regex.match(item.property.path)
+                and attr in item.conf
+                and ((type(item.conf[attr]) in [list, dict] and val in item.conf[attr]) or (val == item.conf[attr]))
             ]
         elif attr != '':
-            return [
-                self.__item_dict[item]
-                for item in self.__items
-                if regex.match(item) and attr in self.__item_dict[item].conf
-            ]
+            return [item for item in items if regex.match(item.property.path) and attr in item.conf]
         else:
-            return [self.__item_dict[item] for item in self.__items if regex.match(item)]
+            return [item for item in items if regex.match(item.property.path)]
 
     def _attribute_find(self, attr, attr_list):
         """
@@ -436,11 +477,8 @@ class Items:
         :rtype: list
         """
 
-        for item in self.__items:
-            # if conf in self.__item_dict[item].conf:
-            #     yield self.__item_dict[item]
-            if self._attribute_find(conf, self.return_item(item).property.attributes):
-                yield self.__item_dict[item]
+        for item in self._get_index().find(conf):
+            yield item
 
     def find_children(self, parent, conf):
         """
@@ -455,6 +493,9 @@ class Items:
         :rtype: list
         """
 
+        if isinstance(parent, Item) and self.__item_dict.get(parent.property.path) is parent:
+            return self._get_index().find_below(parent.property.path, conf)
+
         children = []
         for item in parent:
             # if conf in item.conf:
@@ -471,18 +512,62 @@ class Items:
         :return: number of items
         :rtype: int
         """
-        return len(self.__items)
+        return len(self.__item_dict)
+
+    def get_parse_workers(self):
+        """
+        Return the number of worker processes for loading the item files (``item_parse_workers`` in smarthome.yaml)
+
+        Default is 1 (no worker processes), 0 starts one worker process per cpu.
+        """
+        workers = getattr(self._sh, '_item_parse_workers', 1)
+        try:
+            return max(int(workers), 0)
+        except ValueError:
+            self.logger.error(f'Invalid value for item_parse_workers in smarthome.yaml: {workers}')
+            return 1
+
+    def configure_cache_writer(self):
+        """
+        Configure the background writer for the item cache from smarthome.yaml
+
+        - ``item_cache_interval``: seconds between writes of changed values (0 = write immediately)
+        - ``item_cache_fsync``: flush cache files to disk after writing
+        - ``item_cache_store``: ``files`` (one file per item, default) or ``sqlite`` (one database for all items)
+
+        The database of the ``sqlite`` store is kept in var/db, not in var/cache: every file in var/cache
+        without a matching item is reported as unused by the admin interface.
+        """
+        writer = get_cache_writer()
+        interval = getattr(self._sh, '_item_cache_interval', None)
+        if interval is not None:
+            try:
+                writer.configure(interval=float(interval))
+            except ValueError:
+                self.logger.error(f'Invalid value for item_cache_interval in smarthome.yaml: {interval}')
+        writer.configure(fsync=lib.utils.Utils.to_bool(getattr(self._sh, '_item_cache_fsync', False), False))
+        store = str(getattr(self._sh, '_item_cache_store', CACHE_STORE_FILES)).lower()
+        if store == CACHE_STORE_SQLITE:
+            db_dir = os.path.join(self._sh.get_vardir(), 'db')
+            os.makedirs(db_dir, exist_ok=True)
+            writer.configure(store=SQLiteCacheStore(os.path.join(db_dir, CACHE_STORE_FILENAME)))
+        elif store != CACHE_STORE_FILES:
+            self.logger.error(
+                f'Invalid value for item_cache_store in smarthome.yaml: {store}, using {CACHE_STORE_FILES}'
+            )
 
     def stop(self, signum=None, frame=None):
         """
         Stop what all items are doing
 
-        At the moment, it stops fading of all items
+        It stops fading of all items and writes the cache values that are not written yet
         """
-        for item in self.__items:
-            self.__item_dict[item]._fading = False
-            with self.__item_dict[item]._lock:
-                self.__item_dict[item]._lock.notify_all()
+        for item in list(self.__item_dict.values()):
+            item._fading = False
+            with item._lock:
+                item._lock.notify_all()
+        get_fade_engine().stop()
+        get_cache_writer().stop()
 
     def add_plugin_attribute(self, plugin_name, attribute_name, attribute):
         """
@@ -179,6 +179,7 @@ class Property:
                 self._item._eval = None
             else:
                 self._item._eval = value
+            self._item._compile_expressions()
             return
         else:
             self._type_error('non-non-string')
@@ -29,6 +29,7 @@ import os
 import datetime
 import pickle
 import re
+import threading
 import pytz
 from babel.dates import format_datetime, get_timezone_name
 
@@ -56,6 +57,9 @@ class Logs:
     _all_handlers_logger_name = '_shng_all_handlers_logger'
     _all_handlers = {}
 
+    _log_queue = None  # LogQueue, if the handlers run in a dedicated thread (section 'shng_queue' in logging.yaml)
+    _queued_handlers = {}  # handler -> QueuedHandler
+
     def __init__(self, sh):
 
         self.logger = logging.getLogger(__name__)
@@ -81,6 +85,7 @@ class Logs:
             print()
             exit(1)
 
+        queue_config = config_dict.pop('shng_queue', None)
         config_dict = self.add_all_handlers_logger(config_dict)
 
         # Default loglevels are:
@@ -158,8 +163,75 @@ class Logs:
         # Initialize MemLog Handler to output root log entries to smartVISU
         self.initMemLog()
 
+        self.configure_queue(queue_config)
         return True
 
+    def configure_queue(self, queue_config):
+        """
+        Run all configured handlers in a dedicated thread, if enabled in logging.yaml
+
+        The handlers of all loggers are replaced by QueuedHandler objects, that only put the
+        records into a bounded queue. The logger that holds all handlers keeps the original
+        handlers.
+
+        :param queue_config: content of the section 'shng_queue' of logging.yaml (or None)
+        """
+        self.stop_queue()
+        if not queue_config or not queue_config.get('enabled', True):
+            return
+
+        self._log_queue = LogQueue(
+            max_size=int(queue_config.get('size', 10000)), policy=queue_config.get('policy', QUEUE_DROP_NEWEST)
+        )
+        self._log_queue.start()
+        loggers = [logging.getLogger('')] + [
+            lg for lg in logging.root.manager.loggerDict.values() if isinstance(lg, logging.Logger)
+        ]
+        for lg in loggers:
+            if lg.name == self._all_handlers_logger_name:
+                continue
+            lg.handlers = [self.get_queued_handler(h) for h in lg.handlers]
+        self.logger.info(f'Logging through queue: size={self._log_queue.max_size}, policy={self._log_queue.policy}')
+
+    def get_queued_handler(self, handler):
+        """
+        Return the QueuedHandler for a handler (or the handler itself, if logging does not use a queue)
+        """
+        if self._log_queue is None or isinstance(handler, QueuedHandler):
+            return handler
+        queued = self._queued_handlers.get(handler)
+        if queued is None:
+            queued = QueuedHandler(handler, self._log_queue)
+            self._queued_handlers[handler] = queued
+        return queued
+
+    def get_original_handler(self, handler):
+        """
+        Return the handler a QueuedHandler stands in for (or the handler itself)
+        """
+        if isinstance(handler, QueuedHandler):
+            return handler.target
+        return handler
+
+    def stop_queue(self):
+        """
+        Stop the log queue thread after the queued records have been handled
+        """
+        if self._log_queue is not None:
+            self._log_queue.stop()
+            self._log_queue = None
+        self._queued_handlers = {}
+
+    def get_queue_metrics(self):
+        """
+        Return the metrics of the log queue
+
+        :return: dict with queue_depth, handled and dropped (or None, if logging does not use a queue)
+        """
+        if self._log_queue is None:
+            return None
+        return self._log_queue.get_metrics()
+
     def add_logging_level(self, description, value):
         """
         Adds a new Logging level to the standard python logging
@@ -215,7 +287,7 @@ class Logs:
         log_mem.setFormatter(formatter)
 
         # add handler to root logger
-        logging.getLogger('').addHandler(log_mem)
+        logging.getLogger('').addHandler(self.get_queued_handler(log_mem))
         return
 
     def add_log(self, name, log):
@@ -296,12 +368,16 @@ class Logs:
             self.logger.error('reload_logging_config: failed to load logging config from disk')
             return False
 
+        queue_config = config_dict.pop('shng_queue', None)
         config_dict = self.add_all_handlers_logger(config_dict)
 
+        # handle the queued records with the old handlers, before dictConfig closes them
+        self.stop_queue()
+
         # Remove existing MemLog handler from root before dictConfig to avoid duplicates
         root_logger = logging.getLogger('')
         for h in list(root_logger.handlers):
-            if isinstance(h, ShngMemLogHandler):
+            if isinstance(h, (ShngMemLogHandler, QueuedHandler)):
                 root_logger.removeHandler(h)
 
         try:
@@ -314,6 +390,7 @@ class Logs:
         self._all_handlers = {}
 
         self.initMemLog()
+        self.configure_queue(queue_config)
         self.logger.notice('Logging configuration reloaded from logging.yaml')
         return True
 
@@ -346,7 +423,7 @@ class Logs:
 
         if self._all_handlers == {}:
             self.get_all_handlernames()
-        return self._all_handlers[handlername]
+        return self.get_queued_handler(self._all_handlers[handlername])
 
 
 # -------------------------------------------------------------------------------
@@ -889,12 +966,256 @@ class ShngTimedRotatingFileHandler(logging.handlers.TimedRotatingFileHandler):
         self.rolloverAt = newRolloverAt
 
 
+QUEUE_DROP_NEWEST = 'drop_newest'
+QUEUE_DROP_OLDEST = 'drop_oldest'
+QUEUE_BLOCK = 'block'
+
+
+class LogQueue:
+    """
+    Bounded queue of log records and the thread that hands them to the handlers
+
+    Used, if section ``shng_queue`` of logging.yaml is enabled. Threads that log only put
+    the records into the queue, so slow handlers (file I/O on an SD card, memory logs
+    with listeners) do not stall item processing.
+
+    :param max_size: maximum number of queued records
+    :param policy:   what to do if the queue is full: drop the new record (``drop_newest``),
+                     drop the oldest queued record (``drop_oldest``) or wait (``block``)
+    """
+
+    def __init__(self, max_size=10000, policy=QUEUE_DROP_NEWEST):
+        self.max_size = max(1, max_size)
+        self.policy = policy if policy in (QUEUE_DROP_NEWEST, QUEUE_DROP_OLDEST, QUEUE_BLOCK) else QUEUE_DROP_NEWEST
+        self._cond = threading.Condition()
+        self._queue = collections.deque()  # entries: (handler, record)
+        self._thread = None
+        self._alive = False
+        self.handled = 0
+        self.dropped = 0
+
+    def put(self, handler, record):
+        """
+        Queue a record for a handler
+
+        If the queue thread is not running, the record is handled directly.
+
+        :returns: False, if the record has been dropped
+        """
+        with self._cond:
+            if self._alive:
+                while len(self._queue) >= self.max_size:
+                    if self.policy == QUEUE_DROP_OLDEST:
+                        self._queue.popleft()
+                        self.dropped += 1
+                    elif self.policy == QUEUE_BLOCK and threading.current_thread() is not self._thread:
+                        self._cond.wait()
+                        if not self._alive:
+                            break
+                    else:
+                        self.dropped += 1
+                        return False
+                if self._alive:
+                    self._queue.append((handler, record))
+                    self._cond.notify_all()
+                    return True
+        handler.handle(record)
+        return True
+
+    def start(self, name='log.queue'):
+        if self._thread is not None:
+            return
+        self._alive = True
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """
+        Stop the thread after the queued records have been handled (or *timeout* expired)
+        """
+        with self._cond:
+            self._alive = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            if self._thread is not threading.current_thread():
+                self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and self._alive:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                handler, record = self._queue.popleft()
+                self._cond.notify_all()
+            try:
+                handler.handle(record)
+            except Exception:
+                handler.handleError(record)
+            self.handled += 1
+
+    def depth(self):
+        """Return the number of queued records"""
+        with self._cond:
+            return len(self._queue)
+
+    def get_metrics(self):
+        """Return the metrics as a dict"""
+        return {'queue_depth': self.depth(), 'handled': self.handled, 'dropped': self.dropped}
+
+
+class QueuedHandler(logging.Handler):
+    """
+    Stand-in for a handler, that puts the records into the LogQueue instead of handling them
+
+    The level of the original handler is checked before queueing, so changes of the handler
+    level (e.g. in the admin interface) stay effective. ``level`` and ``setLevel()`` are those
+    of the original handler, other attributes (e.g. baseFilename) are taken from it as well.
+    """
+
+    def __init__(self, target, log_queue):
+        super().__init__()
+        self.target = target
+        self._log_queue = log_queue
+        # not set via the name property, which would replace the original handler in logging._handlers
+        self._name = target.name
+
+    def __getattr__(self, name):
+        try:
+            target = self.__dict__['target']
+        except KeyError:
+            raise AttributeError(name)
+        return getattr(target, name)
+
+    def __repr__(self):
+        return f'<QueuedHandler {self.target!r}>'
+
+    @property
+    def level(self):
+        return self.target.level
+
+    @level.setter
+    def level(self, level):
+        # logging.Handler.__init__() sets the level before the target is known
+        if 'target' in self.__dict__:
+            self.target.setLevel(level)
+
+    def handle(self, record):
+        if record.levelno < self.target.level:
+            return False
+        if record.args:
+            # merge the arguments now, they might change before the record is handled
+            record.msg = record.getMessage()
+            record.args = None
+        return self._log_queue.put(self.target, record)
+
+    def emit(self, record):
+        self.handle(record)
+
+    def close(self):
+        # logging.shutdown() closes the QueuedHandlers before the original handlers:
+        # handle the queued records while the original handlers are still open
+        self._log_queue.stop()
+        super().close()
+
+
+class MemLogCacheWriter:
+    """
+    Background writer for the cache files of memory logs (ShngMemLogHandler with ``cache: True``)
+
+    Logging a record only marks the memory log as changed. The writer thread saves
+    a changed memory log at most once per ``cache_interval`` seconds of its handler.
+    Pending changes are saved when the handler is closed (logging.shutdown() on stop
+    of SmartHomeNG or on a reconfiguration of logging).
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._due = {}  # handler -> time.monotonic() when its cache has to be written
+        self._thread = None
+        self.writes = 0
+
+    def schedule(self, handler):
+        """
+        Schedule writing the cache of a handler after its cache interval
+        """
+        with self._cond:
+            if handler not in self._due:
+                self._due[handler] = time.monotonic() + handler._cache_interval
+                self._cond.notify()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='log.memlog_cache', daemon=True)
+                self._thread.start()
+
+    def flush(self, handler=None):
+        """
+        Write pending caches now (of one handler or of all handlers)
+        """
+        with self._cond:
+            if handler is None:
+                handlers = list(self._due)
+                self._due.clear()
+            elif self._due.pop(handler, None) is not None:
+                handlers = [handler]
+            else:
+                handlers = []
+        for h in handlers:
+            self.write(h)
+
+    def pending(self):
+        with self._cond:
+            return len(self._due)
+
+    def write(self, handler, fsync=True):
+        handler._cache_pending = False
+        handler.acquire()
+        try:
+            entries = handler._log.export(int(handler._maxlen))
+        finally:
+            handler.release()
+        try:
+            handler._cache_write(logs_instance.logger, handler._cachefile, entries, fsync)
+            self.writes += 1
+        except Exception as e:
+            logs_instance.logger.warning(f'Memory Log {handler._log._name}: could not update cache {e}')
+
+    def _next(self):
+        with self._cond:
+            while True:
+                if not self._due:
+                    self._cond.wait()
+                    continue
+                handler, due = min(self._due.items(), key=lambda entry: entry[1])
+                wait = due - time.monotonic()
+                if wait <= 0:
+                    del self._due[handler]
+                    return handler
+                self._cond.wait(wait)
+
+    def _run(self):
+        while True:
+            self.write(self._next())
+
+
+_memlog_cache_writer = MemLogCacheWriter()
+
+
 class ShngMemLogHandler(logging.StreamHandler):
     """
     LogHandler used by MemLog
     """
 
-    def __init__(self, logname='undefined', maxlen=35, level=logging.NOTSET, mapping: list | None = None, cache=False):
+    def __init__(
+        self,
+        logname='undefined',
+        maxlen=35,
+        level=logging.NOTSET,
+        mapping: list | None = None,
+        cache=False,
+        cache_interval=10,
+    ):
         if mapping is None:
             mapping = ['time', 'thread', 'level', 'message']
         super().__init__()
@@ -911,6 +1232,8 @@ class ShngMemLogHandler(logging.StreamHandler):
         # Dummy baseFileName for output in shngadmin (and priv_develop plugin)
         self.baseFilename = "'" + self._log._name + "'"
         self._cache = cache
+        self._cache_interval = cache_interval  # seconds between writes of the cache file (0 = on every record)
+        self._cache_pending = False
         self._maxlen = maxlen
         # save cache files in var/log/cache directory
         cache_directory = os.path.join(
@@ -943,10 +1266,18 @@ class ShngMemLogHandler(logging.StreamHandler):
         except Exception:
             self.handleError(record)
         if self._cache is True:
-            try:
-                self._cache_write(logs_instance.logger, self._cachefile, self._log.export(int(self._maxlen)))
-            except Exception as e:
-                logs_instance.logger.warning(f'Memory Log {self._log._name}: could not update cache {e}')
+            if self._cache_interval <= 0:
+                # written on every record: no fsync, that would cost far more than the write itself
+                _memlog_cache_writer.write(self, fsync=False)
+            elif not self._cache_pending:
+                # the cache file is written by the MemLogCacheWriter thread
+                self._cache_pending = True
+                _memlog_cache_writer.schedule(self)
+
+    def close(self):
+        if self._cache is True:
+            _memlog_cache_writer.flush(self)
+        super().close()
 
     ##############################################################################################
     # Cache Methods, taken from operationlog plugin by Jan Troelsen, Oliver Hinckel, Bernd Meiners
@@ -985,9 +1316,19 @@ class ShngMemLogHandler(logging.StreamHandler):
             value = pickle.load(f)
         return (dt, value)
 
-    def _cache_write(self, logger, filename, value):
+    def _cache_write(self, logger, filename, value, fsync=True):
+        # write to a temporary file and replace the cache file, so a crash never leaves a truncated cache
+        tmp_filename = filename + '.tmp'
         try:
-            with open(filename, 'wb') as f:
+            with open(tmp_filename, 'wb') as f:
                 pickle.dump(value, f)
+                if fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_filename, filename)
         except IOError:
             logger.warning('Could not write to {}'.format(filename))
+            try:
+                os.remove(tmp_filename)
+            except OSError:
+                pass
@@ -48,10 +48,15 @@ They can be used the following way: To call eg. **enable_logic(name)**, use the
 
 """
 
+import hashlib
+import importlib.util
 import logging
+import marshal
 import os
+import struct
+import threading
 
-from collections import OrderedDict
+from collections import OrderedDict, deque
 
 import ast
 
@@ -104,6 +109,9 @@ class Logics:
         self._workers = []
         self._logics = {}
         # self._bytecode = {}
+        # the cache directory is created at startup by SmartHome.create_directories()
+        cache_dir = os.path.join(smarthome._var_dir, 'logic_cache')
+        self._bytecode_cache = LogicBytecodeCache(cache_dir if os.path.isdir(cache_dir) else None)
         self.alive = True
 
         global _logics_instance
@@ -134,6 +142,23 @@ class Logics:
 
         self._groups = self._load_groups()
         self._cleanup_stale_group_refs()
+        self._prune_bytecode_cache()
+
+        # optionally watch the logic files and reload changed logics
+        watch_interval = self.get_watch_interval()
+        if watch_interval > 0:
+            self.scheduler.add('sh.logics_watch', self.check_logic_files, prio=8, cycle=watch_interval, offset=0)
+
+    def get_watch_interval(self):
+        """
+        Return the interval in seconds for checking the logic files (``logics_watch_interval`` in smarthome.yaml)
+        """
+        interval = getattr(self._sh, '_logics_watch_interval', 0)
+        try:
+            return max(int(interval), 0)
+        except ValueError:
+            logger.error(f'Invalid value for logics_watch_interval in smarthome.yaml: {interval}')
+            return 0
 
     def _cleanup_stale_group_refs(self):
         """
@@ -443,12 +468,42 @@ class Logics:
         """
         Function to reload all logics
 
-        It generates new bytecode for every logic that is loaded. The configured triggers
-        are not loaded from the configuration, so the triggers that where active before the
-        reload remain active.
+        It generates new bytecode for every logic that is loaded and whose file has changed
+        since it was compiled. The configured triggers are not loaded from the configuration,
+        so the triggers that where active before the reload remain active.
+
+        :return: names of the logics that have been recompiled
+        :rtype: list
         """
+        reloaded = []
         for logic in self:
-            self[logic]._generate_bytecode()
+            if self[logic]._generate_bytecode():
+                reloaded.append(logic)
+        logger.info(f'reload_logics: {len(reloaded)} of {len(self._logics)} logics recompiled')
+        self._prune_bytecode_cache()
+        return reloaded
+
+    def _prune_bytecode_cache(self):
+        """
+        Remove the bytecode cache files of logics that are no longer loaded (deleted or renamed logic files)
+        """
+        pathnames = [logic._pathname for logic in self._logics.values() if getattr(logic, '_pathname', None)]
+        removed = self._bytecode_cache.prune(pathnames)
+        if removed:
+            logger.info(f'Removed {removed} bytecode cache file(s) of logics that are no longer loaded')
+
+    def check_logic_files(self):
+        """
+        Reload the logics whose files have changed
+
+        Called periodically by the scheduler, if ``logics_watch_interval`` is configured
+        in etc/smarthome.yaml. Only the bytecode of a changed logic is replaced, the other
+        logics and the triggers are not touched.
+        """
+        for name in list(self._logics):
+            logic = self._logics.get(name)
+            if logic is not None and logic.source_changed() and logic._generate_bytecode():
+                logger.info(f"Logic '{name}' reloaded, file '{logic._pathname}' has changed")
 
     def is_logic_loaded(self, name):
         """
@@ -519,6 +574,8 @@ class Logics:
         except AttributeError:
             info['description'] = ''
         info['visu_access'] = self.visu_access(logic.name)
+        info['executor'] = getattr(logic, 'executor', 'thread')
+        info['run_stats'] = logic.get_run_statistics()
         #        info['watch_item_list'] = []
         return info
 
@@ -1056,9 +1113,201 @@ class Logics:
 
         # save /etc/logic.yaml
         shyaml.yaml_save_roundtrip(self._logic_conf, conf, True)
+        self._prune_bytecode_cache()
         return True
 
 
+# ------------------------------------------------------------------------------------
+#   Class LogicBytecodeCache
+# ------------------------------------------------------------------------------------
+
+
+class LogicBytecodeCache:
+    """
+    Cache of the compiled code of the logics (in var/logic_cache)
+
+    Each cache file holds the modification time, the size and the sha1 hash of the
+    logic file it was compiled from, followed by the marshalled code object. If the
+    modification time and size of the logic file are unchanged, the code is loaded
+    without reading the logic file. Otherwise the hash decides whether the cached
+    code can still be used. The cache files are only valid for the Python version
+    that wrote them.
+
+    :param directory: existing directory for the cache files (None = do not cache)
+    """
+
+    _header = struct.Struct('<4sqq20s')  # magic number, mtime_ns, size, sha1 of the source
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    def _cache_filename(self, pathname):
+        return os.path.join(self.directory, hashlib.sha1(pathname.encode()).hexdigest() + '.code')
+
+    def _read(self, filename):
+        try:
+            with open(filename, 'rb') as f:
+                data = f.read()
+            magic, mtime_ns, size, digest = self._header.unpack_from(data)
+        except (OSError, struct.error):
+            return None
+        if magic != importlib.util.MAGIC_NUMBER:
+            return None
+        return mtime_ns, size, digest, data[self._header.size :]
+
+    def _write(self, filename, stat_key, digest, code):
+        tmp_filename = filename + '.tmp'
+        try:
+            with open(tmp_filename, 'wb') as f:
+                f.write(self._header.pack(importlib.util.MAGIC_NUMBER, *stat_key, digest))
+                f.write(marshal.dumps(code))
+            os.replace(tmp_filename, filename)
+        except OSError as e:
+            logger.info(f"Could not write bytecode cache file '{filename}': {e}")
+
+    def compile(self, pathname):
+        """
+        Return the code object of a logic file, from the cache or compiled
+
+        :param pathname: path of the logic file
+        :return: tuple (code, stat_key), stat_key is (mtime_ns, size) of the logic file
+        :raises: OSError if the file cannot be read, SyntaxError etc. if it cannot be compiled
+        """
+        st = os.stat(pathname)
+        stat_key = (st.st_mtime_ns, st.st_size)
+        cache_filename = cached = None
+        if self.directory:
+            cache_filename = self._cache_filename(pathname)
+            cached = self._read(cache_filename)
+            if cached is not None and cached[:2] == stat_key:
+                try:
+                    code = marshal.loads(cached[3])
+                    self.hits += 1
+                    return code, stat_key
+                except (EOFError, ValueError, TypeError):
+                    cached = None
+
+        with open(pathname, 'rb') as f:
+            source = f.read()
+        digest = hashlib.sha1(source).digest()
+        if cached is not None and cached[2] == digest:
+            # the file has been touched but not changed
+            try:
+                code = marshal.loads(cached[3])
+                self.hits += 1
+                self._write(cache_filename, stat_key, digest, code)
+                return code, stat_key
+            except (EOFError, ValueError, TypeError):
+                pass
+
+        self.misses += 1
+        code = compile(source.decode('UTF-8').lstrip('\ufeff'), pathname, 'exec')  # remove BOM
+        if cache_filename is not None:
+            self._write(cache_filename, stat_key, digest, code)
+        return code, stat_key
+
+    def prune(self, pathnames):
+        """
+        Remove the cache files that do not belong to one of the given logic files
+
+        :param pathnames: paths of the logic files whose cache files are kept
+        :return: number of removed cache files
+        """
+        if not self.directory:
+            return 0
+        keep = {os.path.basename(self._cache_filename(pathname)) for pathname in pathnames}
+        try:
+            filenames = os.listdir(self.directory)
+        except OSError as e:
+            logger.info(f"Could not read bytecode cache directory '{self.directory}': {e}")
+            return 0
+        removed = 0
+        for filename in filenames:
+            if filename in keep or not filename.endswith(('.code', '.code.tmp')):
+                continue
+            try:
+                os.remove(os.path.join(self.directory, filename))
+                removed += 1
+            except OSError as e:
+                logger.info(f"Could not remove bytecode cache file '{filename}': {e}")
+        return removed
+
+
+# ------------------------------------------------------------------------------------
+#   Class LogicRunStatistics
+# ------------------------------------------------------------------------------------
+
+
+class LogicRunStatistics:
+    """
+    Runtime statistics of a logic
+
+    The number of runs, the mean and the maximum duration cover all runs since the
+    logic was loaded, the 95th percentile is computed from the last *size* runs.
+
+    :param size: number of durations kept for the percentile
+    """
+
+    def __init__(self, size=100):
+        self._lock = threading.Lock()
+        self._durations = deque(maxlen=size)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last_exception = None
+        self.last_exception_time = None
+
+    def add_run(self, duration):
+        """
+        Record the duration (in seconds) of a run
+        """
+        with self._lock:
+            self._durations.append(duration)
+            self.count += 1
+            self.total += duration
+            if duration > self.max:
+                self.max = duration
+
+    def add_exception(self, text, timestamp):
+        """
+        Record an exception that ended a run
+        """
+        with self._lock:
+            self.last_exception = text
+            self.last_exception_time = timestamp
+
+    def p95(self):
+        """
+        Return the 95th percentile of the recorded durations (nearest rank)
+        """
+        with self._lock:
+            durations = sorted(self._durations)
+        if not durations:
+            return 0.0
+        return durations[-((len(durations) * 5) // 100) - 1]
+
+    def get(self):
+        """
+        Return the statistics as a dict (durations in ms)
+        """
+        p95 = self.p95()
+        with self._lock:
+            mean = self.total / self.count if self.count else 0.0
+            last_exception_time = ''
+            if self.last_exception_time is not None:
+                last_exception_time = self.last_exception_time.strftime('%Y-%m-%d %H:%M:%S%z')
+            return {
+                'count': self.count,
+                'mean': round(mean * 1000, 2),
+                'p95': round(p95 * 1000, 2),
+                'max': round(self.max * 1000, 2),
+                'last_exception': self.last_exception or '',
+                'last_exception_time': last_exception_time,
+            }
+
+
 # ------------------------------------------------------------------------------------
 #   Class Logic
 # ------------------------------------------------------------------------------------
@@ -1086,6 +1335,9 @@ class Logic:
         self._prio = 3
         # self.last = None
         self._last_run = None
+        self._run_stats = LogicRunStatistics()
+        self._globals_template = None  # prepared globals for exec(), built by the scheduler
+        self._source_stat = None  # (mtime_ns, size) of the logic file the bytecode was compiled from
         self._trigger_dict = None
         self._watch_item = []
         self._conf = attributes
@@ -1114,6 +1366,9 @@ class Logic:
                 elif attribute != 'enabled':
                     vars(self)[attribute] = attributes[attribute]
             self._prio = int(self._prio)
+            if getattr(self, 'executor', 'thread') not in ('thread', 'process'):
+                self.logger.warning(f"Logic {self._name}: Invalid executor '{self.executor}' => using 'thread'")
+                self.executor = 'thread'
             self._generate_bytecode()
         else:
             self.logger.error(
@@ -1408,6 +1663,31 @@ class Logic:
         #        self._last_run = self._sh.now()
         self._last_run = self.shtime.now()
 
+    def record_run(self, duration):
+        """
+        Records the duration (in seconds) of a run of the logic
+
+        This method is called by the scheduler
+        """
+        self._run_stats.add_run(duration)
+
+    def record_exception(self, text):
+        """
+        Records the exception that ended a run of the logic
+
+        This method is called by the scheduler
+        """
+        self._run_stats.add_exception(text, self.shtime.now())
+
+    def get_run_statistics(self):
+        """
+        Returns the runtime statistics of the logic
+
+        :return: dict with count, mean, p95, max (durations in ms), last_exception and last_exception_time
+        :rtype: dict
+        """
+        return self._run_stats.get()
+
     def trigger(self, by='Logic', source=None, value=None, dest=None, dt=None):
         if self._enabled:
             self.scheduler.trigger(
@@ -1423,23 +1703,45 @@ class Logic:
         else:
             self.logger.info("trigger: Logic '{}' not triggered because it is disabled".format(self._name))
 
-    def _generate_bytecode(self):
+    def source_changed(self):
+        """
+        Returns True, if the logic file has changed since the bytecode was generated
+        """
+        try:
+            st = os.stat(self._pathname)
+        except (AttributeError, OSError):
+            return False
+        return (st.st_mtime_ns, st.st_size) != self._source_stat
+
+    def _generate_bytecode(self, force=False):
+        """
+        Generate the bytecode of the logic, if the logic file has changed
+
+        :param force: generate the bytecode even if the logic file is unchanged
+        :return: True, if new bytecode has been generated
+        """
         if hasattr(self, '_pathname'):
             if not os.access(self._pathname, os.R_OK):
                 self.logger.warning(
                     '{}: Could not access logic file ({}) => ignoring.'.format(self._name, self._pathname)
                 )
-                return
+                return False
+            if not force and hasattr(self, '_bytecode') and not self.source_changed():
+                return False
             try:
-                f = open(self._pathname, encoding='UTF-8')
-                code = f.read()
-                f.close()
-                code = code.lstrip('\ufeff')  # remove BOM
-                self._bytecode = compile(code, self._pathname, 'exec')
+                self._bytecode, self._source_stat = self._logics._bytecode_cache.compile(self._pathname)
+                return True
             except Exception as e:
                 self.logger.exception('Exception: {}'.format(e))
+                # keep the old bytecode and do not retry until the file changes again
+                try:
+                    st = os.stat(self._pathname)
+                    self._source_stat = (st.st_mtime_ns, st.st_size)
+                except OSError:
+                    pass
         else:
             self.logger.warning('{}: No pathname specified => ignoring.'.format(self._name))
+        return False
 
     def add_method_trigger(self, method):
         self.__methods_to_trigger.append(method)
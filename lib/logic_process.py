@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+#########################################################################
+# Copyright 2016-2025   Martin Sinn                         m.sinn@gmx.de
+#########################################################################
+#  This file is part of SmartHomeNG.
+#
+#  SmartHomeNG is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SmartHomeNG is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SmartHomeNG.  If not, see <http://www.gnu.org/licenses/>.
+#########################################################################
+
+"""
+lib/logic_process.py
+====================
+
+Execution of logics in worker processes (``executor: process`` in etc/logic.yaml)
+
+A CPU-heavy logic that runs in the thread pool of the scheduler holds the GIL
+and delays the processing of item updates. Such a logic can be run in a worker
+process instead. The scheduler thread that triggered the logic waits for the
+result without holding the GIL.
+
+The worker process has no items, plugins or scheduler of its own. Items are
+read and written through the pipe to the worker:
+
+main -> worker
+  ``('run', name, code, trigger, level)``   run a logic (marshalled bytecode, log level of the logic)
+  ``('value', value)``, ``('ok', None)``    answers to 'get' and 'set'
+  ``('error', message)``                    answer to a failed 'get' or 'set'
+  ``('stop',)``                             end the worker
+
+worker -> main
+  ``('get', path)``                          read the value of an item
+  ``('set', path, value, caller, source)``   set the value of an item
+  ``('log', logger_name, level, message)``   log a message in the main process
+  ``('done', status, message)``              end of the run, status is 'ok', 'leave', 'exit' or 'error'
+
+Within the logic ``sh.<path>()``, ``sh.return_item(path)`` and
+``items.return_item(path)`` return item proxies, calling a proxy reads or sets
+the value of the item. ``logger`` logs to the logger of the logic and
+``trigger`` is the trigger dict. ``shtime``, ``mqtt``, ``env`` and ``logics``
+are not available (None). Attributes set on ``logic`` are kept in the worker
+process only.
+"""
+
+import logging
+import marshal
+import threading
+import traceback
+
+from lib.utils import get_mp_context
+
+logger = logging.getLogger(__name__)
+
+
+class LogicProcessError(Exception):
+    """
+    A logic that was run in a worker process ended with an exception (or the worker died)
+    """
+
+
+class ItemProxyError(Exception):
+    """
+    Raised in the worker process, if an item could not be read or set by the main process
+    """
+
+
+# ------------------------------------------------------------------------------------
+#   main process
+# ------------------------------------------------------------------------------------
+
+
+class _Worker:
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child_conn,), name='logics.process_worker', daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+    def alive(self):
+        return self.process.is_alive()
+
+    def stop(self, timeout=2):
+        try:
+            self.conn.send(('stop',))
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.conn.close()
+
+
+class LogicProcessPool:
+    """
+    Worker processes for logics with ``executor: process``
+
+    Workers are started when they are needed and are reused for later runs. If
+    all workers are busy, a run waits for the next idle worker.
+
+    :param max_workers: maximum number of worker processes
+    """
+
+    def __init__(self, max_workers=2):
+        self.max_workers = max(int(max_workers), 1)
+        self._context = get_mp_context()
+        self._cond = threading.Condition()
+        self._idle = []
+        self._workers = 0
+        self._alive = True
+        self.runs = 0
+        self.item_requests = 0
+
+    def _acquire(self):
+        with self._cond:
+            while True:
+                if not self._alive:
+                    raise LogicProcessError('the worker processes have been stopped')
+                while self._idle:
+                    worker = self._idle.pop()
+                    if worker.alive():
+                        return worker
+                    worker.conn.close()
+                    self._workers -= 1
+                if self._workers < self.max_workers:
+                    self._workers += 1
+                    break
+                self._cond.wait()
+        try:
+            return _Worker(self._context)
+        except Exception:
+            with self._cond:
+                self._workers -= 1
+                self._cond.notify()
+            raise
+
+    def _release(self, worker, reuse=True):
+        with self._cond:
+            if reuse and self._alive:
+                self._idle.append(worker)
+            else:
+                self._workers -= 1
+            self._cond.notify()
+        if not reuse or not self._alive:
+            worker.stop()
+
+    def run(self, name, bytecode, trigger, items):
+        """
+        Run a logic in a worker process and serve its item requests until it is finished
+
+        :param name: name of the logic
+        :param bytecode: compiled code of the logic
+        :param trigger: trigger dict of the run
+        :param items: object with return_item(path) (the Items instance)
+
+        :return: tuple (status, message), status is 'ok', 'leave', 'exit' or 'error'
+        :raises LogicProcessError: if the worker process could not run the logic
+        """
+        worker = self._acquire()
+        reuse = False
+        try:
+            try:
+                level = logging.getLogger('logics.' + name).getEffectiveLevel()
+                worker.conn.send(('run', name, marshal.dumps(bytecode), trigger, level))
+            except Exception as e:
+                raise LogicProcessError(f'Could not send the logic to the worker process: {e}')
+            while True:
+                try:
+                    msg = worker.conn.recv()
+                except (EOFError, OSError):
+                    raise LogicProcessError('the worker process has terminated unexpectedly')
+                if msg[0] == 'done':
+                    self.runs += 1
+                    reuse = True
+                    return msg[1], msg[2]
+                if msg[0] == 'log':
+                    logging.getLogger(msg[1]).log(msg[2], msg[3])
+                else:
+                    worker.conn.send(self._serve(msg, items))
+        finally:
+            self._release(worker, reuse)
+
+    def _serve(self, msg, items):
+        self.item_requests += 1
+        try:
+            item = items.return_item(msg[1])
+            if item is None:
+                return ('error', f"Item '{msg[1]}' not found")
+            if msg[0] == 'get':
+                return ('value', item())
+            if msg[0] == 'set':
+                item(msg[2], caller=msg[3], source=msg[4])
+                return ('ok', None)
+            return ('error', f'Unknown request {msg[0]!r}')
+        except Exception as e:
+            return ('error', f'{type(e).__name__}: {e}')
+
+    def stop(self):
+        """
+        Stop the idle workers, busy workers are stopped when their run is finished
+        """
+        with self._cond:
+            self._alive = False
+            idle, self._idle = self._idle, []
+            self._workers -= len(idle)
+            self._cond.notify_all()
+        for worker in idle:
+            worker.stop()
+
+    def get_statistics(self):
+        """
+        Return the counters of the pool
+
+        :return: dict with workers, idle, runs and item_requests
+        """
+        with self._cond:
+            return {
+                'workers': self._workers,
+                'idle': len(self._idle),
+                'runs': self.runs,
+                'item_requests': self.item_requests,
+            }
+
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def get_logic_process_pool(max_workers=2):
+    """
+    Return the pool of worker processes for logics (created on first use)
+
+    :param max_workers: maximum number of worker processes, if the pool is created
+    """
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = LogicProcessPool(max_workers)
+        return _process_pool
+
+
+def stop_logic_process_pool():
+    """
+    Stop the worker processes of the logics (if any were started)
+    """
+    global _process_pool
+    with _process_pool_lock:
+        pool, _process_pool = _process_pool, None
+    if pool is not None:
+        pool.stop()
+
+
+# ------------------------------------------------------------------------------------
+#   worker process
+# ------------------------------------------------------------------------------------
+
+
+class _PipeLogHandler(logging.Handler):
+    """
+    Sends the log records of the worker to the main process
+    """
+
+    def __init__(self, conn):
+        super().__init__()
+        self.conn = conn
+
+    def emit(self, record):
+        try:
+            message = record.getMessage()
+            if record.exc_info:
+                message += '\n' + logging.Formatter().formatException(record.exc_info)
+            self.conn.send(('log', record.name, record.levelno, message))
+        except Exception:
+            self.handleError(record)
+
+
+class _ItemProxy:
+    """
+    Stands in for an item in the worker process
+
+    ``proxy()`` reads the value of the item, ``proxy(value)`` sets it. Attributes
+    return the proxies of the child items, like ``sh.<path>`` does.
+    """
+
+    def __init__(self, conn, path):
+        self._conn = conn
+        self._path = path
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return _ItemProxy(self._conn, self._path + '.' + name)
+
+    def __call__(self, value=None, caller='Logic', source=None):
+        if value is None:
+            answer = self._request(('get', self._path))
+        else:
+            answer = self._request(('set', self._path, value, caller, source))
+        return answer[1]
+
+    def _request(self, msg):
+        self._conn.send(msg)
+        answer = self._conn.recv()
+        if answer[0] == 'error':
+            raise ItemProxyError(answer[1])
+        return answer
+
+    def id(self):
+        return self._path
+
+    def __repr__(self):
+        return f'<ItemProxy {self._path}>'
+
+
+class _ItemsProxy:
+    """
+    Stands in for ``sh`` and ``items`` in the worker process
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return _ItemProxy(self._conn, name)
+
+    def return_item(self, path):
+        return _ItemProxy(self._conn, path)
+
+
+class _LogicProxy:
+    """
+    Stands in for ``logic`` in the worker process
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+
+def _error_message(e, filename):
+    # report the innermost line of the logic itself, not of the proxies
+    frames = traceback.extract_tb(e.__traceback__)
+    logic_frames = [frame for frame in frames if frame.filename == filename]
+    tb = (logic_frames or frames)[-1]
+    if tb[2] == '<module>':
+        logic_method = 'Hauptroutine der Logik'
+    else:
+        logic_method = 'function ' + tb[2] + '()'
+    return f"Datei '{tb[0]}', Zeile {tb[1]}\n   {logic_method}, Exception: {e}"
+
+
+def _worker_main(conn):
+    import lib.scheduler
+
+    root = logging.getLogger()
+    root.handlers = [_PipeLogHandler(conn)]
+    root.setLevel(logging.WARNING)
+    items = _ItemsProxy(conn)
+    logics = {}
+
+    while True:
+        try:
+            msg = conn.recv()
+        except (EOFError, OSError):
+            break
+        if msg[0] != 'run':
+            break
+        __, name, code, trigger, level = msg
+        logic = logics.setdefault(name, _LogicProxy(name))
+        logic_logger = logging.getLogger('logics.' + name)
+        logic_logger.setLevel(level)
+        logic_globals = dict(vars(lib.scheduler))
+        logic_globals.update(
+            sh=items,
+            items=items,
+            logger=logic_logger,
+            trigger=trigger,
+            logic=logic,
+            logics=None,
+            mqtt=None,
+            shtime=None,
+            env=None,
+        )
+        try:
+            code = marshal.loads(code)
+            exec(code, logic_globals)
+            result = ('done', 'ok', '')
+        except lib.scheduler.LeaveLogic as e:
+            result = ('done', 'leave', str(e))
+        except SystemExit:
+            result = ('done', 'exit', '')
+        except Exception as e:
+            result = ('done', 'error', _error_message(e, getattr(code, 'co_filename', None)))
+        try:
+            conn.send(result)
+        except (OSError, ValueError):
+            break
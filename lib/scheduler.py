@@ -25,6 +25,9 @@
 import logging
 import time
 import datetime
+import heapq
+import itertools
+import collections
 import sys
 import traceback
 import threading
@@ -37,6 +40,8 @@ from lib.shtime import Shtime
 from lib.item import Items
 from lib.model.smartplugin import SmartPlugin
 from lib.triggertimes import TriggerTimes
+from lib.logic_process import LogicProcessError, get_logic_process_pool, stop_logic_process_pool
+from lib.scheduler_metrics import SchedulerMetrics
 
 # following modules) are imported to have those functions available during logic execution
 import gc  # noqa
@@ -69,11 +74,14 @@ class _PriorityQueue:
     """
     Implements a queue which contain tuples of priority and data sorted by priority.
     Lowest priority given will be the first candidate for a get from the queue, data can be anything
+
+    The queue is backed by a heap, entries with the same priority are returned in the order they were inserted.
     """
 
     def __init__(self):
-        self.queue = []
+        self.queue = []  # heap of (priority, seq, data) entries
         self.lock = threading.Lock()
+        self._seq = itertools.count()
 
     def insert(self, priority, data):
         """
@@ -81,30 +89,29 @@ class _PriorityQueue:
         :param priority: a positive integer or a tuple where lowest indicates the highest priority
         :param data: anything to be associated with the given priority
         """
-        self.lock.acquire()
-        lo = 0
-        hi = len(self.queue)
-        while lo < hi:
-            mid = (lo + hi) // 2
-            if priority < self.queue[mid][0]:
-                hi = mid
-            else:
-                lo = mid + 1
-        self.queue.insert(lo, (priority, data))
-        self.lock.release()
+        with self.lock:
+            heapq.heappush(self.queue, (priority, next(self._seq), data))
 
     def get(self):
         """
         Returns the first tuple of the queue
         :return: tuple with priority and data or None if no entry is available in the queue
         """
-        self.lock.acquire()
-        try:
-            return self.queue.pop(0)
-        except IndexError:
-            raise
-        finally:
-            self.lock.release()
+        with self.lock:
+            priority, __, data = heapq.heappop(self.queue)
+        return priority, data
+
+    def peek(self):
+        """
+        Returns the first tuple of the queue without removing it
+        :return: tuple with priority and data or None if the queue is empty
+        """
+        with self.lock:
+            try:
+                priority, __, data = self.queue[0]
+            except IndexError:
+                return None
+        return priority, data
 
     def qsize(self):
         """
@@ -118,11 +125,77 @@ class _PriorityQueue:
         Returns all entries of the queue as a list
         :return: list of all queue entries
         """
+        with self.lock:
+            entries = sorted(self.queue)
+        return [(priority, data) for priority, __, data in entries]
+
+
+class _RunQueue:
+    """
+    Queue of tasks to be executed by the worker threads of the scheduler
+
+    Holds one FIFO per priority. Lowest priority given will be the first candidate for a get from the queue.
+    Inserting into a priority that has been used before needs no lock, so triggering a task is cheap even when
+    the worker threads are busy taking tasks from the queue.
+    """
+
+    def __init__(self):
+        self._queues = {}  # priority -> deque of data
+        self._priorities = []  # sorted list of the priorities in _queues
+        self.lock = threading.Lock()
+
+    def insert(self, priority, data):
+        """
+        Add data with the given priority to the end of the queue for that priority
+        :param priority: a positive integer where lowest indicates the highest priority
+        :param data: anything to be associated with the given priority
+        """
+        try:
+            # deque.append is thread safe, no lock needed
+            self._queues[priority].append(data)
+        except KeyError:
+            with self.lock:
+                self._queues.setdefault(priority, collections.deque()).append(data)
+                self._priorities = sorted(self._queues)
+
+    def get(self):
+        """
+        Returns the first entry of the queue with the highest priority
+        :return: tuple with priority and data, raises IndexError if the queue is empty
+        """
+        with self.lock:
+            for priority in self._priorities:
+                try:
+                    return priority, self._queues[priority].popleft()
+                except IndexError:
+                    continue
+        raise IndexError('get from an empty run queue')
+
+    def qsize(self):
+        """
+        Returns the actual size of the queue
+        :return: Size of the queue
+        """
+        return sum(len(q) for q in list(self._queues.values()))
+
+    def depth(self):
+        """
+        Returns the number of queued entries for each priority
+        :return: dict with priority as key and number of entries as value
+        """
+        with self.lock:
+            return {priority: len(self._queues[priority]) for priority in self._priorities}
+
+    def dump(self):
+        """
+        Returns all entries of the queue as a list
+        :return: list of all queue entries (tuples of priority and data) in the order they will be returned
+        """
         queue_list = []
-        self.lock.acquire()
-        for entry in self.queue:
-            queue_list.append(entry)
-        self.lock.release()
+        with self.lock:
+            for priority in self._priorities:
+                for data in list(self._queues[priority]):
+                    queue_list.append((priority, data))
         return queue_list
 
 
@@ -134,14 +207,16 @@ class Scheduler(threading.Thread):
 
     _scheduler = {}  # holder schedulers, key is the scheduler name. Each scheduler is stored in a dict
     # (keys are 'obj', 'active', 'prio', 'next', 'value', 'cycle', 'cron')
-    _runq = (
-        _PriorityQueue()
-    )  # holds priority and a tuple of (name, obj, by, source, dest, value) for immediate execution
+    _runq = _RunQueue()  # holds priority and a tuple of (name, obj, by, source, dest, value, enqueued) for immediate
+    # execution, enqueued is the time.perf_counter() value when the entry was inserted
     _triggerq = _PriorityQueue()  # holds tuples of (datetime, priority) and (name, obj, by, source, dest, value)
     # to be put in the run queue when time is due
 
     _pluginname_prefix = 'plugins.'  # prefix for scheduler names
 
+    _housekeeping_interval = 1  # maximum time in seconds the run loop sleeps before checking the worker threads
+    _depth_sample_interval = 1  # seconds between samples of the run queue depth
+
     def __init__(self, smarthome):
         threading.Thread.__init__(self, name='Scheduler')
         logger.info('Init Scheduler')
@@ -150,6 +225,14 @@ class Scheduler(threading.Thread):
         self._runc = threading.Condition()
         self._cycle_items = {}  # store items for dynamic cycles {'item2.property.path': {name1, name2, ...}}
 
+        # min-heap of (next, seq, name) entries for scheduler jobs with a next execution time. Entries are not
+        # removed when a job is changed or removed, they are skipped when they no longer match the job's 'next'
+        self._timer_heap = []
+        self._timer_seq = itertools.count()
+        self._timerc = threading.Condition()  # guards _timer_heap and wakes the run loop
+        self._metrics = SchedulerMetrics()
+        self._next_depth_sample = 0
+
         global _scheduler_instance
         if _scheduler_instance is not None:
             import inspect
@@ -223,6 +306,28 @@ class Scheduler(threading.Thread):
                 idle_count += 1
         return idle_count
 
+    def get_metrics(self, top=20, sort='total'):
+        """
+        Returns the latency and throughput metrics of the scheduler (see lib/scheduler_metrics.py)
+
+        :param top: number of jobs with the most worker time to include (0 = all)
+        :param sort: sort order of the jobs ('total', 'max', 'p95' or 'count')
+        :return: dict with timer_lateness, queue_latency, queue_depth and jobs (durations in ms)
+        """
+        return self._metrics.get(top, sort)
+
+    def get_metrics_summary(self):
+        """
+        Returns the key figures of the scheduler metrics (for the env.core.scheduler items)
+        """
+        return self._metrics.get_summary()
+
+    def reset_metrics(self):
+        """
+        Discards the collected scheduler metrics
+        """
+        self._metrics.reset()
+
     def get_worker_names(self):
         """
         Get names on non-idle worker threads
@@ -242,6 +347,9 @@ class Scheduler(threading.Thread):
             self._add_worker()
         while self.alive:
             now = self.shtime.now()
+            if time.monotonic() >= self._next_depth_sample:
+                self._next_depth_sample = time.monotonic() + self._depth_sample_interval
+                self._metrics.sample_depth(self._runq.qsize())
             if self._runq.qsize() > len(self._workers):
                 delta = now - self._last_worker
                 if delta.seconds > self._worker_delta:
@@ -276,61 +384,62 @@ class Scheduler(threading.Thread):
                                     )
                                 )
 
-            while self._triggerq.qsize() > 0:
+            while True:
+                entry = self._triggerq.peek()
+                if entry is None or entry[0][0] > now:
+                    break
                 try:
                     (dt, prio), (name, obj, by, source, dest, value) = self._triggerq.get()
                 except Exception as e:
                     logger.warning(f'Trigger queue exception: {e}')
                     break
+                self._metrics.add_timer_lateness((now - dt).total_seconds())
+                self._runq.insert(prio, (name, obj, by, source, dest, value, time.perf_counter()))
+                self._runc.acquire()
+                self._runc.notify()
+                self._runc.release()
 
-                if dt < now:  # run it
-                    self._runc.acquire()
-                    self._runq.insert(prio, (name, obj, by, source, dest, value))
-                    self._runc.notify()
-                    self._runc.release()
-                else:  # put last entry back and break while loop
-                    self._triggerq.insert((dt, prio), (name, obj, by, source, dest, value))
-                    break
-            # For debugging
-            # task_count = 0
-            # for name in self._scheduler:
-            #     task = self._scheduler[name]
-            #     if task['next'] is not None:
-            #         task_count += 1
-            # End for debugging
-            if not self._lock.acquire(timeout=1):
-                #     logger.critical("Scheduler: Deadlock! - Task Count to enter run queue: {}".format(task_count))
-                logger.critical('Scheduler: Deadlock!')
-                continue
-            try:
-                for name in self._scheduler:
-                    task = self._scheduler[name]
-                    if task['next'] is not None:
-                        if task['next'] <= now:
-                            self._runc.acquire()
-                            # insert priority and a tuple of (name, obj, by, source, dest, value) # ms
-                            self._runq.insert(
-                                task['prio'],
-                                (name, task['obj'], 'Scheduler', task.get('source', None), None, task['value']),
-                            )
-                            self._runc.notify()
-                            self._runc.release()
-                            task['next'] = None
-                        else:
-                            continue
-                    elif not task['active']:
-                        continue
-                    else:
-                        if task['cron'] is None and task['cycle'] is None:
+            due = self._pop_due_timers(now)
+            if due:
+                if not self._lock.acquire(timeout=1):
+                    logger.critical('Scheduler: Deadlock!')
+                    # put the due entries back, they are handled in the next loop
+                    for entry in due:
+                        self._push_timer(entry[2], entry[0])
+                    continue
+                try:
+                    for next_time, seq, name in due:
+                        task = self._scheduler.get(name)
+                        if task is None or task['next'] != next_time:
+                            # job was removed or rescheduled since the heap entry was created
                             continue
-                        else:
+                        # insert priority and a tuple of (name, obj, by, source, dest, value, enqueued) # ms
+                        self._metrics.add_timer_lateness((now - next_time).total_seconds())
+                        self._runq.insert(
+                            task['prio'],
+                            (
+                                name,
+                                task['obj'],
+                                'Scheduler',
+                                task.get('source', None),
+                                None,
+                                task['value'],
+                                time.perf_counter(),
+                            ),
+                        )
+                        self._runc.acquire()
+                        self._runc.notify()
+                        self._runc.release()
+                        task['next'] = None
+                        if task['active'] and (task['cron'] is not None or task['cycle'] is not None):
                             self._next_time(name)
-            except Exception as e:
-                tb_str = ''.join(traceback.format_exception(None, e, e.__traceback__))
-                logger.warning(f'Exception: {e} while searching scheduler for due tasks. Traceback: {tb_str}')
-            finally:
-                self._lock.release()
-            time.sleep(0.5)
+                except Exception as e:
+                    tb_str = ''.join(traceback.format_exception(None, e, e.__traceback__))
+                    logger.warning(f'Exception: {e} while searching scheduler for due tasks. Traceback: {tb_str}')
+                finally:
+                    self._lock.release()
+
+            self._wait_for_next_timer()
 
         if self._sh.shng_status['code'] > 20:
             logger.info('scheduler leaves run method')
@@ -340,8 +449,75 @@ class Scheduler(threading.Thread):
 
     def stop(self):
         self.alive = False
+        with self._timerc:
+            self._timerc.notify()
+        stop_logic_process_pool()
         logger.debug('scheduler leaves stop method')
 
+    def _push_timer(self, name, next_time):
+        """
+        Put the next execution time of a scheduler job into the timer heap
+
+        The run loop is woken up, if the new entry is due earlier than all other entries.
+
+        :param name: name of the scheduler job
+        :param next_time: next execution time of the job (timezone aware datetime)
+        """
+        with self._timerc:
+            # rebuild the heap if it is mostly made up of outdated entries (from changed or removed jobs)
+            if len(self._timer_heap) > 2 * len(self._scheduler) + 100:
+                self._rebuild_timer_heap()
+            entry = (next_time, next(self._timer_seq), name)
+            heapq.heappush(self._timer_heap, entry)
+            if self._timer_heap[0] is entry:
+                self._timerc.notify()
+
+    def _rebuild_timer_heap(self):
+        """
+        Rebuild the timer heap from the jobs which have a next execution time
+
+        Has to be called with _timerc held.
+        """
+        heap = []
+        for name, job in list(self._scheduler.items()):
+            if job['next'] is not None:
+                heap.append((job['next'], next(self._timer_seq), name))
+        heapq.heapify(heap)
+        self._timer_heap = heap
+
+    def _pop_due_timers(self, now):
+        """
+        Remove all entries from the timer heap which are due at the given time
+
+        :param now: actual time
+        :return: list of (next, seq, name) entries which are due
+        """
+        due = []
+        with self._timerc:
+            while self._timer_heap and self._timer_heap[0][0] <= now:
+                due.append(heapq.heappop(self._timer_heap))
+        return due
+
+    def _wait_for_next_timer(self):
+        """
+        Sleep until the earliest timer or trigger is due, a new timer is added or the housekeeping interval expired
+        """
+        with self._timerc:
+            if not self.alive:
+                return
+            timeout = self._housekeeping_interval
+            deadlines = []
+            if self._timer_heap:
+                deadlines.append(self._timer_heap[0][0])
+            trigger_entry = self._triggerq.peek()
+            if trigger_entry is not None:
+                deadlines.append(trigger_entry[0][0])
+            if deadlines:
+                delay = (min(deadlines) - self.shtime.now()).total_seconds()
+                timeout = max(0, min(timeout, delay))
+            if timeout > 0:
+                self._timerc.wait(timeout)
+
     def trigger(
         self, name, obj=None, by='Logic', source=None, value=None, dest=None, prio=3, dt=None, from_smartplugin=False
     ):
@@ -371,8 +547,9 @@ class Scheduler(threading.Thread):
                 return
         if dt is None:
             logger.debug(f'Triggering {name} - by: {by} source: {source} dest: {dest} value: {value}')
+            # the run queue needs no lock for inserting, the condition is only needed to wake up a worker
+            self._runq.insert(prio, (name, obj, by, source, dest, value, time.perf_counter()))
             self._runc.acquire()
-            self._runq.insert(prio, (name, obj, by, source, dest, value))
             self._runc.notify()
             self._runc.release()
         else:
@@ -384,6 +561,8 @@ class Scheduler(threading.Thread):
                 return
             logger.debug(f'Triggering {name} - by: {by} source: {source} dest: {dest} value: {value} at: {dt}')
             self._triggerq.insert((dt, prio), (name, obj, by, source, dest, value))
+            with self._timerc:
+                self._timerc.notify()
 
     def remove(self, name, from_smartplugin=False):
         """
@@ -604,6 +783,8 @@ class Scheduler(threading.Thread):
                 }
                 if next is None:
                     self._next_time(name, offset)
+                else:
+                    self._push_timer(name, next)
             except Exception:
                 raise
                 # logger.error(f"Exception: {e} while trying to add a new entry to scheduler")
@@ -702,9 +883,15 @@ class Scheduler(threading.Thread):
                             self._scheduler[name][key] = kwargs[key]
                         else:
                             logger.warning(f'Attribute {key} for {name} not specified. Could not change it.')
-                    if self._scheduler[name]['active'] is True:
+                    job = self._scheduler[name]
+                    if job['active'] is True:
                         if 'cycle' in kwargs or 'cron' in kwargs:
                             self._next_time(name)
+                        elif job['next'] is None and (job['cron'] is not None or job['cycle'] is not None):
+                            # (re)activated job without a pending execution
+                            self._next_time(name)
+                        elif 'next' in kwargs and job['next'] is not None:
+                            self._push_timer(name, job['next'])
                     else:
                         self._scheduler[name]['next'] = None
                 else:
@@ -772,6 +959,8 @@ class Scheduler(threading.Thread):
                     value = job['cron'][entry]
 
         self._scheduler[name]['next'] = next_time
+        if next_time is not None:
+            self._push_timer(name, next_time)
 
         if value is not None:
             self._scheduler[name]['value'] = value
@@ -795,14 +984,21 @@ class Scheduler(threading.Thread):
     def _worker(self):
         while self.alive:
             self._runc.acquire()
-            self._runc.wait(timeout=1)
+            if self._runq.qsize() == 0:
+                # only wait, if there is no task left from a notify that no worker has been waiting for
+                self._runc.wait(timeout=1)
             try:
-                prio, (name, obj, by, source, dest, value) = self._runq.get()
+                prio, (name, obj, by, source, dest, value, enqueued) = self._runq.get()
             except IndexError:
                 continue
             finally:
                 self._runc.release()
-            self._task(name, obj, by, source, dest, value)
+            start = time.perf_counter()
+            self._metrics.add_queue_latency(start - enqueued)
+            try:
+                self._task(name, obj, by, source, dest, value)
+            finally:
+                self._metrics.add_run(name, time.perf_counter() - start)
 
     def _task(self, name, obj, by, source, dest, value):
         threading.current_thread().name = name
@@ -856,6 +1052,54 @@ class Scheduler(threading.Thread):
 
         threading.current_thread().name = 'idle'
 
+    def _get_logic_globals(self, logic, logger):
+        """
+        Return the prepared "globals" environment of a logic
+
+        The template is built on the first run and rebuilt, if the mqtt module has
+        changed. It must not be passed to exec() directly: every run gets a copy,
+        so that runs do not share variables and parallel runs do not overwrite
+        each others trigger.
+
+        :param logic: logic object
+        :param logger: logger of the logic
+        :return: dict with everything but 'trigger'
+        """
+        template = getattr(logic, '_globals_template', None)
+        if template is None or template['mqtt'] is not self.mqtt:
+            template = dict(globals())
+            template['sh'] = self._sh
+            template['logger'] = logger
+            template['mqtt'] = self.mqtt
+            template['shtime'] = self.shtime
+            template['env'] = lib.env
+            template['items'] = self.items
+            template['logic'] = logic
+            template['logics'] = logic._logics
+            logic._globals_template = template
+        return template
+
+    def _execute_logic_in_process(self, logic, trigger):
+        """
+        Execute a logic with ``executor: process`` in a worker process (see lib/logic_process.py)
+
+        The result of the worker is raised as LeaveLogic, SystemExit or LogicProcessError,
+        so it is handled like the result of a logic executed in this thread.
+        """
+        workers = getattr(self._sh, '_logic_process_workers', 2)
+        try:
+            workers = max(int(workers), 1)
+        except ValueError:
+            logger.error(f'Invalid value for logic_process_workers in smarthome.yaml: {workers}')
+            workers = 2
+        status, message = get_logic_process_pool(workers).run(logic.name, logic._bytecode, trigger, self.items)
+        if status == 'leave':
+            raise LeaveLogic(message)
+        if status == 'exit':
+            raise SystemExit
+        if status == 'error':
+            raise LogicProcessError(message)
+
     def _execute_logic_task(self, logic, by, source, dest, value):
         """
         Execute a logic from _task method
@@ -907,21 +1151,19 @@ class Scheduler(threading.Thread):
                         f'Logik ignoriert, SmartHomeNG ist noch nicht vollständig initialisiert - Logik wurde getriggert durch {trigger}'
                     )
                 else:
-                    # set up "globals" environment for the logic
-                    logic_globals = dict(globals())
-                    logic_globals['sh'] = self._sh
-                    logic_globals['logger'] = logger
-                    logic_globals['mqtt'] = self.mqtt
-                    logic_globals['shtime'] = self.shtime
-                    logic_globals['env'] = lib.env
-                    logic_globals['items'] = self.items
-                    logic_globals['trigger'] = trigger  # logic.trigger_dict
-                    logic_globals['logic'] = logic
-                    logic_globals['logics'] = logic._logics
-
                     # execute logic
                     logger.debug(f'Getriggert durch: {trigger}')
-                    exec(logic._bytecode, logic_globals)
+                    start = time.perf_counter()
+                    try:
+                        if getattr(logic, 'executor', 'thread') == 'process':
+                            self._execute_logic_in_process(logic, trigger)
+                        else:
+                            # set up "globals" environment for the logic (a fresh copy of the prepared template)
+                            logic_globals = self._get_logic_globals(logic, logger).copy()
+                            logic_globals['trigger'] = trigger  # logic.trigger_dict
+                            exec(logic._bytecode, logic_globals)
+                    finally:
+                        logic.record_run(time.perf_counter() - start)
                     # store timestamp of last run
                     logic.set_last_run()
                     for method in logic.get_method_triggers():
@@ -936,6 +1178,9 @@ class Scheduler(threading.Thread):
         except SystemExit:
             # ignore exit() call from logic.
             pass
+        except LogicProcessError as e:
+            logger.error(f"In der Logik ist ein Fehler aufgetreten:\n   Logik '{logic.name}', {e}")
+            logic.record_exception(' '.join(str(e).split()))
         except Exception as e:
             tb = sys.exc_info()[2]
             tb = traceback.extract_tb(tb)[-1]
@@ -946,6 +1191,7 @@ class Scheduler(threading.Thread):
             logger.error(
                 f"In der Logik ist ein Fehler aufgetreten:\n   Logik '{logic.name}', Datei '{tb[0]}', Zeile {tb[1]}\n   {logic_method}, Exception: {e}"
             )
+            logic.record_exception(f'{logic_method}, Zeile {tb[1]}: {e}')
             # logger.exception(f"In der Logik ist ein Fehler aufgetreten:\n   Logik '{logic.name}', Datei '{tb[0]}', Zeile {tb[1]}\n   {logic_method}, Exception: '{e}'\n ")
 
         return
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+#########################################################################
+# Copyright 2016-2025   Martin Sinn                         m.sinn@gmx.de
+#########################################################################
+#  This file is part of SmartHomeNG.
+#
+#  SmartHomeNG is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SmartHomeNG is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SmartHomeNG.  If not, see <http://www.gnu.org/licenses/>.
+#########################################################################
+
+"""
+lib/scheduler_metrics.py
+========================
+
+Latency and throughput metrics of the scheduler
+
+- timer lateness: time from the due time of a scheduler job or a timed trigger
+  until it is put into the run queue
+- queue latency: time a task waits in the run queue until a worker starts it
+- duration of the tasks per job name
+- depth of the run queue over time
+
+Durations are counted in histograms with fixed buckets, so the memory used does
+not grow with the number of tasks. The number of job names that are tracked
+separately is limited as well, tasks of further jobs are counted as ``<other>``.
+"""
+
+import bisect
+import collections
+import threading
+import time
+
+# upper bounds of the histogram buckets in ms, the last bucket holds everything above
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+OTHER_JOBS = '<other>'
+
+
+class Histogram:
+    """
+    Histogram of durations with the fixed buckets of BUCKETS_MS
+
+    Not thread safe, SchedulerMetrics guards its histograms with a lock.
+    """
+
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms):
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def percentile(self, p):
+        """
+        Return the upper bound of the bucket holding the *p* th percentile (in ms, at most the maximum)
+        """
+        if self.count == 0:
+            return 0.0
+        rank = self.count * p / 100
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(BUCKETS_MS[i], self.max) if i < len(BUCKETS_MS) else self.max
+        return self.max
+
+    def get(self, buckets=True):
+        """
+        Return the histogram as a dict (durations in ms)
+        """
+        result = {
+            'count': self.count,
+            'mean': round(self.total / self.count, 3) if self.count else 0.0,
+            'p50': round(self.percentile(50), 3),
+            'p95': round(self.percentile(95), 3),
+            'p99': round(self.percentile(99), 3),
+            'max': round(self.max, 3),
+            'total': round(self.total, 3),
+        }
+        if buckets:
+            labels = [f'<={bound}' for bound in BUCKETS_MS] + [f'>{BUCKETS_MS[-1]}']
+            result['buckets'] = {label: count for label, count in zip(labels, self.counts) if count}
+        return result
+
+
+class SchedulerMetrics:
+    """
+    Metrics collected by the scheduler
+
+    :param max_jobs: maximum number of job names with their own duration histogram
+    :param depth_samples: number of kept samples of the run queue depth
+    """
+
+    def __init__(self, max_jobs=500, depth_samples=600):
+        self.max_jobs = max_jobs
+        self._lock = threading.Lock()
+        self._depth = collections.deque(maxlen=depth_samples)  # (timestamp, depth)
+        self.reset()
+
+    def reset(self):
+        """
+        Discard all collected metrics
+        """
+        with self._lock:
+            self.since = time.time()
+            self.timer_lateness = Histogram()
+            self.queue_latency = Histogram()
+            self._jobs = {}  # job name -> Histogram of the durations
+            self._depth.clear()
+            self.max_depth = 0
+
+    def add_timer_lateness(self, seconds):
+        with self._lock:
+            self.timer_lateness.add(max(seconds, 0) * 1000)
+
+    def add_queue_latency(self, seconds):
+        with self._lock:
+            self.queue_latency.add(seconds * 1000)
+
+    def add_run(self, name, seconds):
+        """
+        Count the duration of a task of the job *name*
+        """
+        with self._lock:
+            histogram = self._jobs.get(name)
+            if histogram is None:
+                if len(self._jobs) >= self.max_jobs:
+                    name = OTHER_JOBS
+                    histogram = self._jobs.get(name)
+                if histogram is None:
+                    histogram = self._jobs[name] = Histogram()
+            histogram.add(seconds * 1000)
+
+    def sample_depth(self, depth):
+        """
+        Record the actual depth of the run queue
+        """
+        with self._lock:
+            self._depth.append((time.time(), depth))
+            if depth > self.max_depth:
+                self.max_depth = depth
+
+    def get_jobs(self, top=20, sort='total'):
+        """
+        Return the duration statistics of the jobs that used the most worker time
+
+        :param top: number of jobs to return (0 = all)
+        :param sort: 'total', 'max', 'p95' or 'count'
+        :return: list of dicts (durations in ms), sorted descending
+        """
+        with self._lock:
+            jobs = [dict(name=name, **histogram.get(buckets=False)) for name, histogram in self._jobs.items()]
+        if sort not in ('total', 'max', 'p95', 'count'):
+            sort = 'total'
+        jobs.sort(key=lambda job: job[sort], reverse=True)
+        return jobs[:top] if top else jobs
+
+    def get(self, top=20, sort='total'):
+        """
+        Return all metrics as a dict
+        """
+        with self._lock:
+            result = {
+                'since': time.strftime('%Y-%m-%d %H:%M:%S%z', time.localtime(self.since)),
+                'timer_lateness': self.timer_lateness.get(),
+                'queue_latency': self.queue_latency.get(),
+                'queue_depth': {
+                    'actual': self._depth[-1][1] if self._depth else 0,
+                    'max': self.max_depth,
+                    'samples': [[round(ts, 1), depth] for ts, depth in self._depth],
+                },
+                'job_count': len(self._jobs),
+            }
+        result['jobs'] = self.get_jobs(top, sort)
+        return result
+
+    def get_summary(self):
+        """
+        Return the key figures for the env.core.scheduler items
+
+        :return: dict of numbers (durations in ms) and the name of the job that used the most worker time
+        """
+        jobs = self.get_jobs(top=1)
+        with self._lock:
+            return {
+                'timer_lateness_p95': round(self.timer_lateness.percentile(95), 3),
+                'timer_lateness_max': round(self.timer_lateness.max, 3),
+                'queue_latency_p95': round(self.queue_latency.percentile(95), 3),
+                'queue_latency_max': round(self.queue_latency.max, 3),
+                'queue_depth': self._depth[-1][1] if self._depth else 0,
+                'queue_depth_max': self.max_depth,
+                'top_job': jobs[0]['name'] if jobs else '',
+                'top_job_time': jobs[0]['total'] if jobs else 0.0,
+            }
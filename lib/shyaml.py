@@ -31,8 +31,11 @@ are implemented in this library.
 
 """
 
+import hashlib
 import logging
 import os
+import pickle
+import re
 import shutil
 
 from collections import OrderedDict
@@ -56,11 +59,181 @@ except ImportError:
     logger.critical('shyaml: ruamel.yaml is not installed')
     exit(1)
 
+try:
+    # libyaml based parser (package ruamel.yaml.clib)
+    from ruamel.yaml.cyaml import CParser as _CParser
+except ImportError:
+    _CParser = None
+
 yaml_version = '1.1'
 indent_spaces = 4
 block_seq_indent = 0
 
 
+if _CParser is not None:
+
+    class _CSafeLoader(_CParser, yaml.constructor.SafeConstructor, yaml.resolver.VersionedResolver):
+        """
+        Safe loader using the libyaml parser
+
+        Unlike ruamel's CSafeLoader, it uses the VersionedResolver of the SafeLoader,
+        so scalars are resolved the same way (the yaml version is passed by _fast_load()).
+        """
+
+        def __init__(self, stream, version=None, preserve_quotes=None):
+            _CParser.__init__(self, stream)
+            self._parser = self._composer = self
+            yaml.constructor.SafeConstructor.__init__(self, loader=self)
+            yaml.resolver.VersionedResolver.__init__(self, version, loader=self)
+
+    FastSafeLoader = _CSafeLoader
+else:
+    FastSafeLoader = yaml.SafeLoader
+
+_yaml_directive = re.compile(r'^%YAML[ \t]+(\d+)\.(\d+)', re.MULTILINE)
+
+
+def _fast_load(sdata, ordered=False):
+    """
+    Parse yaml data with the libyaml parser, if it is installed
+
+    :return: parsed data
+    :raises: exception of the parser, if the data is not valid yaml
+    """
+    version = None
+    if FastSafeLoader is not yaml.SafeLoader:
+        # the libyaml parser does not report the %YAML directive to the resolver
+        header_end = sdata.find('\n---')
+        match = _yaml_directive.search(sdata, 0, header_end if header_end >= 0 else len(sdata))
+        if match:
+            version = (int(match.group(1)), int(match.group(2)))
+    if ordered:
+        return _ordered_load(sdata, FastSafeLoader, version=version)
+    return yaml.load(sdata, FastSafeLoader, version=version)
+
+
+# ==================================================================================
+#   Cache of parsed yaml files
+#
+#   The parsed data of a file is stored in a pickle file in the cache directory
+#   (var/yaml_cache), after a header with the path of the file and a hash of its
+#   content. If the content did not change, the next start of SmartHomeNG loads
+#   the pickle instead of parsing the file again. Cache files of yaml files that
+#   no longer exist are removed by prune_parse_cache().
+#
+
+PARSE_CACHE_VERSION = 2
+
+_parse_cache_dir = None
+_parse_cache_stats = {'hits': 0, 'misses': 0}
+
+
+def set_parse_cache_dir(directory):
+    """
+    Enable the cache of parsed yaml files
+
+    :param directory: directory for the cache files (None disables the cache)
+    """
+    global _parse_cache_dir
+    if directory is not None:
+        try:
+            os.makedirs(directory, mode=0o775, exist_ok=True)
+        except OSError as e:
+            logger.warning(f'Cache for parsed yaml files disabled, cannot create {directory}: {e}')
+            directory = None
+    _parse_cache_dir = directory
+
+
+def prune_parse_cache():
+    """
+    Remove the cache files of yaml files that no longer exist (and cache files of older versions)
+
+    Only the headers of the cache files are read.
+
+    :return: number of removed cache files
+    """
+    if _parse_cache_dir is None:
+        return 0
+    try:
+        filenames = os.listdir(_parse_cache_dir)
+    except OSError as e:
+        logger.info(f'Could not read parse cache directory {_parse_cache_dir}: {e}')
+        return 0
+    removed = 0
+    for filename in filenames:
+        cache_file = os.path.join(_parse_cache_dir, filename)
+        if filename.endswith('.pickle'):
+            try:
+                with open(cache_file, 'rb') as f:
+                    source, __ = pickle.load(f)
+                if isinstance(source, str) and os.path.isfile(source):
+                    continue
+            except Exception:
+                pass
+        elif not filename.endswith('.tmp'):
+            continue
+        try:
+            os.remove(cache_file)
+            removed += 1
+        except OSError as e:
+            logger.info(f'Could not remove parse cache file {cache_file}: {e}')
+    if removed:
+        logger.info(f'Removed {removed} parse cache file(s) of yaml files that no longer exist')
+    return removed
+
+
+def get_parse_cache_dir():
+    """
+    Return the directory of the cache of parsed yaml files (None, if the cache is disabled)
+    """
+    return _parse_cache_dir
+
+
+def get_parse_cache_statistics():
+    """
+    Return the number of cache hits and misses of the cache of parsed yaml files
+    """
+    return dict(_parse_cache_stats)
+
+
+def _parse_cache_files(filename, ordered, sdata):
+    """
+    Return the cache file and the header (path of the yaml file, content hash) for a yaml file
+    """
+    source = os.path.abspath(filename)
+    key = hashlib.sha1(f'{source}|{ordered}'.encode('utf8')).hexdigest()
+    content_hash = hashlib.sha1(
+        f'{PARSE_CACHE_VERSION}|{yaml.__version__}|'.encode('utf8') + sdata.encode('utf8')
+    ).hexdigest()
+    return os.path.join(_parse_cache_dir, key + '.pickle'), (source, content_hash)
+
+
+def _parse_cache_read(cache_file, header):
+    try:
+        with open(cache_file, 'rb') as f:
+            if pickle.load(f) != header:
+                return False, None
+            return True, pickle.load(f)
+    except Exception:
+        return False, None
+
+
+def _parse_cache_write(cache_file, header, data):
+    # the header is a pickle of its own, so prune_parse_cache() does not have to load the data
+    tmp_file = cache_file + '.tmp'
+    try:
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+    except Exception as e:
+        logger.info(f'Could not write parse cache file {cache_file}: {e}')
+        try:
+            os.remove(tmp_file)
+        except OSError:
+            pass
+
+
 def editing_is_enabled():
     return EDITING_ENABLED
 
@@ -115,11 +288,32 @@ def yaml_load(filename, ordered=False, ignore_notfound=False):
     try:
         with open(filename, 'r', encoding='utf8') as stream:
             sdata = stream.read()
+
+        cache_file = None
+        if _parse_cache_dir is not None:
+            cache_file, cache_header = _parse_cache_files(filename, ordered, sdata)
+            found, y = _parse_cache_read(cache_file, cache_header)
+            if found:
+                _parse_cache_stats['hits'] += 1
+                return y
+            _parse_cache_stats['misses'] += 1
+
+        # doubling the newlines keeps the line breaks of multiline strings (and is
+        # taken into account by convert_linenumber() for error messages)
         sdata = sdata.replace('\n', '\n\n')
-        if ordered:
-            y = _ordered_load(sdata, yaml.SafeLoader)
-        else:
-            y = yaml.load(sdata, yaml.SafeLoader)
+        try:
+            y = _fast_load(sdata, ordered)
+        except Exception:
+            if FastSafeLoader is yaml.SafeLoader:
+                raise
+            # parse again with the python parser for the usual error messages
+            if ordered:
+                y = _ordered_load(sdata, yaml.SafeLoader)
+            else:
+                y = yaml.load(sdata, yaml.SafeLoader)
+
+        if cache_file is not None:
+            _parse_cache_write(cache_file, cache_header, y)
     except Exception as e:
         estr = str(e)
         if "found character '\\t'" in estr:
@@ -236,7 +430,7 @@ def _format_yaml_load(data):
     return data
 
 
-def _ordered_load(stream, Loader=yaml.Loader, object_pairs_hook=OrderedDict):
+def _ordered_load(stream, Loader=yaml.Loader, object_pairs_hook=OrderedDict, version=None):
     """
     Ordered yaml loader
     Use this instead ot yaml.loader/yaml.saveloader to get an Ordereddict
@@ -244,6 +438,7 @@ def _ordered_load(stream, Loader=yaml.Loader, object_pairs_hook=OrderedDict):
     :param stream: stream to read from
     :param Loader: yaml-loader to use
     :object_pairs_hook: ...
+    :param version: yaml version to use, if the stream has no %YAML directive
 
     :return: OrderedDict structure
     """
@@ -257,7 +452,7 @@ def _ordered_load(stream, Loader=yaml.Loader, object_pairs_hook=OrderedDict):
         return object_pairs_hook(loader.construct_pairs(node))
 
     OrderedLoader.add_constructor(yaml.resolver.BaseResolver.DEFAULT_MAPPING_TAG, construct_mapping)
-    return yaml.load(stream, OrderedLoader)
+    return yaml.load(stream, OrderedLoader, version=version)
 
 
 def _format_yaml_dump(data):
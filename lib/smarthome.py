@@ -224,7 +224,10 @@ class SmartHome:
         os.makedirs(os.path.join(self._var_dir, 'backup'), mode=0o775, exist_ok=True)
         os.makedirs(os.path.join(self._var_dir, 'db'), mode=0o775, exist_ok=True)
         os.makedirs(os.path.join(self._var_dir, 'log'), mode=0o775, exist_ok=True)
+        os.makedirs(os.path.join(self._var_dir, 'logic_cache'), mode=0o775, exist_ok=True)
         os.makedirs(os.path.join(self._var_dir, 'run'), mode=0o775, exist_ok=True)
+        shyaml.set_parse_cache_dir(os.path.join(self._var_dir, 'yaml_cache'))
+        shyaml.prune_parse_cache()
 
     def check_migrate_config(self):
         """test for new directory setup and migrate if config_etc is set"""
@@ -33,6 +33,7 @@ import sys
 import re
 import hashlib
 import ipaddress
+import multiprocessing
 import socket
 import subprocess
 
@@ -732,6 +733,17 @@ def execute_subprocess(commandline, wait=True):
     return str(result, encoding='utf-8', errors='strict')
 
 
+def get_mp_context():
+    """
+    Return the multiprocessing context for worker processes of SmartHomeNG
+
+    Forking a process with running threads is not safe, a fresh interpreter is started
+    instead (forkserver, or spawn on platforms without forkserver).
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
 def running_virtual():
     """
     Return if we run in a virtual environment (venv or virtualenv).
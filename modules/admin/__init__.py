@@ -434,6 +434,7 @@ class WebApi(RESTResource):
         self.scenes = ScenesController(self.module)
         self.scenes.reload = ScenesReloadController(self.module)
         self.schedulers = SchedulersController(self.module)
+        self.schedulers.metrics = SchedulersMetricsController(self.module)
         self.server = ServerController(self.module)
         self.services = ServicesController(self.module)
         self.system = SystemController(self.module)
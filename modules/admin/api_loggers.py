@@ -188,6 +188,8 @@ class LoggersController(RESTResource):
         hl = []
         bl = []
         for h in active_logger.handlers:
+            # show the original handler, if logging uses a queue
+            h = self._sh.logs.get_original_handler(h)
             hl.append(h.__class__.__name__)
             try:
                 bl.append(h.baseFilename)
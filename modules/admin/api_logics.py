@@ -169,6 +169,7 @@ class LogicsController(RESTResource):
             mylogic['last_run'] = ''
             if loaded_logic.last_run():
                 mylogic['last_run'] = loaded_logic.last_run().strftime('%Y-%m-%d %H:%M:%S%z')
+            mylogic['run_stats'] = loaded_logic.get_run_statistics()
 
             mylogic['visu_acl'] = ''
             if hasattr(loaded_logic, 'visu_acl'):
@@ -412,6 +413,7 @@ class LogicsController(RESTResource):
             logic_conf['group'] = mylogic['group']
             logic_conf['next_exec'] = mylogic['next_exec']
             logic_conf['last_run'] = mylogic['last_run']
+            logic_conf['run_stats'] = mylogic['run_stats']
 
             # self.logger.warning("type = {}, mylogic = {}".format(type(mylogic), mylogic))
         # self.logger.warning("type = {}, logic_conf = {}".format(type(logic_conf), logic_conf))
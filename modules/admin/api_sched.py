@@ -155,3 +155,47 @@ class SchedulersController(RESTResource):
 
     read.expose_resource = True
     read.authentication_needed = True
+
+
+class SchedulersMetricsController(RESTResource):
+    def __init__(self, module):
+        self._sh = module._sh
+        self.module = module
+        self.logger = logging.getLogger(
+            __name__.split('.')[0] + '.' + __name__.split('.')[1] + '.' + __name__.split('.')[2][4:]
+        )
+
+        return
+
+    # ======================================================================
+    #  GET /api/schedulers/metrics?top=<n>&sort=<total|max|p95|count>
+    #
+    def read(self, id=None, top=20, sort='total'):
+        """
+        Handle GET requests for schedulers/metrics API
+
+        Returns timer lateness, run queue latency and depth and the jobs that used the most worker time
+        """
+        try:
+            top = int(top)
+        except ValueError:
+            top = 20
+        return json.dumps(self._sh.scheduler.get_metrics(top=top, sort=sort))
+
+    read.expose_resource = True
+    read.authentication_needed = True
+
+    # ======================================================================
+    #  PUT /api/schedulers/metrics/reset
+    #
+    def update(self, id=None):
+        """
+        Handle PUT requests for schedulers/metrics API (reset the metrics)
+        """
+        if id == 'reset':
+            self._sh.scheduler.reset_metrics()
+            return json.dumps({'result': 'ok'})
+        return json.dumps({'result': 'error', 'description': f"Unknown action '{id}'"})
+
+    update.expose_resource = True
+    update.authentication_needed = True
@@ -274,6 +274,7 @@ class ItemData:
                 'enforce_change': enforce_change,
                 'cache': cache,
                 'eval': html.escape(self.disp_str(item._eval)),
+                'eval_compile_errors': {attr: html.escape(err) for attr, err in item._eval_compile_errors.items()},
                 'trigger': self.disp_str(item._trigger),
                 'trigger_condition': self.disp_str(item._trigger_condition),
                 'trigger_condition_raw': self.disp_str(self._trigger_condition_raw),
@@ -44,9 +44,12 @@ from lib.shtime import Shtime
 from lib.utils import Utils
 from lib.scheduler import Scheduler
 
+from .topictrie import TopicTrie
+from .publishqueue import PublishQueue, PublishError
+
 
 class Mqtt(Module):
-    version = '1.8.0'
+    version = '1.8.1'
     longname = 'MQTT module for SmartHomeNG'
 
     __plugif_CallbackTopics = {}  # for plugin interface
@@ -87,6 +90,8 @@ class Mqtt(Module):
             # self.items_topic_prefix = self._parameters['items_topic_prefix']
             self.username = self._parameters['user']
             self.password = self._parameters['password']
+            self.publish_queue_size = self._parameters['publish_queue_size']
+            self.publish_queue_policy = self._parameters['publish_queue_policy']
 
             # self.tls = self._parameters['tls']
             # self.ca_certs = self._parameters['ca_certs']
@@ -166,9 +171,17 @@ class Mqtt(Module):
 
         self._subscribed_topics_lock = threading.Lock()
         self._subscribed_topics = {}  # subscribed topics
+        self._topic_trie = TopicTrie()  # subscribed topics by topic level (for matching received topics)
 
         self.logicpayloadtypes = {}  # payload types for subscribed topics for triggering logics
 
+        # outbound queue, publish_topic() does not wait for the broker (publish directly if size is 0)
+        self._publish_queue = None
+        if self.publish_queue_size > 0:
+            self._publish_queue = PublishQueue(
+                self._publish_message, max_size=self.publish_queue_size, policy=self.publish_queue_policy
+            )
+
         # ONLY used for multiinstance handling of plugins?
         # # needed because self.set_attr_value() can only set but not add attributes
         # self.at_instance_name = self.get_instance_name()
@@ -200,6 +213,8 @@ class Mqtt(Module):
             self._client.publish(self.birth_topic, self.birth_payload, self.qos, retain=True)
         self._client.loop_start()
         self.logger.debug('MQTT client loop started')
+        if self._publish_queue is not None:
+            self._publish_queue.start(name='modules.' + self.get_fullname() + '.publish_queue')
         # set the name of the paho thread for this plugin instance
         try:
             self._client._thread.name = 'modules.' + self.get_fullname() + '.paho_client'
@@ -215,6 +230,9 @@ class Mqtt(Module):
         #        self.logger.debug("Module '{}': Shutting down".format(self.shortname))
         self.logger.dbghigh(self.translate("Methode '{method}' aufgerufen", {'method': 'stop()'}))
 
+        if self._publish_queue is not None:
+            # send the queued messages before disconnecting
+            self._publish_queue.stop()
         self._client.loop_stop()
         self.logger.debug('MQTT client loop stopped')
         self._disconnect_from_broker()
@@ -260,6 +278,7 @@ class Mqtt(Module):
         self._client.on_disconnect = self._on_disconnect
         self._client.on_log = self._on_mqtt_log
         self._client.on_message = self._on_mqtt_message
+        self._client.on_publish = self._on_publish
 
         self._network_connected_to_broker = False
         if not self._network_connect_to_broker(from_init=True):
@@ -463,6 +482,7 @@ class Mqtt(Module):
             with self._subscribed_topics_lock:
                 # add topic
                 self._subscribed_topics[topic] = {}
+                self._topic_trie.add(topic)
                 # add subscription definition
                 self._add_subscription_definition(topic, source, source_type, callback, payload_type, bool_values, qos)
 
@@ -519,6 +539,7 @@ class Mqtt(Module):
             if self._subscribed_topics[topic] == {}:
                 # unsubscribe on broker needed, if no source is subscribing the topic any more
                 del self._subscribed_topics[topic]
+                self._topic_trie.remove(topic)
                 needUnsubscribe = True
         if needUnsubscribe:
             # Unsubscribe without lock (to avoid deadlock)
@@ -605,32 +626,11 @@ class Mqtt(Module):
             )
         )
 
-        with self._subscribed_topics_lock:
-            subscibed_topics = list(self._subscribed_topics.keys())
-
         # look for subscriptions to the received topic
         subscription_found = False
-        for topic in subscibed_topics:
-            topics_equal = False
-            if (topic.find('+') != -1) or (topic.find('#') != -1):
-                topics_equal = False
-                wc_topic = topic.split('/')
-                msg_topic = message.topic.split('/')
-
-                equal = False
-                if (len(wc_topic) == len(msg_topic)) or (
-                    wc_topic[len(wc_topic) - 1] == '#' and (len(wc_topic) <= len(msg_topic))
-                ):
-                    equal = True
-                    for i in range(len(wc_topic)):
-                        if not (wc_topic[i] == msg_topic[i] or wc_topic[i] == '+' or wc_topic[i] == '#'):
-                            equal = False
-                    if equal:
-                        topics_equal = True
-
-            if (topic == message.topic) or topics_equal:
-                topic_dict = self._subscribed_topics[topic]
-
+        for topic in self._topic_trie.match(message.topic):
+            topic_dict = self._subscribed_topics.get(topic)
+            if topic_dict is not None:
                 for subscription in list(topic_dict):
                     self.logger.debug(
                         "_on_mqtt_message: subscription '{}': {}".format(subscription, topic_dict[subscription])
@@ -878,6 +878,11 @@ class Mqtt(Module):
             )
         )
         payload = self.cast_to_mqtt(payload, bool_values)
+        if self._publish_queue is not None:
+            if not self._publish_queue.put(topic, payload, qos, retain):
+                self.logger.warning(f"{source_type} '{source}': topic '{topic}' dropped by the publish queue")
+                return False
+            return True
         try:
             self._client.publish(topic=topic, payload=payload, qos=qos, retain=retain)
             self.logger.info(
@@ -888,6 +893,37 @@ class Mqtt(Module):
             return False
         return True
 
+    def _publish_message(self, topic, payload, qos, retain):
+        """
+        Publish a message from the publish queue
+
+        :return: message id of the publish
+        :raises PublishError: if paho did not accept the message (e.g. while not connected)
+        """
+        info = self._client.publish(topic=topic, payload=payload, qos=qos, retain=retain)
+        if info.rc != mqtt.MQTT_ERR_SUCCESS:
+            raise PublishError(mqtt.error_string(info.rc))
+        self.logger.info(f"Published topic '{topic}' with payload '{payload}'")
+        return info.mid
+
+    def _on_publish(self, client, userdata, mid):
+        """
+        Callback function, called when paho has sent a message (qos 0) or got the acknowledge from the broker
+        """
+        if self._publish_queue is not None:
+            self._publish_queue.on_published(mid)
+
+    def get_publish_metrics(self):
+        """
+        Return the metrics of the publish queue
+
+        :return: dict with queue_depth, inflight, publish_latency (ms), published, coalesced, drops, failed and expired
+        :rtype: dict
+        """
+        if self._publish_queue is None:
+            return {}
+        return self._publish_queue.get_metrics()
+
     # ----------------------------------------------------------------------------------------
     #  casting methods
     # ----------------------------------------------------------------------------------------
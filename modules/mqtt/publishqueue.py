@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+#########################################################################
+#  Copyright 2018-      Martin Sinn                         m.sinn@gmx.de
+#########################################################################
+#  This file is part of SmartHomeNG.
+#  https://www.smarthomeNG.de
+#  https://knx-user-forum.de/forum/supportforen/smarthome-py
+#
+#  SmartHomeNG is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SmartHomeNG is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SmartHomeNG.  If not, see <http://www.gnu.org/licenses/>.
+#########################################################################
+
+"""
+Outbound queue of the mqtt module
+
+Threads that publish a topic only put the message into the queue, a sender
+thread hands the messages to the paho client. A slow broker therefore does not
+block item updates or logics.
+
+- retained messages to a topic that is still queued replace the queued payload
+  (latest value wins, the position in the queue is kept)
+- the queue is bounded, when it is full the oldest (``drop_oldest``) or the new
+  (``drop_newest``) message is dropped
+- messages handed to paho are in flight until paho reports them as published,
+  messages paho does not report within ``inflight_timeout`` seconds (e.g. qos 1/2
+  messages whose acknowledge got lost in a disconnect) are expired
+- a publish that paho does not accept (e.g. while disconnected) is counted as failed
+- messages put into the queue after it has been stopped are dropped
+"""
+
+import collections
+import logging
+import threading
+import time
+
+DROP_OLDEST = 'drop_oldest'
+DROP_NEWEST = 'drop_newest'
+
+logger = logging.getLogger(__name__)
+
+
+class PublishError(Exception):
+    """
+    Raised by the publish function, if paho did not accept a message
+    """
+
+
+class PublishQueue:
+    """
+    Bounded, coalescing queue of messages to publish
+
+    :param publish:  function(topic, payload, qos, retain) that publishes a message
+                     and returns the message id (mid) or None, raises PublishError
+                     if the message was not accepted
+    :param max_size: maximum number of queued messages
+    :param policy:   DROP_OLDEST or DROP_NEWEST
+    :param inflight_timeout: seconds after which a message that paho has not reported as published is expired
+    """
+
+    def __init__(self, publish, max_size=10000, policy=DROP_OLDEST, inflight_timeout=60):
+        self._publish = publish
+        self.max_size = max_size
+        self.policy = policy if policy in (DROP_OLDEST, DROP_NEWEST) else DROP_OLDEST
+        self._cond = threading.Condition()
+        self._queue = collections.deque()  # entries: [topic, payload, qos, retain, enqueue_time]
+        self._retained = {}  # topic -> queued entry of a retained message
+        self._inflight = {}  # topic -> number of messages handed to paho but not published yet
+        self._inflight_mids = {}  # mid -> (topic, enqueue_time, send_time), in the order of sending
+        self._early_mids = {}  # mid -> time, mids reported by paho before publish() returned
+        self._latencies = collections.deque(maxlen=100)
+        self.inflight_timeout = inflight_timeout
+        self._next_expire = 0
+        self._thread = None
+        self._alive = False
+        self._stopped = False
+        self._last_send_ok = True
+        self.published = 0
+        self.coalesced = 0
+        self.drops = 0
+        self.failed = 0
+        self.expired = 0
+
+    # ------------------------------------------------------------------
+    # producer side
+    # ------------------------------------------------------------------
+
+    def put(self, topic, payload, qos=0, retain=False):
+        """
+        Queue a message
+
+        :returns: False, if the message has been dropped
+        """
+        with self._cond:
+            if self._stopped:
+                self.drops += 1
+                logger.warning(f"Publish queue is stopped, topic '{topic}' dropped")
+                return False
+            if retain:
+                entry = self._retained.get(topic)
+                if entry is not None:
+                    entry[1] = payload
+                    entry[2] = qos
+                    self.coalesced += 1
+                    return True
+            if len(self._queue) >= self.max_size:
+                self.drops += 1
+                if self.policy == DROP_NEWEST:
+                    return False
+                self._forget(self._queue.popleft())
+            entry = [topic, payload, qos, retain, time.monotonic()]
+            self._queue.append(entry)
+            if retain:
+                self._retained[topic] = entry
+            self._cond.notify()
+        return True
+
+    def _forget(self, entry):
+        if entry[3] and self._retained.get(entry[0]) is entry:
+            del self._retained[entry[0]]
+
+    # ------------------------------------------------------------------
+    # sender side
+    # ------------------------------------------------------------------
+
+    def start(self, name='modules.mqtt.publish_queue'):
+        if self._thread is not None:
+            return
+        self._alive = True
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """
+        Stop the sender thread after the queued messages have been sent (or *timeout* expired)
+        """
+        with self._cond:
+            self._alive = False
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _get(self):
+        with self._cond:
+            while not self._queue and self._alive:
+                self._cond.wait(self.inflight_timeout if self._inflight_mids else None)
+                self._expire(time.monotonic())
+            if not self._queue:
+                return None
+            entry = self._queue.popleft()
+            self._forget(entry)
+            return entry
+
+    def _run(self):
+        while True:
+            entry = self._get()
+            if entry is None:
+                break
+            self.send(entry)
+
+    def send(self, entry):
+        """
+        Hand a message to paho and track it until it is published
+        """
+        topic, payload, qos, retain, enqueued = entry
+        with self._cond:
+            self._inflight[topic] = self._inflight.get(topic, 0) + 1
+        try:
+            mid = self._publish(topic, payload, qos, retain)
+        except Exception as e:
+            with self._cond:
+                self.failed += 1
+                self._release(topic)
+                first_failure = self._last_send_ok
+                self._last_send_ok = False
+            if first_failure or not isinstance(e, PublishError):
+                logger.error(f"Publish of topic '{topic}' failed: {e}")
+            else:
+                logger.debug(f"Publish of topic '{topic}' failed: {e}")
+            return
+        now = time.monotonic()
+        with self._cond:
+            self._last_send_ok = True
+            self.published += 1
+            if mid is None or self._early_mids.pop(mid, None) is not None:
+                self._done(topic, enqueued)
+            else:
+                stale = self._inflight_mids.pop(mid, None)
+                if stale is not None:
+                    # the message id has wrapped around before paho reported the old message
+                    self.expired += 1
+                    self._release(stale[0])
+                self._inflight_mids[mid] = (topic, enqueued, now)
+            if now >= self._next_expire:
+                self._expire(now)
+
+    def on_published(self, mid):
+        """
+        Called when paho reports a message as published (on_publish callback)
+        """
+        with self._cond:
+            inflight = self._inflight_mids.pop(mid, None)
+            if inflight is None:
+                # published before send() registered the mid, or not published through the queue
+                if len(self._early_mids) > 1000:
+                    self._early_mids.clear()
+                self._early_mids[mid] = time.monotonic()
+                return
+            self._done(inflight[0], inflight[1])
+
+    def _release(self, topic):
+        count = self._inflight.get(topic, 0) - 1
+        if count > 0:
+            self._inflight[topic] = count
+        else:
+            self._inflight.pop(topic, None)
+
+    def _done(self, topic, enqueued):
+        self._release(topic)
+        self._latencies.append(time.monotonic() - enqueued)
+
+    def _expire(self, now):
+        """
+        Forget messages that paho has not reported as published within inflight_timeout (lock must be held)
+        """
+        self._next_expire = now + 1
+        limit = now - self.inflight_timeout
+        while self._inflight_mids:
+            mid, (topic, __, sent) = next(iter(self._inflight_mids.items()))
+            if sent > limit:
+                break
+            del self._inflight_mids[mid]
+            self.expired += 1
+            self._release(topic)
+        for mid in [mid for mid, reported in self._early_mids.items() if reported <= limit]:
+            del self._early_mids[mid]
+
+    # ------------------------------------------------------------------
+    # metrics
+    # ------------------------------------------------------------------
+
+    def depth(self):
+        """Return the number of queued messages"""
+        with self._cond:
+            return len(self._queue)
+
+    def inflight(self, topic=None):
+        """
+        Return the number of messages in flight (for one topic or in total)
+        """
+        with self._cond:
+            if topic is not None:
+                return self._inflight.get(topic, 0)
+            return sum(self._inflight.values())
+
+    def latency(self):
+        """
+        Return the average time (in seconds) from queueing to publishing of the last 100 messages
+        """
+        with self._cond:
+            if not self._latencies:
+                return 0.0
+            return sum(self._latencies) / len(self._latencies)
+
+    def get_metrics(self):
+        """Return all metrics as a dict"""
+        return {
+            'queue_depth': self.depth(),
+            'inflight': self.inflight(),
+            'publish_latency': round(self.latency() * 1000, 1),  # ms
+            'published': self.published,
+            'coalesced': self.coalesced,
+            'drops': self.drops,
+            'failed': self.failed,
+            'expired': self.expired,
+        }
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+#########################################################################
+#  Copyright 2018-      Martin Sinn                         m.sinn@gmx.de
+#########################################################################
+#  This file is part of SmartHomeNG.
+#  https://www.smarthomeNG.de
+#  https://knx-user-forum.de/forum/supportforen/smarthome-py
+#
+#  SmartHomeNG is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SmartHomeNG is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SmartHomeNG.  If not, see <http://www.gnu.org/licenses/>.
+#########################################################################
+
+"""
+Trie of subscribed MQTT topics
+
+Every level of a subscribed topic (topic filter) is a node of the trie, so finding
+the subscriptions that match a received topic takes time proportional to the number
+of levels of the topic and not to the number of subscriptions.
+
+Matching follows the MQTT specification:
+
+- ``+`` matches exactly one level
+- ``#`` (last level only) matches the parent level and any number of levels below
+- topics starting with ``$`` (e.g. ``$SYS/...``) are not matched by a wildcard in the first level
+"""
+
+
+class _Node:
+    __slots__ = ('children', 'topic')
+
+    def __init__(self):
+        self.children = {}
+        self.topic = None  # subscribed topic filter ending at this node
+
+
+class TopicTrie:
+    """
+    Subscribed topic filters, organized by topic levels
+
+    Adding and removing topics should be serialized by the caller (the mqtt module
+    does that with its subscription lock), :meth:`match` may run concurrently.
+    """
+
+    def __init__(self):
+        self._root = _Node()
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, topic):
+        node = self._root
+        for level in topic.split('/'):
+            node = node.children.get(level)
+            if node is None:
+                return False
+        return node.topic is not None
+
+    def add(self, topic):
+        """
+        Add a topic filter
+
+        :param topic: topic, may contain the wildcards ``+`` and ``#``
+        """
+        node = self._root
+        for level in topic.split('/'):
+            child = node.children.get(level)
+            if child is None:
+                child = _Node()
+                node.children[level] = child
+            node = child
+        if node.topic is None:
+            self._count += 1
+        node.topic = topic
+
+    def remove(self, topic):
+        """
+        Remove a topic filter and the nodes that are not needed anymore
+
+        :param topic: topic filter that was added before
+        :returns:     True, if the topic filter was found
+        """
+        path = [self._root]
+        levels = topic.split('/')
+        for level in levels:
+            node = path[-1].children.get(level)
+            if node is None:
+                return False
+            path.append(node)
+        if path[-1].topic is None:
+            return False
+        path[-1].topic = None
+        self._count -= 1
+        # prune empty nodes from the leaf upwards
+        for i in range(len(levels), 0, -1):
+            node = path[i]
+            if node.topic is not None or node.children:
+                break
+            del path[i - 1].children[levels[i - 1]]
+        return True
+
+    def match(self, topic):
+        """
+        Find the subscribed topic filters that match a received topic
+
+        :param topic: topic of a received message (without wildcards)
+        :returns:     list of matching topic filters
+        """
+        result = []
+        nodes = [self._root]
+        for i, level in enumerate(topic.split('/')):
+            wildcards = i > 0 or not level.startswith('$')
+            next_nodes = []
+            for node in nodes:
+                children = node.children
+                child = children.get(level)
+                if child is not None:
+                    next_nodes.append(child)
+                if wildcards:
+                    child = children.get('+')
+                    if child is not None:
+                        next_nodes.append(child)
+                    child = children.get('#')
+                    if child is not None and child.topic is not None:
+                        result.append(child.topic)
+            nodes = next_nodes
+            if not nodes:
+                return result
+        for node in nodes:
+            if node.topic is not None:
+                result.append(node.topic)
+            # 'a/#' also matches 'a'
+            child = node.children.get('#')
+            if child is not None and child.topic is not None:
+                result.append(child.topic)
+        return result
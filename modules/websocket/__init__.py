@@ -39,7 +39,7 @@ from lib.utils import Utils
 
 
 class Websocket(Module):
-    version = '1.1.2'
+    version = '1.1.3'
     longname = 'Websocket module for SmartHomeNG'
     port = 0
 
@@ -68,6 +68,8 @@ class Websocket(Module):
         self.use_tls = self.get_parameter_value('use_tls')
         self.tls_cert = self.get_parameter_value('tls_cert')
         self.tls_key = self.get_parameter_value('tls_key')
+        self.update_window = self.get_parameter_value('update_window')
+        self.compression = self.get_parameter_value('compression')
 
         self.ssl_context = None
         if self.use_tls:
@@ -95,6 +97,7 @@ class Websocket(Module):
         self.logger.info(f'port / tls_port .: {self.port} / {self.tls_port}')
         self.logger.info(f'use_tls .........: {self.use_tls}')
         self.logger.info(f'certificate .....: key: ../etc/{self.tls_cert} / ../etc/{self.tls_key}')
+        self.logger.info(f'update_window ...: {self.update_window} ms, compression: {self.compression}')
 
         self.loop = None  # Var to hold the event loop for asyncio
 
@@ -180,6 +183,32 @@ class Websocket(Module):
         )
         return
 
+    def get_update_statistics(self):
+        """
+        Returns the counters of the item update batching of the payload protocols
+
+        :return: dict {protocol_name: {updates, frames, frames_saved, bytes, bytes_saved}}
+        """
+        result = {}
+        for path in self.protocols:
+            protocol = self.protocols[path]['protocol']
+            if hasattr(protocol, 'item_batcher'):
+                result[self.protocols[path]['name']] = protocol.item_batcher.get_statistics()
+        return result
+
+    def get_series_statistics(self):
+        """
+        Returns the counters of the shared series computation of the payload protocols
+
+        :return: dict {protocol_name: {cached, queries, incremental, shared}}
+        """
+        result = {}
+        for path in self.protocols:
+            protocol = self.protocols[path]['protocol']
+            if hasattr(protocol, 'series_registry'):
+                result[self.protocols[path]['name']] = protocol.series_registry.get_statistics()
+        return result
+
     def get_payload_protocol_by_id(self, id):
 
         result = None
@@ -268,6 +297,14 @@ class Websocket(Module):
 
     USERS = set()
 
+    def _compression_option(self):
+        """
+        Returns the value for the compression parameter of websockets.serve()
+
+        'deflate' negotiates permessage-deflate with clients that support it
+        """
+        return 'deflate' if self.compression else None
+
     async def ws_server(self, ip, port, ssl_context=None):
         while self._sh.shng_status['code'] != 20:
             await asyncio.sleep(1)
@@ -275,13 +312,15 @@ class Websocket(Module):
         if ssl_context:
             self.logger.info('Secure websocket server started')
             try:
-                await websockets.serve(self.handle_new_connection, ip, port, ssl=ssl_context)
+                await websockets.serve(
+                    self.handle_new_connection, ip, port, ssl=ssl_context, compression=self._compression_option()
+                )
             except OSError as e:
                 self.logger.error(f'Cannot start secure websocket server - error: {e}')
         else:
             self.logger.info('Websocket server started')
             try:
-                await websockets.serve(self.handle_new_connection, ip, port)
+                await websockets.serve(self.handle_new_connection, ip, port, compression=self._compression_option())
             except OSError as e:
                 self.logger.error(f'Cannot start websocket server - error: {e}')
 
@@ -39,6 +39,9 @@ from lib.logic import Logics
 
 from lib.shtime import Shtime
 
+from .batching import ItemUpdateBatcher
+from .series import SeriesRegistry
+
 """
 =======================================================================================
 =
@@ -49,7 +52,7 @@ from lib.shtime import Shtime
 
 
 class Protocol:
-    version = '0.1.0'
+    version = '0.1.3'
 
     protocol_id = 'adm'
     protocol_name = 'admin'
@@ -71,6 +74,12 @@ class Protocol:
         self.client_address = ws_server.client_address
         # self.get_users = partial(ws_server.get_payload_users, self.protocol_path)
 
+        # item updates for a client are collected for update_window ms and sent as one frame
+        self.item_batcher = ItemUpdateBatcher(self.send_item_frame, ws_server.update_window / 1000)
+
+        # identical series requests of different clients are queried only once per update cycle
+        self.series_registry = SeriesRegistry()
+
         return
 
     def start_global_tasks(self, loop):
@@ -353,6 +362,9 @@ class Protocol:
             del self.adm_monitor_logs[client_addr]
             self.logger.info(f'adm_cancel_all_abos: Log updates for {client_addr} were stoped')
 
+        # Drop item updates that have not been sent yet
+        self.item_batcher.discard(client_addr)
+
         # Remove client from item monitoring dict
         if client_addr in self.adm_monitor_items:
             del self.adm_monitor_items[client_addr]
@@ -539,6 +551,8 @@ class Protocol:
             if self.adm_update_series.get(client_addr, None) is None:
                 self.adm_update_series[client_addr] = {}
             self.adm_update_series[client_addr][reply['sid']] = {'update': reply['update'], 'params': reply['params']}
+            # periodic updates of the series only query the points newer than this result
+            self.series_registry.add(reply['params'], reply)
         return
 
     async def update_all_series(self):
@@ -555,6 +569,14 @@ class Protocol:
         keep_running = True
         while keep_running:
             remove = []
+            with self._series_lock:
+                self.series_registry.next_cycle(
+                    [
+                        series['params']
+                        for subscriptions in self.adm_update_series.values()
+                        for series in subscriptions.values()
+                    ]
+                )
             series_list = list(self.adm_update_series.keys())
             for client_addr in series_list:
                 if (client_addr in self.adm_clients) and client_addr not in remove:
@@ -629,15 +651,19 @@ class Protocol:
                         # self.logger.warning("update_series: {} - Processing sid={}, series={}".format(client_addr, sid, series))
                         item = self.items.return_item(series['params']['item'])
                         try:
-                            reply = item.series(**series['params'])
+                            # shared by all clients with the same subscription, only new points are queried
+                            reply = self.series_registry.get(
+                                series['params'], now, item.series, use_update_time=self.adm_ser_upd_cycle == 0
+                            )
                         except Exception as e:
                             self.logger.exception(f'Problem updating series for {series["params"]}: {e}')
                             remove.append(sid)
                             continue
                         try:
-                            self.adm_update_series[client_addr][reply['sid']] = {
+                            # the parameters of the subscription are kept, they are the key of the shared result
+                            self.adm_update_series[client_addr][sid] = {
                                 'update': reply['update'],
-                                'params': reply['params'],
+                                'params': series['params'],
                             }
                             del reply['update']
                             del reply['params']
@@ -858,25 +884,33 @@ class Protocol:
                     pass
 
             if len(items):  # only send an update if item/value pairs found to be send
-                data = {'cmd': 'item', 'items': items}
-                msg = json.dumps(data, default=self.json_serial)
-                try:
-                    self.logger.info(
-                        f"adm >MONIT: '{msg}'   -   to {self.build_log_info(self.client_address(websocket))}"
-                    )
-                    await websocket.send(msg)
-                except Exception as e:
-                    if str(e).startswith(('code = 1001', 'code = 1005', 'code = 1006')):
-                        self.logger.info(
-                            f"update_item: Error sending {data} - to {self.build_log_info(self.client_address(websocket))}  -  Error in 'await websocket.send(data)': {e}"
-                        )
-                    else:
-                        self.logger.notice(
-                            f"update_item: Error sending {data} - to {self.build_log_info(self.client_address(websocket))}  -  Error in 'await websocket.send(data)': {e}"
-                        )
+                await self.item_batcher.add(client_addr, websocket, items)
 
         return
 
+    async def send_item_frame(self, client_addr, websocket, items):
+        """
+        Send one item frame to a client (called by the item batcher)
+
+        :return: number of bytes sent
+        """
+        data = {'cmd': 'item', 'items': items}
+        msg = json.dumps(data, default=self.json_serial)
+        try:
+            self.logger.info(f"adm >MONIT: '{msg}'   -   to {self.build_log_info(self.client_address(websocket))}")
+            await websocket.send(msg)
+        except Exception as e:
+            if str(e).startswith(('code = 1001', 'code = 1005', 'code = 1006')):
+                self.logger.info(
+                    f"send_item_frame: Error sending {data} - to {self.build_log_info(self.client_address(websocket))}  -  Error in 'await websocket.send(data)': {e}"
+                )
+            else:
+                self.logger.notice(
+                    f"send_item_frame: Error sending {data} - to {self.build_log_info(self.client_address(websocket))}  -  Error in 'await websocket.send(data)': {e}"
+                )
+            return 0
+        return len(msg)
+
     async def update_log(self, log_entry):
         """
         send JSON data with update to log
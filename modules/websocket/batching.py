@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+#########################################################################
+#  Copyright 2020-      Martin Sinn                         m.sinn@gmx.de
+#########################################################################
+#  This file is part of SmartHomeNG.
+#
+#  SmartHomeNG is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SmartHomeNG is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SmartHomeNG.  If not, see <http://www.gnu.org/licenses/>.
+#########################################################################
+
+"""
+Batching of item updates for the payload protocols (smartvisu, admin)
+
+Item updates for a client are collected for a short flush window and then sent
+as one ``{'cmd': 'item', 'items': [...]}`` frame. If an item changes several
+times within the window, only the latest value is sent.
+"""
+
+import asyncio
+import json
+
+# size of an item frame without any items: {"cmd": "item", "items": []}
+FRAME_OVERHEAD = len(json.dumps({'cmd': 'item', 'items': []}))
+
+
+class ItemUpdateBatcher:
+    """
+    Collects item updates per client and sends them once per flush window
+
+    Has to be used from within the event loop of the websocket server.
+
+    :param send:   coroutine ``send(client_addr, websocket, items)`` that sends one item frame
+                   and returns the number of bytes sent
+    :param window: flush window in seconds (0 = send every update immediately)
+    """
+
+    def __init__(self, send, window=0.05):
+        self._send = send
+        self.window = window
+        self._pending = {}  # client_addr -> (websocket, {path: value})
+        self._flush_task = None  # task that flushes after the window, a reference keeps it from being garbage collected
+        self.updates = 0  # frames that would have been sent without batching
+        self.frames = 0  # frames sent
+        self.bytes = 0  # bytes sent
+        self.bytes_saved = 0  # estimated bytes saved by merging frames and dropping outdated values
+
+    async def add(self, client_addr, websocket, items):
+        """
+        Queue item updates for a client
+
+        :param client_addr: address of the client
+        :param websocket:   websocket of the client
+        :param items:       list of [path, value] pairs
+        """
+        self.updates += 1
+        if self.window <= 0:
+            await self._send_frame(client_addr, websocket, items)
+            return
+
+        pending = self._pending.get(client_addr)
+        if pending is None:
+            pending = self._pending[client_addr] = (websocket, {})
+        else:
+            self.bytes_saved += FRAME_OVERHEAD
+        values = pending[1]
+        for path, value in items:
+            if path in values:
+                try:
+                    self.bytes_saved += len(json.dumps([path, values[path]], default=str)) + 2
+                except Exception:
+                    pass
+            values[path] = value
+
+        if self._flush_task is None:
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.window)
+        await self.flush()
+
+    async def flush(self):
+        """
+        Send the collected updates to all clients
+        """
+        if self._flush_task is not None and self._flush_task is not asyncio.current_task():
+            self._flush_task.cancel()
+        self._flush_task = None
+        pending, self._pending = self._pending, {}
+        for client_addr, (websocket, values) in pending.items():
+            await self._send_frame(client_addr, websocket, [[path, value] for path, value in values.items()])
+
+    def discard(self, client_addr):
+        """
+        Drop the pending updates of a client (the client disconnected)
+        """
+        self._pending.pop(client_addr, None)
+
+    async def _send_frame(self, client_addr, websocket, items):
+        sent = await self._send(client_addr, websocket, items)
+        self.frames += 1
+        self.bytes += sent or 0
+
+    def get_statistics(self):
+        """
+        Return the counters of the batcher
+
+        :return: dict with updates, frames, frames_saved, bytes and bytes_saved
+        """
+        return {
+            'updates': self.updates,
+            'frames': self.frames,
+            'frames_saved': self.updates - self.frames - len(self._pending),
+            'bytes': self.bytes,
+            'bytes_saved': self.bytes_saved,
+        }
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+#########################################################################
+#  Copyright 2020-      Martin Sinn                         m.sinn@gmx.de
+#########################################################################
+#  This file is part of SmartHomeNG.
+#
+#  SmartHomeNG is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SmartHomeNG is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SmartHomeNG.  If not, see <http://www.gnu.org/licenses/>.
+#########################################################################
+
+
+"""
+Shared computation of series data for the payload protocols (smartvisu, admin)
+
+Several clients (e.g. visu pages open on multiple devices) often subscribe the
+same series. Within an update cycle, a series with identical parameters
+(item, series function, start, end, count) is queried from the database only
+once and the result is sent to all clients that subscribed it. A result is
+reused until the update time that was returned with it.
+
+The result of a subscription is kept as long as a client subscribes it. When it
+has to be updated, only the points newer than its last point are queried from
+the database. They are appended to the kept result and points that left the
+time window of the series are dropped, so clients still get the full series.
+The start of the query parameters moves with each update (the database plugin
+returns the parameters for the next query with every reply), therefore results
+are keyed by the other parameters of the subscription (see :meth:`SeriesRegistry.key`).
+"""
+
+import json
+
+
+def last_timestamp(series, default=None):
+    """
+    Return the timestamp of the last point of a series (list of [timestamp, value])
+    """
+    try:
+        return series[-1][0]
+    except (IndexError, KeyError, TypeError):
+        return default
+
+
+class SeriesRegistry:
+    """
+    Cache of series results, keyed by the parameters of the series subscription
+
+    The registry is not thread safe, the protocols use it while holding their
+    ``_series_lock``.
+    """
+
+    def __init__(self):
+        self._results = {}  # key -> [cycle, valid_until, reply, span]
+        self.cycle = 0
+        self.queries = 0  # series queried from the database (complete time window)
+        self.incremental = 0  # series updated by querying only the points newer than the last point
+        self.shared = 0  # series replies served from the registry
+
+    @staticmethod
+    def key(params):
+        """
+        Return the key for the parameters of a series subscription
+
+        ``start`` and ``update`` are not part of the key, they change with every update of the series.
+        """
+        return json.dumps(
+            {k: v for k, v in params.items() if k not in ('start', 'update')}, sort_keys=True, default=str
+        )
+
+    def next_cycle(self, subscribed=None):
+        """
+        Start a new update cycle and drop the results of series that are not subscribed any more
+
+        :param subscribed: parameters of all subscribed series (None keeps all results)
+        """
+        self.cycle += 1
+        if subscribed is not None:
+            keys = {self.key(params) for params in subscribed}
+            for key in [key for key in self._results if key not in keys]:
+                del self._results[key]
+
+    def add(self, params, reply):
+        """
+        Keep the result of a series request (the initial query of a subscription)
+
+        An existing result is not replaced, it is kept up to date by :meth:`get`.
+        """
+        key = self.key(params)
+        if key not in self._results and reply.get('series'):
+            self._results[key] = [self.cycle, reply.get('update'), dict(reply), self._span(reply['series'])]
+
+    def get(self, params, now, query, use_update_time=True):
+        """
+        Return the reply for a series subscription, query the database only if needed
+
+        :param params:          parameters of the series request (as returned by ``item.series()``)
+        :param now:             current time
+        :param query:           function that queries the series, called with the parameters as keyword arguments
+        :param use_update_time: reuse results until their update time, otherwise only within the cycle
+
+        :return: reply dict (a copy, the caller may modify it)
+        """
+        key = self.key(params)
+        entry = self._results.get(key)
+        if entry is not None:
+            cycle, valid_until, reply, span = entry
+            if cycle == self.cycle or (use_update_time and valid_until is not None and valid_until > now):
+                self.shared += 1
+                return dict(reply)
+            last = last_timestamp(reply.get('series'))
+            if last is not None:
+                reply = self._append(reply, query(**dict(params, start=last, update=True)), last, span)
+                self.incremental += 1
+                self._results[key] = [self.cycle, reply.get('update'), reply, span]
+                return dict(reply)
+
+        reply = query(**params)
+        self.queries += 1
+        self._results[key] = [self.cycle, reply.get('update'), dict(reply), self._span(reply.get('series'))]
+        return reply
+
+    @staticmethod
+    def _span(series):
+        # length of the time window of a series
+        try:
+            return series[-1][0] - series[0][0]
+        except (IndexError, KeyError, TypeError):
+            return None
+
+    @staticmethod
+    def _append(reply, new_reply, last, span):
+        """
+        Append the points of *new_reply* that are newer than *last* to the series of *reply*
+
+        Points older than *span* before the newest point are dropped.
+        """
+        series = list(reply['series'])
+        series.extend(point for point in new_reply.get('series') or [] if point[0] > last)
+        if span is not None:
+            oldest = series[-1][0] - span
+            series = [point for point in series if point[0] >= oldest]
+        return dict(new_reply, series=series)
+
+    def clear(self):
+        self._results = {}
+
+    def get_statistics(self):
+        """
+        Return the counters of the registry
+
+        :return: dict with cached, queries, incremental and shared
+        """
+        return {
+            'cached': len(self._results),
+            'queries': self.queries,
+            'incremental': self.incremental,
+            'shared': self.shared,
+        }
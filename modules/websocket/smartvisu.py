@@ -39,6 +39,9 @@ from lib.logic import Logics
 
 from lib.shtime import Shtime
 
+from .batching import ItemUpdateBatcher
+from .series import SeriesRegistry
+
 """
 ===============================================================================
 =
@@ -51,7 +54,7 @@ from lib.shtime import Shtime
 
 
 class Protocol:
-    version = '1.0.5'
+    version = '1.0.8'
 
     protocol_id = 'sv'
     protocol_name = 'smartvisu'
@@ -73,6 +76,12 @@ class Protocol:
         self.client_address = ws_server.client_address
         # self.get_users = partial(ws_server.get_payload_users, self.protocol_path)
 
+        # item updates for a client are collected for update_window ms and sent as one frame
+        self.item_batcher = ItemUpdateBatcher(self.send_item_frame, ws_server.update_window / 1000)
+
+        # identical series requests of different clients are queried only once per update cycle
+        self.series_registry = SeriesRegistry()
+
         return
 
     def start_global_tasks(self, loop):
@@ -109,6 +118,8 @@ class Protocol:
     sv_ser_upd_cycle = 0
 
     sv_monitor_items = {}
+    # reverse index of sv_monitor_items: {item_path: {client_addr: [(monitored path, property name or None)]}}
+    sv_item_index = {}
     sv_monitor_logs = {}
     sv_clients = {}
     sv_update_series = {}
@@ -245,6 +256,7 @@ class Protocol:
                         if data['items'] != [None]:
                             answer = await self.prepare_monitor(data, client_addr)
                         else:
+                            self.sv_unindex_monitor(client_addr)
                             self.sv_monitor_items[client_addr] = []  # stop monitoring of items
 
                     elif command == 'logic':
@@ -407,7 +419,11 @@ class Protocol:
             del self.sv_monitor_logs[client_addr]
             self.logger.info(f'sv_cancel_all_abos: Log updates for {client_addr} were stoped')
 
+        # Drop item updates that have not been sent yet
+        self.item_batcher.discard(client_addr)
+
         # Remove client from item monitoring dict
+        self.sv_unindex_monitor(client_addr)
         if client_addr in self.sv_monitor_items:
             del self.sv_monitor_items[client_addr]
             self.logger.info(f'sv_cancel_all_abos: Item monitoring for {client_addr} was removed')
@@ -486,10 +502,43 @@ class Protocol:
             f'json_parse: send to {self.build_log_info(client_addr)}: { ({"cmd": "item", "items": items}) }'
         )
         answer = {'cmd': 'item', 'items': items}
+        self.sv_index_monitor(client_addr, newmonitor_items)
         self.sv_monitor_items[client_addr] = newmonitor_items
         self.logger.info(f'Client {self.build_log_info(client_addr)} new monitored items are {newmonitor_items}')
         return answer
 
+    def sv_index_monitor(self, client_addr, monitor_items):
+        """
+        Replace the entries of a client in the reverse index of monitored items
+
+        Has to be called before sv_monitor_items[client_addr] is replaced
+
+        :param client_addr: address of the client (visu)
+        :param monitor_items: list of monitored paths ('<item>' or '<item>.property.<name>')
+        """
+        self.sv_unindex_monitor(client_addr)
+        for path in monitor_items:
+            path_parts = path.split('.property.')
+            if len(path_parts) > 2:
+                continue
+            prop_name = path_parts[1] if len(path_parts) == 2 else None
+            clients = self.sv_item_index.setdefault(path_parts[0], {})
+            clients.setdefault(client_addr, []).append((path, prop_name))
+
+    def sv_unindex_monitor(self, client_addr):
+        """
+        Remove all entries of a client from the reverse index of monitored items
+
+        :param client_addr: address of the client (visu)
+        """
+        for path in self.sv_monitor_items.get(client_addr, []):
+            item_path = path.split('.property.')[0]
+            clients = self.sv_item_index.get(item_path)
+            if clients is not None:
+                clients.pop(client_addr, None)
+                if not clients:
+                    del self.sv_item_index[item_path]
+
     def build_client_info(self, client_addr):
         """
         Build string with client host info for info/error logging
@@ -598,6 +647,8 @@ class Protocol:
             if self.sv_update_series.get(client_addr, None) is None:
                 self.sv_update_series[client_addr] = {}
             self.sv_update_series[client_addr][reply['sid']] = {'update': reply['update'], 'params': reply['params']}
+            # periodic updates of the series only query the points newer than this result
+            self.series_registry.add(reply['params'], reply)
             self.logger.info(f"set_periodic_series_updates: {reply['sid']=}")
         return
 
@@ -615,6 +666,14 @@ class Protocol:
         keep_running = True
         while keep_running:
             remove = []
+            with self._series_lock:
+                self.series_registry.next_cycle(
+                    [
+                        series['params']
+                        for subscriptions in self.sv_update_series.values()
+                        for series in subscriptions.values()
+                    ]
+                )
             series_list = list(self.sv_update_series.keys())
             self.logger.info(f'update_all_series: {series_list=}')
             for client_addr in series_list:
@@ -691,15 +750,19 @@ class Protocol:
                         # self.logger.warning("update_series: {} - Processing sid={}, series={}".format(client_addr, sid, series))
                         item = self.items.return_item(series['params']['item'])
                         try:
-                            reply = item.series(**series['params'])
+                            # shared by all clients with the same subscription, only new points are queried
+                            reply = self.series_registry.get(
+                                series['params'], now, item.series, use_update_time=self.sv_ser_upd_cycle == 0
+                            )
                         except Exception as e:
                             self.logger.exception(f'Problem updating series for {series["params"]}: {e}')
                             remove.append(sid)
                             continue
                         try:
-                            self.sv_update_series[client_addr][reply['sid']] = {
+                            # the parameters of the subscription are kept, they are the key of the shared result
+                            self.sv_update_series[client_addr][sid] = {
                                 'update': reply['update'],
-                                'params': reply['params'],
+                                'params': series['params'],
                             }
                             del reply['update']
                             del reply['params']
@@ -869,64 +932,60 @@ class Protocol:
         """
         send JSON data with new value of an item (for items that are monitored by a smartVISU)
         """
-        # self.logger.warning("update_item: self.monitor['item']")
-        items_list = list(self.sv_monitor_items.keys())
-        for client_addr in items_list:
+        clients = self.sv_item_index.get(item_name)
+        if not clients:
+            return
+        for client_addr, candidates in list(clients.items()):
+            if client_addr not in self.sv_clients:
+                continue
             items = []
             websocket = self.sv_clients[client_addr]['websocket']
-            for candidate in self.sv_monitor_items[client_addr]:
+            for candidate, prop_name in candidates:
                 try:
-                    # self.logger.debug("Send update to Client {0} for candidate {1} and item_name {2}?".format(client_addr, candidate, item_name))
-                    path_parts = candidate.split('.property.')
-                    if path_parts[0] != item_name:
-                        continue
-
-                    if len(path_parts) == 1 and client_addr != source:
+                    if prop_name is None:
+                        if client_addr == source:
+                            continue
                         self.logger.debug(
-                            f'Send update to Client {self.build_log_info(client_addr)} for item {path_parts[0]}'
+                            f'Send update to Client {self.build_log_info(client_addr)} for item {item_name}'
                         )
-                        items.append([path_parts[0], item_value])
-                        continue
-
-                    if len(path_parts) == 2:
+                        items.append([item_name, item_value])
+                    else:
                         self.logger.debug(
-                            f'Send update to Client {self.build_log_info(client_addr)} for item {path_parts[0]} with property {path_parts[1]}'
+                            f'Send update to Client {self.build_log_info(client_addr)} for item {item_name} with property {prop_name}'
                         )
-                        prop = self.items.return_item(path_parts[0]).property
-                        prop_attr = getattr(prop, path_parts[1])
-                        items.append([candidate, prop_attr])
-                        continue
-
-                    if client_addr == source:
-                        self.logger.warning(f'update_item: client_addr == source - {self.build_log_info(client_addr)}')
-                        continue
-
-                    self.logger.warning(
-                        f'Could not send update to Client {self.build_log_info(client_addr)}: something is wrong with item path {item_name}, value={item_value}, source={source}'
-                    )
+                        prop = self.items.return_item(item_name).property
+                        items.append([candidate, getattr(prop, prop_name)])
                 except Exception:
                     pass
 
             if len(items):  # only send an update if item/value pairs found to be send
-                data = {'cmd': 'item', 'items': items}
-                msg = json.dumps(data, default=self.json_serial)
-                try:
-                    self.logger.dbgmed(
-                        f"visu >MONIT: '{msg}'   -   to {self.build_log_info(self.client_address(websocket))}"
-                    )
-                    await websocket.send(msg)
-                except Exception as e:
-                    if str(e).startswith(('code = 1001', 'code = 1005', 'code = 1006')):
-                        self.logger.info(
-                            f"update_item: Error sending {data} - to {self.build_log_info(self.client_address(websocket))}  -  Error in 'await websocket.send(data)': {e}"
-                        )
-                    else:
-                        self.logger.notice(
-                            f"update_item: Error sending {data} - to {self.build_log_info(self.client_address(websocket))}  -  Error in 'await websocket.send(data)': {e}"
-                        )
+                await self.item_batcher.add(client_addr, websocket, items)
 
         return
 
+    async def send_item_frame(self, client_addr, websocket, items):
+        """
+        Send one item frame to a client (called by the item batcher)
+
+        :return: number of bytes sent
+        """
+        data = {'cmd': 'item', 'items': items}
+        msg = json.dumps(data, default=self.json_serial)
+        try:
+            self.logger.dbgmed(f"visu >MONIT: '{msg}'   -   to {self.build_log_info(self.client_address(websocket))}")
+            await websocket.send(msg)
+        except Exception as e:
+            if str(e).startswith(('code = 1001', 'code = 1005', 'code = 1006')):
+                self.logger.info(
+                    f"send_item_frame: Error sending {data} - to {self.build_log_info(self.client_address(websocket))}  -  Error in 'await websocket.send(data)': {e}"
+                )
+            else:
+                self.logger.notice(
+                    f"send_item_frame: Error sending {data} - to {self.build_log_info(self.client_address(websocket))}  -  Error in 'await websocket.send(data)': {e}"
+                )
+            return 0
+        return len(msg)
+
     async def update_log(self, log_entry):
         """
         send JSON data with update to log
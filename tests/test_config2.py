@@ -4,7 +4,8 @@
 Additional tests for lib/config.py (Tier 2 coverage)
 
 Existing test_config.py covers parse_basename YAML reading basics.
-This file covers pure-function helpers and the sanitisation pipeline.
+This file covers pure-function helpers, the sanitisation pipeline and the
+(parallel) loading of item directories.
 """
 
 import collections
@@ -13,6 +14,7 @@ import sys
 import tempfile
 import textwrap
 import unittest
+import unittest.mock
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
@@ -338,5 +340,72 @@ class TestParseBasename(unittest.TestCase):
         self.assertIn('gamma', result)
 
 
+# ===========================================================================
+# parse_itemsdir
+# ===========================================================================
+
+
+class TestParseItemsdir(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.itemsdir = tmp.name + os.sep
+        unit = collections.OrderedDict([('type', 'str')])
+        self.structs = {'sensor': collections.OrderedDict([('type', 'num'), ('unit', unit)])}
+        for i in range(6):
+            self._write(
+                f'file{i}.yaml',
+                f"""
+                room{i}:
+                    light:
+                        type: bool
+                        comment: removed
+                    temp:
+                        struct: sensor
+                shared:
+                    attr: file{i}
+                    child{i}:
+                        type: num
+            """,
+            )
+
+    def _write(self, name, content):
+        with open(self.itemsdir + name, 'w', encoding='utf-8') as f:
+            f.write(textwrap.dedent(content))
+
+    def _parse(self, workers):
+        return config.parse_itemsdir(self.itemsdir, None, addfilenames=True, struct_dict=self.structs, workers=workers)
+
+    def test_parallel_result_is_identical(self):
+        sequential = self._parse(1)
+        with unittest.mock.patch.object(config, 'PARALLEL_MIN_FILES', 2):
+            parallel = self._parse(2)
+        self.assertEqual(repr(parallel), repr(sequential))
+        self.assertEqual(sequential['shared']['attr'], 'file5')
+        self.assertEqual(list(sequential), ['room0', 'shared', 'room1', 'room2', 'room3', 'room4', 'room5'])
+
+    def test_worker_log_records_are_replayed(self):
+        self._write(
+            'file9.yaml',
+            """
+            1bad_item:
+                type: num
+        """,
+        )
+        with unittest.mock.patch.object(config, 'PARALLEL_MIN_FILES', 2):
+            with self.assertLogs('lib.config', level='WARNING') as cm:
+                result = self._parse(2)
+        self.assertNotIn('1bad_item', result)
+        self.assertTrue(any('1bad_item' in line for line in cm.output))
+
+    def test_invalid_file_is_skipped(self):
+        self._write('file3.yaml', 'key: [unclosed bracket\n')
+        with unittest.mock.patch.object(config, 'PARALLEL_MIN_FILES', 2):
+            with self.assertLogs('lib.shyaml', level='ERROR'):
+                result = self._parse(2)
+        self.assertNotIn('room3', result)
+        self.assertIn('room4', result)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -43,7 +43,6 @@ from tests.mock.core import MockSmartHome
 def _reset():
     lib.item.items._items_instance = None
     lib.item.item._items_instance = None
-    Items._Items__items = []
     Items._Items__item_dict = {}
     Items._children = []
     Items.plugin_attributes = {}
@@ -35,6 +35,11 @@ on_change execution:
 on_update execution:
   every write fires on_update (including same-value)
   on_update with dest → target updated
+
+compiled expressions:
+  _init_prerun compiles eval / on_change into code objects
+  syntax errors are recorded in _eval_compile_errors
+  setting property.eval replaces the compiled code
 """
 
 import logging
@@ -59,7 +64,6 @@ import tests.common as common
 def _reset():
     lib.item.items._items_instance = None
     lib.item.item._items_instance = None
-    Items._Items__items = []
     Items._Items__item_dict = {}
     Items._children = []
     Items.plugin_attributes = {}
@@ -292,6 +296,45 @@ class TestRunEvalDirect(_Base):
         self.assertIn('Eval', item.changed_by())
 
 
+# ===========================================================================
+# compiled expressions
+# ===========================================================================
+
+
+class TestCompiledExpressions(_Base):
+    def test_init_prerun_compiles_eval(self):
+        item = _item(self.sh, 'cmp_eval', eval='2 + 3')
+        item._init_prerun()
+        self.assertIn('2 + 3', item._eval_code)
+        self.assertEqual(item._eval_compile_errors, {})
+
+    def test_init_prerun_compiles_on_change(self):
+        _item(self.sh, 'cmp_dest')
+        item = _item(self.sh, 'cmp_src', on_change='cmp_dest = value * 2')
+        item._init_prerun()
+        self.assertIn('value * 2', item._eval_code)
+
+    def test_compiled_eval_sets_value(self):
+        item = _item(self.sh, 'cmp_run', eval='6 * 7')
+        item._init_prerun()
+        item._Item__run_eval()
+        self.assertEqual(item._value, 42)
+
+    def test_syntax_error_is_recorded(self):
+        item = _item(self.sh, 'cmp_bad', eval='1 +* 2')
+        item._init_prerun()
+        self.assertIn('eval', item._eval_compile_errors)
+        item._Item__run_eval()  # must not raise
+
+    def test_setting_eval_property_recompiles(self):
+        item = _item(self.sh, 'cmp_prop', eval='1')
+        item._init_prerun()
+        item.property.eval = '2 + 2'
+        self.assertNotIn('1', item._eval_code)
+        item._Item__run_eval()
+        self.assertEqual(item._value, 4)
+
+
 # ===========================================================================
 # on_change execution
 # ===========================================================================
@@ -17,6 +17,11 @@ Test classes
 TestMakeEvalEnvKeys
     _make_eval_env() returns a dict containing every documented key.
 
+TestEvalEnvReuse
+    The constant part of the namespace is built once per item; every call
+    gets its own copy, so names assigned by an expression do not leak.
+    Includes a microbenchmark against building the namespace per call.
+
 TestRunEvalDocumentedVars
     run_eval() (via Item.__run_eval) evaluates expressions using each
     documented variable and produces the expected item value.
@@ -48,6 +53,7 @@ TestRunEvalCompatIntegration
 import logging
 import os
 import sys
+import timeit
 import unittest
 from unittest.mock import patch
 
@@ -60,7 +66,7 @@ common.register_shng_log_levels()
 import lib.item.item
 import lib.item.items
 from lib.item.items import Items
-from lib.item._eval import _make_eval_env
+from lib.item._eval import _make_eval_env, _build_eval_env_base
 from lib.item._eval_compat import _eval_with_legacy_fallback, _EVAL_FAILED
 from lib.item._casting import run_attribute_eval
 from tests.mock.core import MockSmartHome
@@ -74,7 +80,6 @@ from tests.mock.core import MockSmartHome
 def _reset():
     lib.item.items._items_instance = None
     lib.item.item._items_instance = None
-    Items._Items__items = []
     Items._Items__item_dict = {}
     Items._children = []
     Items.plugin_attributes = {}
@@ -618,5 +623,74 @@ class TestRunEvalCompatIntegration(_Base):
         self.assertTrue(any('future release' in line for line in cm.output))
 
 
+# ===========================================================================
+# TestEvalEnvReuse — cached base namespace, copy per call
+# ===========================================================================
+
+
+class TestEvalEnvReuse(_Base):
+    """The base namespace is cached on the item, calls only patch the trigger parameters."""
+
+    def test_base_is_built_once(self):
+        item = _item(self.sh, 'reuse_once')
+        _make_eval_env(item, value=1)
+        base = item._eval_env_base
+        _make_eval_env(item, value=2)
+        self.assertIs(item._eval_env_base, base)
+
+    def test_call_parameters_are_patched(self):
+        item = _item(self.sh, 'reuse_params')
+        _make_eval_env(item, value=1, caller='A', source='s1', dest='d1')
+        ns = _make_eval_env(item, value=2, caller='B')
+        self.assertEqual(ns['value'], 2)
+        self.assertEqual(ns['caller'], 'B')
+        self.assertIsNone(ns['source'])
+        self.assertIsNone(ns['dest'])
+
+    def test_each_call_gets_its_own_dict(self):
+        item = _item(self.sh, 'reuse_copy')
+        ns1 = _make_eval_env(item)
+        ns2 = _make_eval_env(item)
+        self.assertIsNot(ns1, ns2)
+        self.assertIsNot(ns1, item._eval_env_base)
+
+    def test_assignment_in_expression_does_not_leak(self):
+        """A name bound by ':=' must not be visible in the next evaluation."""
+        first = _item(self.sh, 'leak_first', eval='(leaked := 5)')
+        second = _item(self.sh, 'leak_second', eval="42 if 'leaked' not in dir() else 0")
+        first._Item__run_eval()
+        first._Item__run_eval()
+        second._Item__run_eval()
+        self.assertEqual(first._value, 5)
+        self.assertNotIn('leaked', first._eval_env_base)
+        self.assertEqual(second._value, 42)
+
+    def test_items_have_separate_bases(self):
+        a = _item(self.sh, 'reuse_a')
+        b = _item(self.sh, 'reuse_b')
+        self.assertIs(_make_eval_env(a)['item'], a)
+        self.assertIs(_make_eval_env(b)['item'], b)
+
+    def test_microbenchmark_cached_namespace(self):
+        """Copying the cached base is cheaper than building the namespace for every call."""
+        item = _item(self.sh, 'reuse_bench')
+
+        def per_call_build():
+            ns = _build_eval_env_base(item)
+            ns.update(value=1, caller='Bench', source=None, dest=None)
+            return ns
+
+        def cached():
+            return _make_eval_env(item, value=1, caller='Bench')
+
+        self.assertEqual(per_call_build(), cached())
+        t_build = min(timeit.repeat(per_call_build, number=2000, repeat=3))
+        t_cached = min(timeit.repeat(cached, number=2000, repeat=3))
+        logging.getLogger(__name__).info(
+            f'eval namespace: per-call build {t_build / 2:.3f} ms/1000, cached {t_cached / 2:.3f} ms/1000'
+        )
+        self.assertLess(t_cached, t_build)
+
+
 if __name__ == '__main__':
     unittest.main()
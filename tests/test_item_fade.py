@@ -33,11 +33,24 @@ Default parameters:
   delta defaults to 1
   instant_set defaults to True
   caller defaults to None
+
+stop_fade / continue_fade patterns:
+  compiled patterns are cached
+  invalid regex → warning logged, parameter set to None
+
+FadeEngine:
+  many fades run in the engine thread, fadejob returns immediately
+  instant_set=False delays the first step
+  stop_fade / continue_fade / other callers stop a running fade
+  update=True changes the destination of a running fade
+  stop() drops active fades, fadejob works synchronously afterwards
 """
 
 import logging
 import os
 import sys
+import threading
+import time
 import unittest
 from unittest.mock import MagicMock, patch
 
@@ -50,15 +63,14 @@ common.register_shng_log_levels()
 import lib.item.item
 import lib.item.items
 from lib.item.items import Items
-from lib.item._fade import fade
-from lib.item.helpers import fadejob
+from lib.item._fade import fade, compile_fade_patterns
+from lib.item.helpers import fadejob, FadeEngine
 from tests.mock.core import MockSmartHome
 
 
 def _reset():
     lib.item.items._items_instance = None
     lib.item.item._items_instance = None
-    Items._Items__items = []
     Items._Items__item_dict = {}
     Items._children = []
     Items.plugin_attributes = {}
@@ -267,5 +279,120 @@ class TestFadeDefaults(unittest.TestCase):
         self.assertIsNone(item._fadingdetails['continue_fade'])
 
 
+class TestFadePatterns(unittest.TestCase):
+    def setUp(self):
+        _reset()
+        self.sh = MockSmartHome()
+
+    def test_patterns_are_cached(self):
+        first = compile_fade_patterns(['Logic:.*', 'Admin'])
+        self.assertIs(compile_fade_patterns(['Logic:.*', 'Admin']), first)
+        self.assertTrue(first[0].match('logic:source'))
+
+    def test_invalid_regex_warns_and_clears(self):
+        item = _item(self.sh, value=10)
+        with self.assertLogs('lib.item', level='WARNING') as cm:
+            fade(item, 0, stop_fade=['Logic('], continue_fade=['['])
+        self.assertTrue(any('stop_fade' in m for m in cm.output))
+        self.assertTrue(any('continue_fade' in m for m in cm.output))
+        self.assertIsNone(item._fadingdetails['stop_fade'])
+        self.assertIsNone(item._fadingdetails['continue_fade'])
+
+
+class TestFadeEngine(unittest.TestCase):
+    def setUp(self):
+        _reset()
+        self.sh = MockSmartHome()
+        # run fadejob directly instead of through the scheduler
+        self.sh.trigger = lambda name, obj, value=None, **kwargs: obj(**value)
+        self.engine = FadeEngine()
+        patcher = patch('lib.item.helpers._fade_engine', self.engine)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.engine.start()
+        self.addCleanup(self.engine.stop)
+
+    def _item(self, path, value=0):
+        item = _item(self.sh, path=path, value=value)
+        item._sh.trigger = self.sh.trigger
+        return item
+
+    def _wait(self, condition, timeout=5):
+        end = time.monotonic() + timeout
+        while time.monotonic() < end:
+            if condition():
+                return True
+            time.sleep(0.005)
+        return False
+
+    def test_many_fades_in_one_thread(self):
+        items = [self._item(f'light{i}', value=100) for i in range(40)]
+        threads_before = threading.active_count()
+        start = time.monotonic()
+        for item in items:
+            item.fade(0, step=10, delta=0.01)
+        # fadejob returned without waiting for the fades
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertTrue(self._wait(lambda: all(item._value == 0 for item in items)))
+        self.assertEqual(threading.active_count(), threads_before)
+        self.assertFalse(any(item._fading for item in items))
+        self.assertEqual(self.engine.active(), 0)
+        self.assertEqual(self.engine.fades, 40)
+
+    def test_instant_set_false_delays_first_step(self):
+        item = self._item('dimmer', value=0)
+        item.fade(100, step=10, delta=0.3, instant_set=False)
+        time.sleep(0.1)
+        self.assertEqual(item._value, 0)
+        self.assertTrue(self._wait(lambda: item._value == 10))
+
+    def test_other_caller_stops_fade(self):
+        item = self._item('dimmer', value=0)
+        item.fade(100, step=10, delta=0.05)
+        self.assertTrue(self._wait(lambda: item._value >= 20))
+        item(55, 'Logic')
+        self.assertFalse(item._fading)
+        time.sleep(0.15)
+        self.assertEqual(item._value, 55)
+        self.assertEqual(self.engine.active(), 0)
+
+    def test_stop_fade_list(self):
+        item = self._item('dimmer', value=0)
+        item.fade(100, step=10, delta=0.05, stop_fade=['Admin:.*'])
+        self.assertTrue(self._wait(lambda: item._value >= 10))
+        item(item._value + 3, 'Logic')  # not in stop_fade: ignored
+        self.assertTrue(item._fading)
+        item(42, 'Admin', 'web')
+        self.assertFalse(item._fading)
+        self.assertEqual(item._value, 42)
+
+    def test_continue_fade_list(self):
+        item = self._item('dimmer', value=0)
+        item.fade(100, step=10, delta=0.05, continue_fade=['Logic:.*'])
+        self.assertTrue(self._wait(lambda: item._value >= 10))
+        item(item._value + 3, 'Logic')  # in continue_fade: fade continues
+        self.assertTrue(item._fading)
+        item(42, 'Visu')
+        self.assertFalse(item._fading)
+
+    def test_update_changes_destination(self):
+        item = self._item('dimmer', value=0)
+        item.fade(100, step=10, delta=0.05)
+        self.assertTrue(self._wait(lambda: item._value >= 10))
+        item.fade(30, step=10, delta=0.01, update=True)
+        self.assertTrue(self._wait(lambda: not item._fading))
+        self.assertEqual(item._value, 30)
+
+    def test_stopped_engine_fades_synchronously(self):
+        item = self._item('dimmer', value=0)
+        item.fade(100, step=10, delta=1)
+        self.assertTrue(self._wait(lambda: item._value >= 10))
+        item._fading = False
+        self.engine.stop()
+        self.assertEqual(self.engine.active(), 0)
+        item.fade(30, step=20, delta=0.01)
+        self.assertEqual(item._value, 30)
+
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)
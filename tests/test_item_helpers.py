@@ -14,6 +14,14 @@ Duration-value string helpers:
 
 JSON / cache helpers:
   json_serialize, json_obj_hook, cache_read, cache_write
+
+Cache writer:
+  cache_write replaces the file atomically, the temporary file never is the cache file of another item
+  CacheWriter writes immediately when not started, coalesces values while running,
+  flushes on stop, SQLiteCacheStore round-trip
+  a value that cannot be serialized is skipped without losing the rest of the batch,
+  stop() does not raise
+  SQLiteCacheStore.preload serves reads from memory, migrate_cache_files
 """
 
 import collections
@@ -24,6 +32,7 @@ import os
 import pickle
 import sys
 import tempfile
+import threading
 import unittest
 from unittest.mock import MagicMock, patch
 
@@ -49,6 +58,9 @@ from lib.item.helpers import (
     json_obj_hook,
     cache_read,
     cache_write,
+    CacheWriter,
+    SQLiteCacheStore,
+    migrate_cache_files,
 )
 from lib.constants import CACHE_JSON, CACHE_PICKLE, ATTRIBUTE_SEPARATOR
 
@@ -527,6 +539,172 @@ class TestCacheReadWrite(unittest.TestCase):
         self.assertIn('ts', value)
         self.assertIsInstance(value['ts'], datetime.datetime)
 
+    def _temp_files(self):
+        return [
+            name for name in os.listdir(os.path.dirname(self._path)) if name.startswith('.') and name.endswith('.tmp')
+        ]
+
+    def test_cache_write_leaves_no_temp_file(self):
+        before = self._temp_files()
+        cache_write(self._path, 1, CACHE_PICKLE)
+        self.assertEqual(self._temp_files(), before)
+
+    def test_cache_write_failure_keeps_old_value(self):
+        cache_write(self._path, 1, CACHE_PICKLE)
+        before = self._temp_files()
+        with patch('lib.item.helpers.pickle.dump', side_effect=IOError('disk full')):
+            self.assertFalse(cache_write(self._path, 2, CACHE_PICKLE))
+        _, value = cache_read(self._path, self._get_tz(), CACHE_PICKLE)
+        self.assertEqual(value, 1)
+        self.assertEqual(self._temp_files(), before)
+
+    def test_cache_write_keeps_cache_of_item_ending_in_tmp(self):
+        # item 'room.tmp' has the cache file <cache>/room.tmp, writing item 'room' must not touch it
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache_write(os.path.join(cache_dir, 'room.tmp'), 21.5, CACHE_PICKLE)
+            cache_write(os.path.join(cache_dir, 'room'), 'x', CACHE_PICKLE)
+            self.assertEqual(sorted(os.listdir(cache_dir)), ['room', 'room.tmp'])
+            _, value = cache_read(os.path.join(cache_dir, 'room.tmp'), self._get_tz(), CACHE_PICKLE)
+            self.assertEqual(value, 21.5)
+
+
+# ===========================================================================
+# CacheWriter / SQLiteCacheStore
+# ===========================================================================
+
+
+class TestCacheWriter(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+        self.writer = CacheWriter(interval=3600)
+        self.addCleanup(self.writer.stop)
+        import dateutil.tz
+
+        self.tz = dateutil.tz.tzlocal()
+
+    def _file(self, name):
+        return os.path.join(self._dir.name, name)
+
+    def test_not_started_writes_immediately(self):
+        self.writer.write(self._file('a.b'), 5)
+        self.assertEqual(cache_read(self._file('a.b'), self.tz)[1], 5)
+        self.assertEqual(self.writer.writes, 1)
+
+    def test_running_writer_keeps_latest_value(self):
+        self.writer.start()
+        for v in range(10):
+            self.writer.write(self._file('a.b'), v)
+        self.assertFalse(os.path.exists(self._file('a.b')))
+        self.assertTrue(self.writer.exists(self._file('a.b')))
+        self.assertEqual(self.writer.pending(), 1)
+        self.assertEqual(self.writer.coalesced, 9)
+        self.writer.flush()
+        self.assertEqual(cache_read(self._file('a.b'), self.tz)[1], 9)
+        self.assertEqual(self.writer.writes, 1)
+
+    def test_stop_flushes_dirty_items(self):
+        self.writer.start()
+        self.writer.write(self._file('a'), 'x')
+        self.writer.write(self._file('b'), 'y')
+        self.writer.stop()
+        self.assertFalse(self.writer.is_running())
+        self.assertEqual(cache_read(self._file('a'), self.tz)[1], 'x')
+        self.assertEqual(cache_read(self._file('b'), self.tz)[1], 'y')
+
+    def test_unserializable_value_does_not_lose_batch(self):
+        self.writer.start()
+        self.writer.write(self._file('a'), 1)
+        self.writer.write(self._file('lock'), threading.Lock())
+        self.writer.write(self._file('b'), 2)
+        self.writer.stop()
+        self.assertEqual(cache_read(self._file('a'), self.tz)[1], 1)
+        self.assertEqual(cache_read(self._file('b'), self.tz)[1], 2)
+        self.assertEqual(sorted(os.listdir(self._dir.name)), ['a', 'b'])
+        self.assertEqual(self.writer.writes, 2)
+
+    def test_unserializable_value_in_sqlite_store(self):
+        self.writer.configure(store=SQLiteCacheStore(self._file('cache.db')))
+        self.writer.start()
+        self.writer.write(self._file('a'), 1)
+        self.writer.write(self._file('lock'), threading.Lock())
+        self.writer.stop()
+        self.assertEqual(self.writer.read(self._file('a'), self.tz)[1], 1)
+        self.assertFalse(self.writer.exists(self._file('lock')))
+        self.assertEqual(self.writer.writes, 1)
+
+    def test_stop_does_not_raise(self):
+        self.writer.start()
+        self.writer.write(self._file('a'), 1)
+        with patch.object(self.writer, '_write', side_effect=RuntimeError('broken')):
+            self.writer.stop()
+        self.assertFalse(self.writer.is_running())
+
+    def test_interval_flush(self):
+        self.writer.configure(interval=0.01)
+        self.writer.start()
+        self.writer.write(self._file('a'), 1)
+        for __ in range(200):
+            if os.path.exists(self._file('a')):
+                break
+            threading.Event().wait(0.01)
+        self.assertEqual(cache_read(self._file('a'), self.tz)[1], 1)
+
+    def test_interval_zero_does_not_start_thread(self):
+        self.writer.configure(interval=0)
+        self.writer.start()
+        self.assertFalse(self.writer.is_running())
+
+    def test_sqlite_store_roundtrip(self):
+        store = SQLiteCacheStore(self._file('cache.db'))
+        self.writer.configure(store=store)
+        self.writer.write(self._file('a.b'), [1, 2])
+        self.writer.write(self._file('a.c'), {'ts': datetime.datetime(2024, 1, 1)}, CACHE_JSON)
+        dt, value = self.writer.read(self._file('a.b'), self.tz)
+        self.assertEqual(value, [1, 2])
+        self.assertIsInstance(dt, datetime.datetime)
+        self.assertIsInstance(self.writer.read(self._file('a.c'), self.tz)[1]['ts'], datetime.datetime)
+        self.assertFalse(os.path.exists(self._file('a.b')))
+
+    def test_sqlite_store_missing_value(self):
+        self.writer.configure(store=SQLiteCacheStore(self._file('cache.db')))
+        self.assertFalse(self.writer.exists(self._file('missing')))
+        with self.assertRaises(FileNotFoundError) as cm:
+            self.writer.read(self._file('missing'), self.tz)
+        self.assertTrue(str(cm.exception).startswith('[Errno 2]'))
+
+    def test_sqlite_preload(self):
+        store = SQLiteCacheStore(self._file('cache.db'))
+        self.writer.configure(store=store)
+        self.writer.write(self._file('a'), 1)
+        self.assertEqual(self.writer.preload(), 1)
+        with patch.object(store, '_connect', side_effect=AssertionError('no query expected')):
+            self.assertEqual(self.writer.read(self._file('a'), self.tz)[1], 1)
+            self.assertFalse(self.writer.exists(self._file('b')))
+        self.writer.start()  # releases the preloaded values
+        self.assertIsNone(store._preloaded)
+
+    def test_preload_without_store(self):
+        self.assertIsNone(self.writer.preload())
+
+    def test_migrate_cache_files(self):
+        cache_write(self._file('a.b'), 42)
+        cache_write(self._file('a.c'), 'text')
+        cache_write(self._file('room.tmp'), 21.5)
+        with open(self._file('broken'), 'wb') as f:
+            f.write(b'not a pickle')
+        with open(self._file('.gitignore'), 'w') as f:
+            f.write('*')
+        store = SQLiteCacheStore(self._file('item_cache.db'))
+        count, failed = migrate_cache_files(self._dir.name, store)
+        self.assertEqual(count, 3)
+        self.assertEqual(store.read(self._file('room.tmp'), self.tz)[1], 21.5)
+        self.assertEqual(failed, ['broken'])
+        dt, value = store.read(self._file('a.b'), self.tz)
+        self.assertEqual(value, 42)
+        self.assertEqual(dt, cache_read(self._file('a.b'), self.tz)[0])
+        self.assertTrue(os.path.exists(self._file('a.b')))
+
 
 if __name__ == '__main__':
     unittest.main()
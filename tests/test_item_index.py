@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+"""
+Tests for lib/item/_index.py
+
+Coverage
+--------
+ItemIndex.find:
+  exact attribute, 'attr@' and '@instance' lookups give the same result as
+  Items._attribute_find() over all items, in registration order
+
+ItemIndex.find_below:
+  only items below the path, in the order of the item tree
+
+ItemIndex.match:
+  exact paths, literal prefixes (full and partial levels), patterns without
+  literal prefix, attribute buckets as candidates
+
+maintenance:
+  replacing an item re-indexes its attributes and keeps its position
+  removing items prunes the trie, random add/remove sequences stay consistent
+  the index is rebuilt when the registry is replaced
+"""
+
+import os
+import random
+import re
+import sys
+import unittest
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import tests.common as common
+
+common.register_shng_log_levels()
+
+from lib.item._index import ItemIndex
+from lib.item.items import Items
+
+
+class _FakeItem:
+    """Minimal stand-in for an Item with the attributes used by the index."""
+
+    def __init__(self, path, attributes=()):
+        self.conf = dict.fromkeys(attributes, 'x')
+        self.property = SimpleNamespace(path=path, attributes=list(self.conf))
+
+    def __repr__(self):
+        return f'<{self.property.path}>'
+
+
+def _register(registry, index, path, attributes=()):
+    item = _FakeItem(path, attributes)
+    registry[path] = item
+    index.add(path, item)
+    return item
+
+
+def _unregister(registry, index, path):
+    index.remove(path)
+    del registry[path]
+
+
+def _scan_find(registry, conf):
+    return [item for item in registry.values() if Items._attribute_find(None, conf, item.property.attributes)]
+
+
+def _scan_match(registry, pattern):
+    regex = re.compile(pattern.replace('.', r'\.').replace('*', '.*') + '$')
+    return [item for path, item in registry.items() if regex.match(path)]
+
+
+class TestFind(unittest.TestCase):
+    def setUp(self):
+        self.registry = {}
+        self.index = ItemIndex(self.registry)
+        _register(self.registry, self.index, 'a', ['knx_dpt@knx_1', 'visu_acl'])
+        _register(self.registry, self.index, 'b', ['knx_dpt', 'avm_identifier@fritz'])
+        _register(self.registry, self.index, 'c', ['knx_dpt@knx_2'])
+        _register(self.registry, self.index, 'd', ['sqlite'])
+
+    def test_exact(self):
+        self.assertEqual(self.index.find('knx_dpt'), [self.registry['b']])
+        self.assertEqual(self.index.find('knx_dpt@knx_1'), [self.registry['a']])
+
+    def test_attribute_with_any_instance(self):
+        self.assertEqual(self.index.find('knx_dpt@'), [self.registry['a'], self.registry['b'], self.registry['c']])
+
+    def test_any_attribute_of_instance(self):
+        self.assertEqual(self.index.find('@knx_2'), [self.registry['c']])
+        self.assertEqual(self.index.find('@visu_acl'), [])
+
+    def test_same_result_as_attribute_find(self):
+        for conf in ('knx_dpt', 'knx_dpt@', '@knx_1', '@fritz', 'avm_identifier@', 'visu_acl', 'unknown', '@', 'x@'):
+            self.assertEqual(self.index.find(conf), _scan_find(self.registry, conf), conf)
+
+
+class TestFindBelow(unittest.TestCase):
+    def test_tree_order(self):
+        registry = {}
+        index = ItemIndex(registry)
+        # children register before their parent, like Item.__init__ does
+        for path in ('house.kitchen.light.dim', 'house.kitchen.light', 'house.kitchen', 'house.bath.light'):
+            _register(registry, index, path, ['knx'])
+        _register(registry, index, 'house.bath', ['knx'])
+        _register(registry, index, 'house', ['knx'])
+        _register(registry, index, 'garden', ['knx'])
+        paths = [item.property.path for item in index.find_below('house', 'knx')]
+        self.assertEqual(
+            paths, ['house.kitchen', 'house.kitchen.light', 'house.kitchen.light.dim', 'house.bath', 'house.bath.light']
+        )
+        self.assertEqual(index.find_below('garden', 'knx'), [])
+        self.assertEqual(index.find_below('unknown', 'knx'), [])
+
+
+class TestMatch(unittest.TestCase):
+    def setUp(self):
+        self.registry = {}
+        self.index = ItemIndex(self.registry)
+        paths = ('floor.kitchen.light', 'floor.kitchen.temp', 'floor.kitchenette.light', 'floor.bath.light', 'roof')
+        for path in paths:
+            _register(self.registry, self.index, path, ['knx'] if path.endswith('light') else [])
+
+    def test_patterns_give_scan_result(self):
+        patterns = ('*', 'floor.*', 'floor.kitchen.*', 'floor.kitch*', '*.light', 'floor.*.light', 'roof', 'floor')
+        for pattern in patterns + ('nothing.*', 'floor.(bath|kitchen).light'):
+            regex = re.compile(pattern.replace('.', r'\.').replace('*', '.*') + '$')
+            found = [i for i in self.index.match(pattern) if regex.match(i.property.path)]
+            self.assertEqual(found, _scan_match(self.registry, pattern), pattern)
+
+    def test_prefix_candidates(self):
+        paths = [item.property.path for item in self.index.match('floor.kitchen*')]
+        self.assertEqual(paths, ['floor.kitchen.light', 'floor.kitchen.temp', 'floor.kitchenette.light'])
+
+    def test_exact_path_with_attribute(self):
+        self.assertEqual(self.index.match('floor.bath.light', 'knx'), [self.registry['floor.bath.light']])
+        self.assertEqual(self.index.match('floor.kitchen.temp', 'knx'), [])
+
+    def test_attribute_bucket_when_smaller(self):
+        _register(self.registry, self.index, 'floor.kitchen.other', [])
+        paths = [item.property.path for item in self.index.match('floor.*', 'knx')]
+        self.assertEqual(paths, ['floor.kitchen.light', 'floor.kitchenette.light', 'floor.bath.light'])
+
+
+class TestMaintenance(unittest.TestCase):
+    def test_replace_keeps_position(self):
+        registry = {}
+        index = ItemIndex(registry)
+        _register(registry, index, 'a', ['old'])
+        _register(registry, index, 'b', ['new'])
+        replacement = _register(registry, index, 'a', ['new'])
+        self.assertEqual(index.find('old'), [])
+        self.assertEqual(index.find('new'), [replacement, registry['b']])
+
+    def test_remove_prunes_trie(self):
+        registry = {}
+        index = ItemIndex(registry)
+        _register(registry, index, 'a.b.c', ['x'])
+        _unregister(registry, index, 'a.b.c')
+        self.assertEqual(index._root.children, {})
+        self.assertEqual(index._attributes, {})
+
+    def test_random_sequence_matches_scan(self):
+        rnd = random.Random(42)
+        registry = {}
+        index = ItemIndex(registry)
+        names = ['a', 'b', 'c']
+        attrs = ['knx', 'knx@k1', 'knx@k2', 'sql@db', 'visu']
+        for __ in range(2000):
+            path = '.'.join(rnd.choice(names) for __ in range(rnd.randint(1, 4)))
+            if path in registry and rnd.random() < 0.5:
+                _unregister(registry, index, path)
+            else:
+                _register(registry, index, path, rnd.sample(attrs, rnd.randint(0, 3)))
+        for conf in ('knx', 'knx@', '@k1', '@db', 'visu', 'sql@'):
+            self.assertEqual(index.find(conf), _scan_find(registry, conf), conf)
+        for pattern in ('a.*', 'a.b*', 'c', '*.c', 'b.a.c.*'):
+            regex = re.compile(pattern.replace('.', r'\.').replace('*', '.*') + '$')
+            found = [i for i in index.match(pattern) if regex.match(i.property.path)]
+            self.assertEqual(found, _scan_match(registry, pattern), pattern)
+        self.assertEqual(index._root.count, len(registry))
+
+
+class TestItemsUsesIndex(unittest.TestCase):
+    def test_index_rebuilt_for_new_registry(self):
+        items = Items.__new__(Items)
+        registry = {'a': _FakeItem('a', ['knx'])}
+        items._Items__item_dict = registry
+        self.assertEqual(list(items.find_items('knx')), [registry['a']])
+        items._Items__item_dict = {}
+        self.assertEqual(list(items.find_items('knx')), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
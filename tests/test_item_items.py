@@ -15,8 +15,8 @@ Coverage
 --------
 Items class:
   get_instance()
-  add_item(), remove_item()
-  return_item(), return_items() (ordered and unordered)
+  add_item(), remove_item() — including a load test with 50k items
+  return_item(), return_items() (ordered and unordered, cached sorted view)
   match_items() — plain regex, with attr, with attr+value
   _attribute_find() — all documented cases
   find_items(), find_children()
@@ -24,13 +24,18 @@ Items class:
   add_plugin_attribute(), add_plugin_attribute_prefix()
   plugin_attribute_exists()
   return_struct_definitions() (delegates to Structs)
+  configure_cache_writer() — the sqlite store is kept outside of the item cache directory
+  get_parse_workers() — no worker processes by default
 """
 
 import collections
 import logging
 import os
 import sys
+import tempfile
+import time
 import unittest
+from types import SimpleNamespace
 from unittest.mock import MagicMock, patch
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
@@ -42,6 +47,7 @@ common.register_shng_log_levels()
 import lib.item
 import lib.item.item
 import lib.item.items
+from lib.item.helpers import CACHE_STORE_FILES
 from lib.item.items import Items
 from tests.mock.core import MockSmartHome
 
@@ -59,7 +65,6 @@ def _reset_items_class():
     """
     lib.item.items._items_instance = None
     lib.item.item._items_instance = None  # separate global in item.py
-    Items._Items__items = []
     Items._Items__item_dict = {}
     Items._children = []
     Items.plugin_attributes = {}
@@ -75,7 +80,7 @@ def _make_sh():
 class _ItemsTestBase(unittest.TestCase):
     """Mixin that resets Items class-level state both before and after each test.
 
-    Items uses class-level __items / __item_dict etc., so if we only reset in
+    Items uses class-level __item_dict etc., so if we only reset in
     setUp the dirty state leaks into subsequent test files (e.g. test_plugin.py).
     """
 
@@ -129,7 +134,7 @@ class TestItemsAddReturn(_ItemsTestBase):
 
     def test_add_item_idempotent_path(self):
         _make_item(self.sh, 'x')
-        _make_item(self.sh, 'x')  # second add of same path → overwrites dict but not list
+        _make_item(self.sh, 'x')  # second add of same path → replaces the registered item
         self.assertEqual(self.sh.items.item_count(), 1)
 
     def test_add_item_updates_dict(self):
@@ -165,6 +170,65 @@ class TestItemsReturnItems(_ItemsTestBase):
         paths = [i.property.path for i in self.sh.items.return_items(ordered=False)]
         self.assertEqual(paths, ['charlie', 'alpha', 'bravo'])
 
+    def test_sorted_view_is_cached(self):
+        list(self.sh.items.return_items(ordered=True))
+        cached = self.sh.items._Items__sorted_paths
+        list(self.sh.items.return_items(ordered=True))
+        self.assertIs(self.sh.items._Items__sorted_paths, cached)
+
+    def test_sorted_view_updated_on_add(self):
+        list(self.sh.items.return_items(ordered=True))
+        _make_item(self.sh, 'aardvark')
+        paths = [i.property.path for i in self.sh.items.return_items(ordered=True)]
+        self.assertEqual(paths, ['aardvark', 'alpha', 'bravo', 'charlie'])
+
+    def test_sorted_view_updated_on_remove(self):
+        list(self.sh.items.return_items(ordered=True))
+        item = self.sh.items.return_item('bravo')
+        with patch.object(item, 'remove', return_value=True):
+            self.sh.items.remove_item(item)
+        paths = [i.property.path for i in self.sh.items.return_items(ordered=True)]
+        self.assertEqual(paths, ['alpha', 'charlie'])
+
+    def test_add_item_while_iterating(self):
+        paths = []
+        for item in self.sh.items.return_items():
+            paths.append(item.property.path)
+            if item.property.path == 'charlie':
+                _make_item(self.sh, 'delta')
+        self.assertEqual(paths, ['charlie', 'alpha', 'bravo'])
+        self.assertEqual(self.sh.items.item_count(), 4)
+
+
+class _FakeItem:
+    def __init__(self, path):
+        self.property = SimpleNamespace(path=path, attributes=[])
+
+    def remove(self):
+        return True
+
+
+class TestItemsLoad(_ItemsTestBase):
+    """Registering and removing many items must not take quadratic time."""
+
+    COUNT = 50000
+
+    def test_add_and_remove_50k_items(self):
+        items = self.sh.items
+        paths = [f'floor{i % 10}.room{i // 10}.value' for i in range(self.COUNT)]
+        fake_items = [_FakeItem(path) for path in paths]
+        start = time.perf_counter()
+        for item in fake_items:
+            items.add_item(item.property.path, item)
+        self.assertEqual(items.item_count(), self.COUNT)
+        self.assertIs(next(items.return_items(ordered=True)), fake_items[0])
+        for item in fake_items[::10]:
+            items.remove_item(item)
+        duration = time.perf_counter() - start
+        self.assertEqual(items.item_count(), self.COUNT - self.COUNT // 10)
+        # a list based registry needs more than 10 seconds for this
+        self.assertLess(duration, 5)
+
 
 # ===========================================================================
 # match_items
@@ -405,5 +469,41 @@ class TestItemsStructDefinitions(_ItemsTestBase):
         self.assertIn('myplugin.mystruct', definitions)
 
 
+# ===========================================================================
+# configure_cache_writer
+# ===========================================================================
+
+
+class TestItemsConfigureCacheWriter(_ItemsTestBase):
+    def setUp(self):
+        super().setUp()
+        self._dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+        writer = lib.item.items.get_cache_writer()
+        self.addCleanup(
+            writer.configure, interval=writer.interval, fsync=writer.fsync, store=writer.store or CACHE_STORE_FILES
+        )
+
+    def test_sqlite_store_is_not_in_cache_dir(self):
+        # admin's cachecheck lists every file in var/cache without an item as unused
+        self.sh._item_cache_store = 'sqlite'
+        with patch.object(self.sh, 'get_vardir', return_value=self._dir.name):
+            self.sh.items.configure_cache_writer()
+        store = lib.item.items.get_cache_writer().store
+        self.assertEqual(store.filename, os.path.join(self._dir.name, 'db', 'item_cache.db'))
+        self.assertTrue(os.path.isfile(store.filename))
+
+
+class TestItemsGetParseWorkers(_ItemsTestBase):
+    def test_no_worker_processes_by_default(self):
+        self.assertEqual(self.sh.items.get_parse_workers(), 1)
+
+    def test_configured_workers(self):
+        self.sh._item_parse_workers = '0'
+        self.assertEqual(self.sh.items.get_parse_workers(), 0)
+        self.sh._item_parse_workers = 'many'
+        self.assertEqual(self.sh.items.get_parse_workers(), 1)
+
+
 if __name__ == '__main__':
     unittest.main()
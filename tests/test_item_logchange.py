@@ -40,12 +40,20 @@ _log_build_text (custom template):
 log_mapping:
   {mvalue} in template reflects mapped value
   unmapped value uses original
+
+Lazy logging / compiled rules:
+  disabled logger → no rules applied, no text built
+  rules compiled once, recompiled when _log_rules is replaced
+  rules referring to an item are compiled on every change
+  static log_level resolved once, templated log_level on every change
+  _set_value does not format the change message when the items logger is disabled
 """
 
 import logging
 import os
 import sys
 import unittest
+from unittest.mock import patch
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
@@ -57,6 +65,7 @@ import lib.item.item
 import lib.item.items
 import lib.config
 from lib.item.items import Items
+import lib.item._logchange as _logchange
 from lib.item._logchange import log_on_change, get_rule, build_standardtext, build_text
 from tests.mock.core import MockSmartHome
 import tests.common as common
@@ -65,7 +74,6 @@ import tests.common as common
 def _reset():
     lib.item.items._items_instance = None
     lib.item.item._items_instance = None
-    Items._Items__items = []
     Items._Items__item_dict = {}
     Items._children = []
     Items.plugin_attributes = {}
@@ -467,5 +475,84 @@ class TestGetRule(_Base):
         self.assertEqual(result, [])
 
 
+# ===========================================================================
+# Lazy logging / compiled rules
+# ===========================================================================
+
+
+class TestLazyLogChange(_Base):
+    def test_disabled_logger_builds_no_text(self):
+        item = self.sh.items.return_item('logged_lowlimit')
+        self.log.setLevel(logging.WARNING)
+        with (
+            patch.object(_logchange, 'get_rule') as get_rule_mock,
+            patch.object(_logchange, 'build_standardtext') as build_mock,
+        ):
+            log_on_change(item, 20, 'Logic')
+        get_rule_mock.assert_not_called()
+        build_mock.assert_not_called()
+        self.assertFalse(self._fired())
+
+    def test_rules_compiled_once(self):
+        item = self.sh.items.return_item('logged_lowlimit')
+        with patch.object(_logchange, 'get_rule', wraps=_logchange.get_rule) as get_rule_mock:
+            for value in (20, 5, 30):
+                log_on_change(item, value, 'Logic')
+        self.assertEqual(get_rule_mock.call_count, 4)  # lowlimit, highlimit, filter, exclude
+        self.assertEqual(len(self._records()), 2)
+
+    def test_rules_recompiled_when_replaced(self):
+        item = self.sh.items.return_item('logged_lowlimit')
+        log_on_change(item, 5, 'Logic')
+        self.assertFalse(self._fired())
+        item._log_rules = {'lowlimit': 1}
+        log_on_change(item, 5, 'Logic')
+        self.assertTrue(self._fired())
+
+    def test_rules_referring_to_item_compiled_on_every_change(self):
+        limit = _item(self.sh, 'limit_item', 'num')
+        limit(10)
+        item = _item(self.sh, 'ref_lowlimit', 'num', log_change='item_changes', log_rules=[{'lowlimit': 'limit_item'}])
+        log_on_change(item, 5, 'Logic')
+        self.assertFalse(self._fired())
+        limit(1)
+        log_on_change(item, 5, 'Logic')
+        self.assertTrue(self._fired())
+
+    def test_static_level_resolved_once(self):
+        item = self.sh.items.return_item('logged_warning_level')
+        with patch.object(_logchange.Utils, 'is_int', wraps=_logchange.Utils.is_int) as is_int_mock:
+            log_on_change(item, 1, 'Logic')
+            log_on_change(item, 2, 'Logic')
+        self.assertEqual(is_int_mock.call_count, 1)
+        self.assertEqual([r.levelno for r in self._records()], [logging.WARNING, logging.WARNING])
+
+    def test_templated_level_resolved_on_every_change(self):
+        item = _item(
+            self.sh,
+            'templated_level',
+            'num',
+            log_change='item_changes',
+            log_level="{'WARNING' if value > 10 else 'INFO'}",
+        )
+        log_on_change(item, 20, 'Logic')
+        log_on_change(item, 1, 'Logic')
+        self.assertEqual([r.levelno for r in self._records()], [logging.WARNING, logging.INFO])
+
+    def test_set_value_change_message_is_lazy(self):
+        item = self.sh.items.return_item('no_log')
+        items_logger = logging.getLogger('lib.item.item')
+        old_level = items_logger.level
+        items_logger.setLevel(logging.WARNING)
+        self.addCleanup(items_logger.setLevel, old_level)
+        with patch.object(item, '_change_logger') as change_logger:
+            item._set_value(1, 'Logic')
+        change_logger.assert_not_called()
+        items_logger.setLevel(logging.DEBUG)
+        with patch.object(item, '_change_logger') as change_logger:
+            item._set_value(2, 'Logic')
+        change_logger.assert_called_once_with('Item %s = %s via %s %s %s', 'no_log', 2, 'Logic', None, None)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+"""
+Tests for lib/item/_propagation.py
+
+Coverage
+--------
+build_trigger_graph:
+  ranks follow the eval_trigger / hysteresis_input edges
+  diamond dependencies get consistent ranks
+  cycles are reported and their members get no rank
+  items downstream of a cycle are still ranked
+
+EvalBatch:
+  one scheduler task per batch
+  evaluations run in rank order
+  an item added twice is evaluated once with the latest value, unless its eval
+  or trigger_condition uses value or source
+  evaluations added while the batch runs join the running batch
+  a run stops after max_evaluations and queues the rest
+
+trigger_dependents:
+  ranked dependents are batched, unranked dependents use sh.trigger
+  root changes that arrive before the batch task runs share one batch,
+  root changes after the batch task started get a new batch
+"""
+
+import os
+import sys
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import tests.common as common
+
+common.register_shng_log_levels()
+
+import lib.item._propagation as propagation
+from lib.item._propagation import EvalBatch, build_trigger_graph, KIND_EVAL, KIND_HYSTERESIS
+
+
+class _Node:
+    """Minimal stand-in for an Item with the attributes used by _propagation."""
+
+    def __init__(self, path):
+        self._path = path
+        self._items_to_trigger = []
+        self._hysteresis_items_to_trigger = []
+        self._trigger_rank = None
+        self.property = SimpleNamespace(path=path)
+
+
+def _graph(edges, hysteresis_edges=()):
+    """Build fake items from a list of (source, dependent) path tuples."""
+    nodes = {}
+    for src, dst in list(edges) + list(hysteresis_edges):
+        nodes.setdefault(src, _Node(src))
+        nodes.setdefault(dst, _Node(dst))
+    for src, dst in edges:
+        nodes[src]._items_to_trigger.append(nodes[dst])
+    for src, dst in hysteresis_edges:
+        nodes[src]._hysteresis_items_to_trigger.append(nodes[dst])
+    return nodes
+
+
+class _DeferredSh:
+    """Collects triggered tasks, run_tasks() executes them like the scheduler would."""
+
+    def __init__(self):
+        self.tasks = []
+
+    def trigger(self, name, obj=None, by='Logic', source=None, value=None, dest=None, **kwargs):
+        self.tasks.append((name, obj, by, value))
+
+    def run_tasks(self):
+        while self.tasks:
+            name, obj, by, value = self.tasks.pop(0)
+            if value is None:
+                obj()
+            else:
+                obj(caller=by, **value)
+
+
+# ===========================================================================
+# build_trigger_graph
+# ===========================================================================
+
+
+class TestBuildTriggerGraph(unittest.TestCase):
+    def test_chain_ranks_increase(self):
+        n = _graph([('a', 'b'), ('b', 'c')])
+        build_trigger_graph(list(n.values()))
+        self.assertLess(n['a']._trigger_rank, n['b']._trigger_rank)
+        self.assertLess(n['b']._trigger_rank, n['c']._trigger_rank)
+
+    def test_diamond_ranks(self):
+        n = _graph([('a', 'b'), ('a', 'c'), ('b', 'd'), ('c', 'd'), ('a', 'd')])
+        build_trigger_graph(list(n.values()))
+        self.assertEqual(n['b']._trigger_rank, n['c']._trigger_rank)
+        self.assertGreater(n['d']._trigger_rank, n['b']._trigger_rank)
+
+    def test_hysteresis_edges_are_ranked(self):
+        n = _graph([('a', 'b')], hysteresis_edges=[('b', 'h')])
+        build_trigger_graph(list(n.values()))
+        self.assertGreater(n['h']._trigger_rank, n['b']._trigger_rank)
+
+    def test_cycle_is_reported_and_unranked(self):
+        n = _graph([('x', 'y'), ('y', 'z'), ('z', 'x'), ('a', 'b')])
+        with self.assertLogs('lib.item', level='WARNING') as cm:
+            cycles = build_trigger_graph(list(n.values()))
+        self.assertEqual(cycles, [['x', 'y', 'z']])
+        self.assertTrue(any('cycle' in line for line in cm.output))
+        for path in ('x', 'y', 'z'):
+            self.assertIsNone(n[path]._trigger_rank)
+        self.assertIsNotNone(n['b']._trigger_rank)
+
+    def test_item_downstream_of_cycle_is_ranked(self):
+        n = _graph([('x', 'y'), ('y', 'x'), ('y', 'out'), ('out', 'out2')])
+        with self.assertLogs('lib.item', level='WARNING'):
+            build_trigger_graph(list(n.values()))
+        self.assertIsNotNone(n['out']._trigger_rank)
+        self.assertLess(n['out']._trigger_rank, n['out2']._trigger_rank)
+
+    def test_no_cycles_returns_empty_list(self):
+        n = _graph([('a', 'b')])
+        self.assertEqual(build_trigger_graph(list(n.values())), [])
+
+
+# ===========================================================================
+# EvalBatch
+# ===========================================================================
+
+
+class TestEvalBatch(unittest.TestCase):
+    def setUp(self):
+        self.sh = _DeferredSh()
+        self.batch = EvalBatch()
+        self.evaluated = []
+        patcher = patch.object(propagation, 'run_eval', side_effect=self._run_eval)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.n = _graph([('a', 'b'), ('a', 'c'), ('b', 'd'), ('c', 'd')])
+        build_trigger_graph(list(self.n.values()))
+
+    def _run_eval(self, item, value=None, caller=None, source=None):
+        self.evaluated.append((item._path, value, source))
+        # cascade to the dependents like Item.__update would do
+        for dependent in item._items_to_trigger:
+            self.batch.add(self.sh, dependent, KIND_EVAL, value, caller, item._path)
+
+    def test_one_scheduler_task_per_batch(self):
+        self.batch.add(self.sh, self.n['b'], KIND_EVAL, 1, 'Test', 'a')
+        self.batch.add(self.sh, self.n['c'], KIND_EVAL, 1, 'Test', 'a')
+        self.assertEqual(len(self.sh.tasks), 1)
+        self.assertEqual(self.sh.tasks[0][0], 'items.eval-batch')
+
+    def test_diamond_evaluates_each_item_once(self):
+        self.batch.add(self.sh, self.n['b'], KIND_EVAL, 1, 'Test', 'a')
+        self.batch.add(self.sh, self.n['c'], KIND_EVAL, 1, 'Test', 'a')
+        self.sh.run_tasks()
+        paths = [e[0] for e in self.evaluated]
+        self.assertEqual(sorted(paths[:2]), ['b', 'c'])
+        self.assertEqual(paths[2:], ['d'])
+        self.assertEqual(self.batch.pending(), 0)
+
+    def test_latest_value_wins(self):
+        self.batch.add(self.sh, self.n['d'], KIND_EVAL, 1, 'Test', 'b')
+        self.batch.add(self.sh, self.n['d'], KIND_EVAL, 2, 'Test', 'c')
+        self.sh.run_tasks()
+        self.assertEqual(self.evaluated, [('d', 2, 'c')])
+
+    def test_eval_using_value_is_not_merged(self):
+        self.n['d']._eval = 'sh.counter() + value'
+        self.batch.add(self.sh, self.n['d'], KIND_EVAL, 1, 'Test', 'b')
+        self.batch.add(self.sh, self.n['d'], KIND_EVAL, 2, 'Test', 'c')
+        self.assertEqual(self.batch.pending(), 2)
+        self.sh.run_tasks()
+        self.assertEqual(self.evaluated, [('d', 1, 'b'), ('d', 2, 'c')])
+
+    def test_trigger_condition_using_source_is_not_merged(self):
+        self.n['d']._eval = 'sh.a() + 1'
+        self.n['d']._trigger_condition = "[x for x in (source,) if x == 'b']"
+        self.batch.add(self.sh, self.n['d'], KIND_EVAL, 1, 'Test', 'b')
+        self.batch.add(self.sh, self.n['d'], KIND_EVAL, 2, 'Test', 'c')
+        self.sh.run_tasks()
+        self.assertEqual(len(self.evaluated), 2)
+
+    def test_eval_without_trigger_args_is_merged(self):
+        self.n['d']._eval = 'sh.b() + sh.c()  # value'
+        self.batch.add(self.sh, self.n['d'], KIND_EVAL, 1, 'Test', 'b')
+        self.batch.add(self.sh, self.n['d'], KIND_EVAL, 2, 'Test', 'c')
+        self.sh.run_tasks()
+        self.assertEqual(self.evaluated, [('d', 2, 'c')])
+
+    def test_run_is_limited(self):
+        self.batch.max_evaluations = 2
+        for path in ('b', 'c', 'd'):
+            self.n[path]._eval = 'value'
+            self.batch.add(self.sh, self.n[path], KIND_EVAL, 1, 'Test', 'a')
+        task = self.sh.tasks.pop(0)
+        task[1]()
+        self.assertEqual(len(self.evaluated), 2)
+        self.assertEqual([t[0] for t in self.sh.tasks], ['items.eval-batch'])
+        self.sh.run_tasks()
+        # d is added again by the evaluations of b and c (not merged, its eval uses value)
+        self.assertEqual([e[0] for e in self.evaluated], ['b', 'c', 'd', 'd', 'd'])
+        self.assertEqual(self.batch.batches, 3)
+        self.assertEqual(self.batch.pending(), 0)
+
+    def test_new_batch_after_finished_batch(self):
+        self.batch.add(self.sh, self.n['d'], KIND_EVAL, 1, 'Test', 'b')
+        self.sh.run_tasks()
+        self.batch.add(self.sh, self.n['d'], KIND_EVAL, 2, 'Test', 'b')
+        self.assertEqual(len(self.sh.tasks), 1)
+        self.sh.run_tasks()
+        self.assertEqual(self.batch.batches, 2)
+        self.assertEqual(self.batch.evaluations, 2)
+
+    def test_hysteresis_kind_runs_hysteresis(self):
+        with patch.object(propagation, 'run_hysteresis') as run_hysteresis:
+            self.batch.add(self.sh, self.n['d'], KIND_HYSTERESIS, 5, 'Test', 'b')
+            self.sh.run_tasks()
+        run_hysteresis.assert_called_once_with(self.n['d'], value=5, caller='Test', source='b')
+        self.assertEqual(self.evaluated, [])
+
+    def test_exception_does_not_stop_batch(self):
+        def failing(item, **kwargs):
+            self.evaluated.append(item._path)
+            if item._path == 'b':
+                raise ValueError('boom')
+
+        with patch.object(propagation, 'run_eval', side_effect=failing):
+            self.batch.add(self.sh, self.n['b'], KIND_EVAL, 1, 'Test', 'a')
+            self.batch.add(self.sh, self.n['c'], KIND_EVAL, 1, 'Test', 'a')
+            with self.assertLogs('lib.item', level='ERROR'):
+                self.sh.run_tasks()
+        self.assertEqual(sorted(self.evaluated), ['b', 'c'])
+
+
+# ===========================================================================
+# trigger_dependents
+# ===========================================================================
+
+
+class TestTriggerDependents(unittest.TestCase):
+    def setUp(self):
+        propagation._open_batch = None
+        self.addCleanup(setattr, propagation, '_open_batch', None)
+
+    def test_ranked_batched_unranked_triggered(self):
+        n = _graph([('a', 'ranked'), ('a', 'loop1'), ('loop1', 'loop2'), ('loop2', 'loop1')])
+        with self.assertLogs('lib.item', level='WARNING'):
+            build_trigger_graph(list(n.values()))
+        sh = MagicMock()
+        n['a']._sh = sh
+        propagation.trigger_dependents(n['a'], 7, 'Test', None, None, lambda i: 'eval-obj', lambda i: 'hyst-obj')
+        names = [c.kwargs['name'] for c in sh.trigger.call_args_list]
+        self.assertEqual(names, ['items.eval-batch', 'items.loop1'])
+        self.assertEqual(sh.trigger.call_args_list[0].kwargs['obj'].__self__.pending(), 1)
+
+    def test_close_root_changes_share_batch(self):
+        n = _graph([('a', 'x'), ('b', 'x'), ('x', 'y')])
+        build_trigger_graph(list(n.values()))
+        sh = _DeferredSh()
+        for node in n.values():
+            node._sh = sh
+        evaluated = []
+
+        def run_eval(item, value=None, caller=None, source=None):
+            evaluated.append((item._path, value))
+            propagation.trigger_dependents(item, value, caller, None, None, None, None)
+
+        with patch.object(propagation, 'run_eval', side_effect=run_eval):
+            propagation.trigger_dependents(n['a'], 1, 'Test', None, None, None, None)
+            propagation.trigger_dependents(n['b'], 2, 'Test', None, None, None, None)
+            self.assertEqual(len(sh.tasks), 1)
+            sh.run_tasks()
+        self.assertEqual(evaluated, [('x', 2), ('y', 2)])
+
+    def test_root_change_after_start_gets_new_batch(self):
+        n = _graph([('a', 'x'), ('b', 'y')])
+        build_trigger_graph(list(n.values()))
+        sh = _DeferredSh()
+        n['a']._sh = n['b']._sh = sh
+        batches = {}
+
+        def run_eval(item, value=None, caller=None, source=None):
+            batches[item._path] = propagation.get_current_batch()
+            if item._path == 'x':
+                # root change from another thread while the batch runs
+                t = threading.Thread(
+                    target=propagation.trigger_dependents, args=(n['b'], 2, 'Test', None, None, None, None)
+                )
+                t.start()
+                t.join()
+
+        with patch.object(propagation, 'run_eval', side_effect=run_eval):
+            propagation.trigger_dependents(n['a'], 1, 'Test', None, None, None, None)
+            sh.run_tasks()
+        self.assertEqual(sorted(batches), ['x', 'y'])
+        self.assertIsNot(batches['x'], batches['y'])
+
+    def test_changes_inside_batch_join_it(self):
+        n = _graph([('a', 'b'), ('b', 'c')])
+        build_trigger_graph(list(n.values()))
+        sh = _DeferredSh()
+        for node in n.values():
+            node._sh = sh
+        evaluated = []
+
+        def run_eval(item, value=None, caller=None, source=None):
+            evaluated.append(item._path)
+            propagation.trigger_dependents(item, value, caller, None, None, None, None)
+
+        with patch.object(propagation, 'run_eval', side_effect=run_eval):
+            propagation.trigger_dependents(n['a'], 1, 'Test', None, None, None, None)
+            self.assertEqual(len(sh.tasks), 1)
+            batch = sh.tasks[0][1].__self__
+            sh.run_tasks()
+        self.assertEqual(evaluated, ['b', 'c'])
+        self.assertEqual(batch.batches, 1)
+        self.assertIsNone(propagation.get_current_batch())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -66,7 +66,6 @@ def _reset_items():
     """
     lib.item.items._items_instance = None
     lib.item.item._items_instance = None  # separate global in item.py
-    lib.item.items.Items._Items__items = []
     lib.item.items.Items._Items__item_dict = {}
     lib.item.items.Items._children = []
     lib.item.items.Items.plugin_attributes = {}
@@ -17,6 +17,18 @@ Log class (in-memory deque):
   - export()               — returns N entries as list of dicts
   - clean()                — removes entries older than a given datetime
 
+ShngMemLogHandler cache:
+  - emit() only schedules the cache write, MemLogCacheWriter writes it once per interval
+  - close() writes pending changes, cache_interval 0 writes on every record (without fsync)
+  - cache file is replaced atomically and loaded on the next start
+
+Log queue (shng_queue):
+  - LogQueue hands records to the handlers in its own thread, handles directly when stopped
+  - overflow policies drop_newest / drop_oldest count dropped records
+  - QueuedHandler checks the level of the original handler, proxies its attributes and level
+  - Logs.get_original_handler() unwraps a QueuedHandler
+  - Logs.configure_queue() replaces the handlers of the loggers, stop_queue() drains the queue
+
 EnglishLocale:
   - _convert_strftime_to_babel() — converts strftime format codes to Babel
 """
@@ -25,7 +37,11 @@ import collections
 import datetime
 import logging
 import os
+import pickle
 import sys
+import tempfile
+import threading
+import time
 import unittest
 from unittest.mock import MagicMock, patch
 
@@ -36,7 +52,7 @@ import tests.common as common
 common.register_shng_log_levels()
 
 import lib.log as _log_module
-from lib.log import Logs, Log, EnglishLocale
+from lib.log import Logs, Log, EnglishLocale, LogQueue, QueuedHandler, ShngMemLogHandler
 
 
 # ---------------------------------------------------------------------------
@@ -338,5 +354,217 @@ class TestConvertStrftimeToBabel(unittest.TestCase):
         self.assertIn('yy', result)
 
 
+# ===========================================================================
+# ShngMemLogHandler cache
+# ===========================================================================
+
+
+class TestShngMemLogHandlerCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        logs = _make_logs()
+        logs._sh.get_config_dir.return_value = self.tmpdir.name
+        logs._sh.shtime.tzinfo.return_value = datetime.timezone.utc
+        self.writer = _log_module.MemLogCacheWriter()
+        patcher = patch.object(_log_module, '_memlog_cache_writer', self.writer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _handler(self, **kwargs):
+        handler = ShngMemLogHandler('mem_test', maxlen=5, level=logging.INFO, cache=True, **kwargs)
+        self.addCleanup(handler.close)
+        return handler
+
+    def _emit(self, handler, message):
+        handler.handle(logging.LogRecord('test', logging.INFO, __file__, 1, message, None, None))
+
+    def _cached_messages(self, handler):
+        with open(handler._cachefile, 'rb') as f:
+            return [entry['message'] for entry in pickle.load(f)]
+
+    def test_emit_only_schedules_write(self):
+        handler = self._handler(cache_interval=3600)
+        writes = self.writer.writes
+        for i in range(20):
+            self._emit(handler, f'msg {i}')
+        self.assertEqual(self.writer.writes, writes)
+        self.assertEqual(self.writer.pending(), 1)
+        self.assertEqual(self._cached_messages(handler), [])
+
+    def test_close_writes_pending_changes(self):
+        handler = self._handler(cache_interval=3600)
+        self._emit(handler, 'first')
+        self._emit(handler, 'second')
+        handler.close()
+        self.assertEqual(self._cached_messages(handler), ['second', 'first'])
+        self.assertEqual(self.writer.pending(), 0)
+        self.assertFalse(os.path.exists(handler._cachefile + '.tmp'))
+
+    def test_writer_thread_writes_after_interval(self):
+        handler = self._handler(cache_interval=0.05)
+        self._emit(handler, 'msg')
+        for __ in range(100):
+            if self.writer.pending() == 0 and self._cached_messages(handler):
+                break
+            time.sleep(0.01)
+        self.assertEqual(self._cached_messages(handler), ['msg'])
+
+    def test_interval_zero_writes_on_every_record(self):
+        handler = self._handler(cache_interval=0)
+        with patch.object(_log_module.os, 'fsync') as fsync:
+            self._emit(handler, 'msg')
+        self.assertEqual(self._cached_messages(handler), ['msg'])
+        self.assertEqual(self.writer.pending(), 0)
+        fsync.assert_not_called()
+
+    def test_interval_write_uses_fsync(self):
+        handler = self._handler(cache_interval=3600)
+        self._emit(handler, 'msg')
+        with patch.object(_log_module.os, 'fsync') as fsync:
+            handler.close()
+        fsync.assert_called_once()
+
+    def test_cache_is_loaded_on_next_start(self):
+        handler = self._handler(cache_interval=3600)
+        self._emit(handler, 'persisted')
+        handler.close()
+        _log_module.logs_instance._logs = {}
+        handler2 = self._handler()
+        self.assertEqual([entry[3] for entry in handler2._log], ['persisted'])
+
+
+# ===========================================================================
+# Log queue
+# ===========================================================================
+
+
+class _ListHandler(logging.Handler):
+    def __init__(self, level=logging.NOTSET):
+        super().__init__(level)
+        self.messages = []
+        self.threads = set()
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+        self.threads.add(threading.current_thread().name)
+
+
+def _record(message, *args, level=logging.INFO):
+    return logging.LogRecord('test', level, __file__, 1, message, args, None)
+
+
+class TestLogQueue(unittest.TestCase):
+    def test_records_handled_in_queue_thread(self):
+        queue = LogQueue()
+        handler = _ListHandler()
+        queue.start()
+        for i in range(10):
+            queue.put(handler, _record(f'msg {i}'))
+        queue.stop()
+        self.assertEqual(handler.messages, [f'msg {i}' for i in range(10)])
+        self.assertEqual(handler.threads, {'log.queue'})
+        self.assertEqual(queue.get_metrics(), {'queue_depth': 0, 'handled': 10, 'dropped': 0})
+
+    def test_handled_directly_if_not_running(self):
+        queue = LogQueue()
+        handler = _ListHandler()
+        queue.put(handler, _record('direct'))
+        self.assertEqual(handler.messages, ['direct'])
+
+    def _fill(self, policy):
+        queue = LogQueue(max_size=3, policy=policy)
+        queue._alive = True  # queue records without a running thread
+        handler = _ListHandler()
+        results = [queue.put(handler, _record(f'msg {i}')) for i in range(5)]
+        queue._alive = False
+        return queue, results, [record.getMessage() for __, record in queue._queue]
+
+    def test_drop_newest(self):
+        queue, results, queued = self._fill('drop_newest')
+        self.assertEqual(results, [True, True, True, False, False])
+        self.assertEqual(queued, ['msg 0', 'msg 1', 'msg 2'])
+        self.assertEqual(queue.dropped, 2)
+
+    def test_drop_oldest(self):
+        queue, results, queued = self._fill('drop_oldest')
+        self.assertEqual(results, [True] * 5)
+        self.assertEqual(queued, ['msg 2', 'msg 3', 'msg 4'])
+        self.assertEqual(queue.get_metrics()['dropped'], 2)
+
+    def test_unknown_policy_drops_newest(self):
+        self.assertEqual(LogQueue(policy='invalid').policy, 'drop_newest')
+
+
+class TestQueuedHandler(unittest.TestCase):
+    def setUp(self):
+        self.target = _ListHandler(level=logging.WARNING)
+        self.target.set_name('target_handler')
+        self.target.baseFilename = '/tmp/test.log'
+        self.queue = LogQueue()
+        self.handler = QueuedHandler(self.target, self.queue)
+
+    def test_level_of_target_is_checked(self):
+        self.handler.handle(_record('info', level=logging.INFO))
+        self.handler.handle(_record('warning', level=logging.WARNING))
+        self.target.setLevel(logging.INFO)
+        self.handler.handle(_record('info 2', level=logging.INFO))
+        self.assertEqual(self.target.messages, ['warning', 'info 2'])
+
+    def test_arguments_merged_before_queueing(self):
+        args = ['a']
+        record = _record('value %s', args, level=logging.WARNING)
+        self.handler.handle(record)
+        self.assertEqual(record.msg, "value ['a']")
+        self.assertIsNone(record.args)
+
+    def test_attributes_of_target(self):
+        self.assertEqual(self.handler.name, 'target_handler')
+        self.assertEqual(self.handler.baseFilename, '/tmp/test.log')
+        self.assertIs(logging._handlers.get('target_handler'), self.target)
+
+    def test_level_of_target(self):
+        self.assertEqual(self.handler.level, logging.WARNING)
+        self.handler.setLevel(logging.ERROR)
+        self.assertEqual(self.target.level, logging.ERROR)
+        self.target.setLevel(logging.DEBUG)
+        self.assertEqual(self.handler.level, logging.DEBUG)
+
+
+class TestLogsConfigureQueue(unittest.TestCase):
+    def setUp(self):
+        self.logs = _make_logs()
+        self.handler = _ListHandler()
+        self.logger = logging.getLogger('test_log_queue')
+        self.logger.handlers = [self.handler]
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        self.addCleanup(self.logs.stop_queue)
+
+    def test_disabled_by_default(self):
+        self.logs.configure_queue(None)
+        self.assertIsNone(self.logs.get_queue_metrics())
+        self.assertEqual(self.logger.handlers, [self.handler])
+
+    def test_handlers_replaced_and_drained_on_stop(self):
+        self.logs.configure_queue({'enabled': True, 'size': 100, 'policy': 'drop_oldest'})
+        self.assertIsInstance(self.logger.handlers[0], QueuedHandler)
+        self.assertIs(self.logger.handlers[0].target, self.handler)
+        for i in range(20):
+            self.logger.info('msg %d', i)
+        self.logs.stop_queue()
+        self.assertEqual(len(self.handler.messages), 20)
+        self.assertEqual(self.handler.threads, {'log.queue'})
+
+    def test_same_queued_handler_for_a_handler(self):
+        self.logs.configure_queue({'enabled': True})
+        self.assertIs(self.logs.get_queued_handler(self.handler), self.logger.handlers[0])
+
+    def test_original_handler(self):
+        self.logs.configure_queue({'enabled': True})
+        self.assertIs(self.logs.get_original_handler(self.logger.handlers[0]), self.handler)
+        self.assertIs(self.logs.get_original_handler(self.handler), self.handler)
+
+
 if __name__ == '__main__':
     unittest.main()
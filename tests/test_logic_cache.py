@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+"""
+Tests for the bytecode cache of the logics in lib/logic.py
+
+Coverage
+--------
+LogicBytecodeCache.compile:
+  compiles on a miss and writes the cache file, loads the code from the cache
+  after a restart (new cache object), uses the hash when only the modification
+  time changed, recompiles changed files, ignores corrupt cache files
+
+LogicBytecodeCache.prune:
+  removes the cache files of logic files that are no longer used
+
+Logic._generate_bytecode / Logics.reload_logics / Logics.check_logic_files:
+  unchanged logics are not recompiled, changed logics are, a logic with a
+  syntax error keeps its old bytecode, reload_logics removes the cache files
+  of logics that are no longer loaded
+"""
+
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import tests.common as common
+
+common.register_shng_log_levels()
+
+from lib.logic import Logic, LogicBytecodeCache, Logics
+
+
+def _run(code):
+    namespace = {}
+    exec(code, namespace)
+    return namespace['result']
+
+
+class _CacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.tmpdir, 'logic_cache')
+        os.makedirs(self.cache_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write_logic(self, name, source, mtime_ns=None):
+        pathname = os.path.join(self.tmpdir, name)
+        with open(pathname, 'w', encoding='UTF-8') as f:
+            f.write(source)
+        if mtime_ns is not None:
+            os.utime(pathname, ns=(mtime_ns, mtime_ns))
+        return pathname
+
+
+class TestLogicBytecodeCache(_CacheTestCase):
+    def test_miss_writes_cache_file(self):
+        pathname = self.write_logic('a.py', 'result = 1\n')
+        cache = LogicBytecodeCache(self.cache_dir)
+        code, stat_key = cache.compile(pathname)
+        self.assertEqual(_run(code), 1)
+        self.assertEqual(code.co_filename, pathname)
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+        st = os.stat(pathname)
+        self.assertEqual(stat_key, (st.st_mtime_ns, st.st_size))
+
+    def test_hit_after_restart(self):
+        pathname = self.write_logic('a.py', '\ufeffresult = 2\n')
+        LogicBytecodeCache(self.cache_dir).compile(pathname)
+        cache = LogicBytecodeCache(self.cache_dir)
+        code, __ = cache.compile(pathname)
+        self.assertEqual(_run(code), 2)
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+    def test_touched_file_uses_hash(self):
+        pathname = self.write_logic('a.py', 'result = 3\n', mtime_ns=1_000_000_000)
+        LogicBytecodeCache(self.cache_dir).compile(pathname)
+        os.utime(pathname, ns=(2_000_000_000, 2_000_000_000))
+        cache = LogicBytecodeCache(self.cache_dir)
+        code, stat_key = cache.compile(pathname)
+        self.assertEqual(_run(code), 3)
+        self.assertEqual(stat_key[0], 2_000_000_000)
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+    def test_changed_file_is_recompiled(self):
+        pathname = self.write_logic('a.py', 'result = 4\n', mtime_ns=1_000_000_000)
+        LogicBytecodeCache(self.cache_dir).compile(pathname)
+        self.write_logic('a.py', 'result = 5\n', mtime_ns=2_000_000_000)
+        cache = LogicBytecodeCache(self.cache_dir)
+        code, __ = cache.compile(pathname)
+        self.assertEqual(_run(code), 5)
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+    def test_corrupt_cache_file_is_ignored(self):
+        pathname = self.write_logic('a.py', 'result = 6\n')
+        cache = LogicBytecodeCache(self.cache_dir)
+        cache.compile(pathname)
+        cache_file = os.path.join(self.cache_dir, os.listdir(self.cache_dir)[0])
+        with open(cache_file, 'r+b') as f:
+            f.seek(LogicBytecodeCache._header.size)
+            f.truncate()
+            f.write(b'garbage')
+        code, __ = cache.compile(pathname)
+        self.assertEqual(_run(code), 6)
+        self.assertEqual(cache.misses, 2)
+
+    def test_without_directory(self):
+        pathname = self.write_logic('a.py', 'result = 7\n')
+        cache = LogicBytecodeCache(None)
+        self.assertEqual(_run(cache.compile(pathname)[0]), 7)
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+    def test_prune_removes_unused_cache_files(self):
+        cache = LogicBytecodeCache(self.cache_dir)
+        a = self.write_logic('a.py', 'result = 1\n')
+        b = self.write_logic('b.py', 'result = 2\n')
+        cache.compile(a)
+        cache.compile(b)
+        open(os.path.join(self.cache_dir, 'other.txt'), 'w').close()
+        self.assertEqual(cache.prune([a]), 1)
+        expected = [os.path.basename(cache._cache_filename(a)), 'other.txt']
+        self.assertEqual(sorted(os.listdir(self.cache_dir)), sorted(expected))
+        self.assertEqual(LogicBytecodeCache(None).prune([]), 0)
+
+
+class TestReload(_CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache = LogicBytecodeCache(self.cache_dir)
+        self.logics = Logics.__new__(Logics)
+        self.logics._logics = {}
+        self.logics._bytecode_cache = self.cache
+
+    def add_logic(self, name, source):
+        logic = Logic.__new__(Logic)
+        logic._name = name
+        logic.logger = logging.getLogger(__name__)
+        logic._logics = self.logics
+        logic._source_stat = None
+        logic._pathname = self.write_logic(name + '.py', source, mtime_ns=1_000_000_000)
+        self.assertTrue(logic._generate_bytecode())
+        self.logics._logics[name] = logic
+        return logic
+
+    def test_reload_recompiles_changed_logics_only(self):
+        a = self.add_logic('a', 'result = 1\n')
+        self.add_logic('b', 'result = 2\n')
+        self.assertEqual(self.logics.reload_logics(), [])
+        self.write_logic('a.py', 'result = 10\n', mtime_ns=2_000_000_000)
+        self.assertEqual(self.logics.reload_logics(), ['a'])
+        self.assertEqual(_run(a._bytecode), 10)
+        self.assertEqual(self.cache.misses, 3)
+
+    def test_reload_removes_cache_of_unloaded_logics(self):
+        self.add_logic('a', 'result = 1\n')
+        self.add_logic('b', 'result = 2\n')
+        del self.logics._logics['b']
+        self.logics.reload_logics()
+        a_cache = self.cache._cache_filename(self.logics._logics['a']._pathname)
+        self.assertEqual(os.listdir(self.cache_dir), [os.path.basename(a_cache)])
+
+    def test_check_logic_files_reloads_single_logic(self):
+        a = self.add_logic('a', 'result = 1\n')
+        b = self.add_logic('b', 'result = 2\n')
+        b_code = b._bytecode
+        self.write_logic('a.py', 'result = 11\n', mtime_ns=2_000_000_000)
+        self.assertTrue(a.source_changed())
+        self.logics.check_logic_files()
+        self.assertFalse(a.source_changed())
+        self.assertEqual(_run(a._bytecode), 11)
+        self.assertIs(b._bytecode, b_code)
+
+    def test_syntax_error_keeps_old_bytecode(self):
+        a = self.add_logic('a', 'result = 1\n')
+        self.write_logic('a.py', 'result = (\n', mtime_ns=2_000_000_000)
+        with self.assertLogs(__name__, level='ERROR'):
+            self.assertFalse(a._generate_bytecode())
+        self.assertEqual(_run(a._bytecode), 1)
+        self.assertFalse(a.source_changed())
+
+
+if __name__ == '__main__':
+    unittest.main()
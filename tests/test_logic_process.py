@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+"""
+Tests for lib/logic_process.py
+
+Coverage
+--------
+LogicProcessPool.run:
+  item reads and writes through the proxy protocol (sh.<path>(),
+  sh.return_item(), items.return_item()), the trigger dict, log records of
+  the logic, LeaveLogic, exit(), exceptions in the logic and unknown items,
+  reuse of an idle worker, a worker that dies during a run
+"""
+
+import logging
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import tests.common as common
+
+common.register_shng_log_levels()
+
+from lib.logic_process import LogicProcessError, LogicProcessPool
+
+
+class _Item:
+    def __init__(self, value):
+        self.value = value
+        self.caller = None
+
+    def __call__(self, value=None, caller='Logic', source=None):
+        if value is None:
+            return self.value
+        self.value = value
+        self.caller = (caller, source)
+
+
+class _Items:
+    def __init__(self, **values):
+        self.items = {path.replace('_', '.'): _Item(value) for path, value in values.items()}
+
+    def return_item(self, path):
+        return self.items.get(path)
+
+
+class TestLogicProcessPool(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = LogicProcessPool(max_workers=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.stop()
+
+    def run_logic(self, source, items=None, trigger=None):
+        code = compile(source, 'test_logic.py', 'exec')
+        return self.pool.run('test_logic', code, trigger or {}, items or _Items())
+
+    def test_item_proxies(self):
+        items = _Items(house_temp=20, house_target=0, house_count=1)
+        source = (
+            "sh.house.target(sh.house.temp() + trigger['value'], 'Test', 'src')\n"
+            "items.return_item('house.count')(sh.return_item('house.count')() + 1)\n"
+        )
+        self.assertEqual(self.run_logic(source, items, {'value': 2}), ('ok', ''))
+        self.assertEqual(items.items['house.target'].value, 22)
+        self.assertEqual(items.items['house.target'].caller, ('Test', 'src'))
+        self.assertEqual(items.items['house.count'].value, 2)
+
+    def test_log_records_are_forwarded(self):
+        with self.assertLogs('logics.test_logic', level='INFO') as logs:
+            self.run_logic("logger.info('value %s', trigger['value'])", trigger={'value': 5})
+        self.assertEqual(logs.records[0].getMessage(), 'value 5')
+
+    def test_leave_logic_and_exit(self):
+        self.assertEqual(self.run_logic("raise LeaveLogic('done')"), ('leave', 'done'))
+        self.assertEqual(self.run_logic('exit()'), ('exit', ''))
+
+    def test_exception_in_logic(self):
+        status, message = self.run_logic('def calc():\n    return 1 / 0\n\ncalc()\n')
+        self.assertEqual(status, 'error')
+        self.assertIn("Datei 'test_logic.py', Zeile 2", message)
+        self.assertIn('function calc()', message)
+        self.assertIn('division by zero', message)
+
+    def test_unknown_item(self):
+        status, message = self.run_logic('sh.house.nowhere()')
+        self.assertEqual(status, 'error')
+        self.assertIn('Zeile 1', message)
+        self.assertIn("Item 'house.nowhere' not found", message)
+
+    def test_worker_is_reused(self):
+        self.run_logic('logic.counter = getattr(logic, "counter", 0) + 1')
+        items = _Items(result=0)
+        self.run_logic('logic.counter += 1\nsh.result(logic.counter)', items)
+        self.assertEqual(items.items['result'].value, 2)
+        self.assertEqual(self.pool.get_statistics()['workers'], 1)
+
+    def test_worker_dies(self):
+        with self.assertRaises(LogicProcessError):
+            self.run_logic('import os\nos._exit(1)')
+        self.assertEqual(self.run_logic('pass'), ('ok', ''))
+
+
+if __name__ == '__main__':
+    logging.basicConfig()
+    unittest.main()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+"""
+Tests for modules/mqtt/publishqueue.py
+
+Coverage
+--------
+PublishQueue:
+  messages are sent in order by the sender thread, retained messages are coalesced,
+  non-retained messages are not coalesced, drop_oldest / drop_newest policies,
+  in-flight tracking by message id (also if paho reports the mid early), metrics,
+  publishes not accepted by paho count as failed and are not in flight,
+  stale and wrapped-around message ids are expired, put() after stop() is rejected
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from modules.mqtt.publishqueue import PublishQueue, PublishError, DROP_NEWEST, DROP_OLDEST
+
+
+class _Publisher:
+    """Records published messages and returns increasing message ids"""
+
+    def __init__(self):
+        self.sent = []
+        self.mid = 0
+
+    def __call__(self, topic, payload, qos, retain):
+        self.sent.append((topic, payload))
+        self.mid += 1
+        return self.mid
+
+
+class TestPublishQueue(unittest.TestCase):
+    def setUp(self):
+        self.publisher = _Publisher()
+        self.queue = PublishQueue(self.publisher, max_size=3)
+
+    def _drain(self):
+        self.queue._alive = False
+        self.queue._run()
+
+    def test_messages_sent_in_order(self):
+        self.queue.put('a', 1)
+        self.queue.put('b', 2)
+        self.queue.put('a', 3)
+        self._drain()
+        self.assertEqual(self.publisher.sent, [('a', 1), ('b', 2), ('a', 3)])
+
+    def test_retained_messages_coalesced(self):
+        self.queue.put('a', 1, retain=True)
+        self.queue.put('b', 2)
+        self.queue.put('a', 3, retain=True)
+        self._drain()
+        self.assertEqual(self.publisher.sent, [('a', 3), ('b', 2)])
+        self.assertEqual(self.queue.coalesced, 1)
+
+    def test_retained_after_send_is_queued_again(self):
+        self.queue.put('a', 1, retain=True)
+        self._drain()
+        self.queue.put('a', 2, retain=True)
+        self._drain()
+        self.assertEqual(self.publisher.sent, [('a', 1), ('a', 2)])
+
+    def test_drop_oldest(self):
+        for i in range(5):
+            self.assertTrue(self.queue.put('t', i))
+        self._drain()
+        self.assertEqual(self.publisher.sent, [('t', 2), ('t', 3), ('t', 4)])
+        self.assertEqual(self.queue.drops, 2)
+
+    def test_drop_oldest_retained_entry(self):
+        self.queue.put('r', 1, retain=True)
+        for i in range(3):
+            self.queue.put('t', i)
+        self.queue.put('r', 2, retain=True)
+        self._drain()
+        self.assertEqual(self.publisher.sent, [('t', 1), ('t', 2), ('r', 2)])
+
+    def test_drop_newest(self):
+        queue = PublishQueue(self.publisher, max_size=2, policy=DROP_NEWEST)
+        self.assertTrue(queue.put('t', 1))
+        self.assertTrue(queue.put('t', 2))
+        self.assertFalse(queue.put('t', 3))
+        self.assertEqual(queue.drops, 1)
+        self.assertEqual(queue.depth(), 2)
+
+    def test_invalid_policy_uses_drop_oldest(self):
+        self.assertEqual(PublishQueue(self.publisher, policy='foo').policy, DROP_OLDEST)
+
+    def test_inflight_until_published(self):
+        self.queue.put('a', 1, qos=1)
+        self.queue.put('a', 2, qos=1)
+        self._drain()
+        self.assertEqual(self.queue.inflight('a'), 2)
+        self.queue.on_published(1)
+        self.assertEqual(self.queue.inflight('a'), 1)
+        self.queue.on_published(2)
+        self.assertEqual(self.queue.inflight(), 0)
+        self.assertGreaterEqual(self.queue.latency(), 0.0)
+
+    def test_mid_reported_before_publish_returned(self):
+        def publish(topic, payload, qos, retain):
+            self.queue.on_published(7)
+            return 7
+
+        queue = self.queue = PublishQueue(publish)
+        queue.put('a', 1)
+        self._drain()
+        self.assertEqual(queue.inflight(), 0)
+        self.assertEqual(queue._early_mids, {})
+
+    def test_publish_exception_is_not_inflight(self):
+        def publish(topic, payload, qos, retain):
+            raise OSError('broker gone')
+
+        queue = self.queue = PublishQueue(publish)
+        queue.put('a', 1)
+        with self.assertLogs('modules.mqtt.publishqueue', level='ERROR'):
+            self._drain()
+        self.assertEqual(queue.inflight(), 0)
+
+    def test_not_accepted_publish_is_failed(self):
+        def publish(topic, payload, qos, retain):
+            raise PublishError('The client is not currently connected.')
+
+        queue = self.queue = PublishQueue(publish)
+        for i in range(3):
+            queue.put('a', i)
+        with self.assertLogs('modules.mqtt.publishqueue', level='DEBUG') as cm:
+            self._drain()
+        self.assertEqual(len([line for line in cm.output if line.startswith('ERROR')]), 1)
+        self.assertEqual(queue.inflight(), 0)
+        self.assertEqual(queue._inflight_mids, {})
+        self.assertEqual((queue.failed, queue.published), (3, 0))
+
+    def test_stale_mids_expire(self):
+        self.queue.put('a', 1, qos=1)
+        self._drain()
+        self.assertEqual(self.queue.inflight('a'), 1)
+        self.queue._expire(time.monotonic() + self.queue.inflight_timeout)
+        self.assertEqual(self.queue.inflight(), 0)
+        self.assertEqual(self.queue._inflight_mids, {})
+        self.assertEqual(self.queue.expired, 1)
+
+    def test_wrapped_mid_replaces_stale_entry(self):
+        def publish(topic, payload, qos, retain):
+            return 1
+
+        queue = self.queue = PublishQueue(publish)
+        queue.put('a', 1, qos=1)
+        queue.put('b', 2, qos=1)
+        self._drain()
+        self.assertEqual((queue.inflight('a'), queue.inflight('b')), (0, 1))
+        queue.on_published(1)
+        self.assertEqual(queue.inflight(), 0)
+        self.assertEqual(queue.expired, 1)
+
+    def test_put_after_stop_is_rejected(self):
+        self.queue.start()
+        self.queue.stop()
+        with self.assertLogs('modules.mqtt.publishqueue', level='WARNING'):
+            self.assertFalse(self.queue.put('a', 1))
+        self.assertEqual(self.queue.depth(), 0)
+
+    def test_sender_thread(self):
+        done = threading.Event()
+
+        def publish(topic, payload, qos, retain):
+            done.set()
+
+        queue = PublishQueue(publish)
+        queue.start()
+        queue.put('a', 1)
+        self.assertTrue(done.wait(5))
+        queue.stop()
+        self.assertIsNone(queue._thread)
+
+    def test_metrics(self):
+        self.queue.put('a', 1)
+        metrics = self.queue.get_metrics()
+        self.assertEqual(metrics['queue_depth'], 1)
+        self.assertEqual(
+            set(metrics),
+            {'queue_depth', 'inflight', 'publish_latency', 'published', 'coalesced', 'drops', 'failed', 'expired'},
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+"""
+Tests for modules/mqtt/topictrie.py
+
+Coverage
+--------
+TopicTrie:
+  exact topics, '+' and '#' wildcards, '#' matching the parent level,
+  '$' topics not matched by leading wildcards, removing topics prunes the trie
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from modules.mqtt.topictrie import TopicTrie
+
+
+def _trie(*topics):
+    trie = TopicTrie()
+    for topic in topics:
+        trie.add(topic)
+    return trie
+
+
+class TestTopicTrieMatch(unittest.TestCase):
+    def test_exact_topic(self):
+        trie = _trie('a/b/c', 'a/b')
+        self.assertEqual(trie.match('a/b/c'), ['a/b/c'])
+        self.assertEqual(trie.match('a/b'), ['a/b'])
+        self.assertEqual(trie.match('a/b/c/d'), [])
+
+    def test_single_level_wildcard(self):
+        trie = _trie('a/+/c', '+/b/+')
+        self.assertEqual(sorted(trie.match('a/b/c')), ['+/b/+', 'a/+/c'])
+        self.assertEqual(trie.match('a/x/c'), ['a/+/c'])
+        self.assertEqual(trie.match('a/x/c/d'), [])
+        self.assertEqual(trie.match('a/c'), [])
+
+    def test_multi_level_wildcard(self):
+        trie = _trie('a/#', '#', 'a/+/#')
+        self.assertEqual(sorted(trie.match('a/b/c/d')), ['#', 'a/#', 'a/+/#'])
+        self.assertEqual(sorted(trie.match('x')), ['#'])
+
+    def test_multi_level_wildcard_matches_parent(self):
+        trie = _trie('a/#')
+        self.assertEqual(trie.match('a'), ['a/#'])
+        self.assertEqual(trie.match('b'), [])
+
+    def test_dollar_topics_not_matched_by_leading_wildcard(self):
+        trie = _trie('#', '+/broker', '$SYS/#')
+        self.assertEqual(trie.match('$SYS/broker'), ['$SYS/#'])
+
+    def test_empty_levels(self):
+        trie = _trie('/a', 'a/')
+        self.assertEqual(trie.match('/a'), ['/a'])
+        self.assertEqual(trie.match('a/'), ['a/'])
+        self.assertEqual(trie.match('a'), [])
+
+
+class TestTopicTrieUpdate(unittest.TestCase):
+    def test_len_and_contains(self):
+        trie = _trie('a/b', 'a/b', 'a/+')
+        self.assertEqual(len(trie), 2)
+        self.assertIn('a/+', trie)
+        self.assertNotIn('a', trie)
+
+    def test_remove(self):
+        trie = _trie('a/b/c', 'a/b')
+        self.assertTrue(trie.remove('a/b/c'))
+        self.assertEqual(trie.match('a/b/c'), [])
+        self.assertEqual(trie.match('a/b'), ['a/b'])
+        self.assertFalse(trie.remove('a/b/c'))
+        self.assertFalse(trie.remove('a'))
+        self.assertEqual(len(trie), 1)
+
+    def test_remove_prunes_nodes(self):
+        trie = _trie('a/b/c/d')
+        trie.remove('a/b/c/d')
+        self.assertEqual(trie._root.children, {})
+
+    def test_remove_keeps_nodes_of_other_topics(self):
+        trie = _trie('a/b/c', 'a/x')
+        trie.remove('a/b/c')
+        self.assertEqual(list(trie._root.children['a'].children), ['x'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,13 +8,17 @@ Strategy
 The Scheduler is a threading.Thread that drives a full SmartHomeNG runtime.
 We test two independently useful units without starting threads:
 
-1. _PriorityQueue  — no external dependencies; tests priority ordering, FIFO
-   within same priority, concurrent-safe insert/get, and size/dump.
+1. _PriorityQueue and _RunQueue — no external dependencies; tests priority
+   ordering, FIFO within same priority, concurrent-safe insert/get, and size/dump.
 
 2. Scheduler job-registration API (add / remove / get / return_next) with a
    minimal mock of the shtime, items, and crontabs dependencies.  We exercise
    the _next_time() calculation for cycle-based and cron-based jobs.
 
+3. _execute_logic_task() with a minimal logic object: the prepared globals
+   template, the per-run copy, the runtime statistics (LogicRunStatistics) and
+   the hand-over of logics with 'executor: process' to the worker pool.
+
 The Scheduler thread is never started — we only call the synchronous API.
 """
 
@@ -32,7 +36,8 @@ import tests.common as common
 
 common.register_shng_log_levels()
 
-from lib.scheduler import _PriorityQueue, Scheduler
+from lib.logic import LogicRunStatistics
+from lib.scheduler import _PriorityQueue, _RunQueue, Scheduler
 import lib.scheduler as _scheduler_module
 
 
@@ -144,6 +149,95 @@ class TestPriorityQueue(unittest.TestCase):
             self.assertGreaterEqual(prio, prev_prio)
             prev_prio = prio
 
+    def test_peek_does_not_consume_entry(self):
+        q = _PriorityQueue()
+        self.assertIsNone(q.peek())
+        q.insert(2, 'b')
+        q.insert(1, 'a')
+        self.assertEqual(q.peek(), (1, 'a'))
+        self.assertEqual(q.qsize(), 2)
+
+    def test_equal_priorities_do_not_compare_data(self):
+        # data objects without ordering must not break the heap
+        q = _PriorityQueue()
+        q.insert(1, object())
+        q.insert(1, object())
+        q.get()
+        q.get()
+        self.assertEqual(q.qsize(), 0)
+
+
+# ===========================================================================
+# _RunQueue
+# ===========================================================================
+
+
+class TestRunQueue(unittest.TestCase):
+    """_RunQueue holds one FIFO per priority; lower priority number = higher urgency."""
+
+    def test_empty_queue_size_is_zero(self):
+        self.assertEqual(_RunQueue().qsize(), 0)
+
+    def test_get_returns_lowest_priority_first(self):
+        q = _RunQueue()
+        q.insert(3, 'low')
+        q.insert(1, 'high')
+        q.insert(2, 'mid')
+        self.assertEqual(q.get(), (1, 'high'))
+        self.assertEqual(q.get(), (2, 'mid'))
+        self.assertEqual(q.get(), (3, 'low'))
+
+    def test_fifo_within_same_priority(self):
+        q = _RunQueue()
+        for data in ('first', 'second', 'third'):
+            q.insert(3, data)
+        self.assertEqual([q.get()[1] for _ in range(3)], ['first', 'second', 'third'])
+
+    def test_get_on_empty_raises_index_error(self):
+        q = _RunQueue()
+        with self.assertRaises(IndexError):
+            q.get()
+        q.insert(1, 'x')
+        q.get()
+        with self.assertRaises(IndexError):
+            q.get()
+
+    def test_depth_per_priority(self):
+        q = _RunQueue()
+        q.insert(3, 'a')
+        q.insert(3, 'b')
+        q.insert(1, 'c')
+        self.assertEqual(q.depth(), {1: 1, 3: 2})
+        self.assertEqual(q.qsize(), 3)
+
+    def test_dump_returns_entries_in_get_order(self):
+        q = _RunQueue()
+        q.insert(3, 'c1')
+        q.insert(1, 'a')
+        q.insert(3, 'c2')
+        self.assertEqual(q.dump(), [(1, 'a'), (3, 'c1'), (3, 'c2')])
+        self.assertEqual(q.qsize(), 3)
+
+    def test_concurrent_inserts_and_gets(self):
+        q = _RunQueue()
+        received = []
+
+        def producer(prio):
+            for i in range(500):
+                q.insert(prio, (prio, i))
+
+        threads = [threading.Thread(target=producer, args=(p,)) for p in (1, 2, 3, 4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        while q.qsize():
+            received.append(q.get()[1])
+
+        self.assertEqual(len(received), 2000)
+        for prio in (1, 2, 3, 4):
+            self.assertEqual([i for p, i in received if p == prio], list(range(500)))
+
 
 # ===========================================================================
 # Scheduler — job registration and _next_time calculation
@@ -456,5 +550,211 @@ class TestSchedulerNextTimeCalculation(unittest.TestCase):
         self.assertEqual(self.sched._scheduler['multi_cron']['next'], soon)
 
 
+class TestSchedulerTimerHeap(unittest.TestCase):
+    """Jobs with a next execution time are kept in a min-heap that drives the run loop."""
+
+    def setUp(self):
+        self.sched, self.now = _make_scheduler()
+        self.sched._scheduler.clear()
+
+    def _obj(self):
+        obj = MagicMock()
+        obj.__class__.__name__ = 'function'
+        return obj
+
+    def test_add_pushes_next_time_to_heap(self):
+        self.sched.add('heap_job', self._obj(), cycle=60, offset=60)
+        expected = self.now + datetime.timedelta(seconds=60)
+        self.assertIn((expected, 'heap_job'), [(e[0], e[2]) for e in self.sched._timer_heap])
+
+    def test_add_with_explicit_next_pushes_to_heap(self):
+        explicit_next = self.now + datetime.timedelta(minutes=5)
+        self.sched.add('explicit', self._obj(), next=explicit_next)
+        self.assertEqual(self.sched._timer_heap[0][0], explicit_next)
+
+    def test_pop_due_timers_returns_only_due_entries(self):
+        self.sched.add('soon', self._obj(), next=self.now + datetime.timedelta(seconds=1))
+        self.sched.add('later', self._obj(), next=self.now + datetime.timedelta(hours=1))
+        due = self.sched._pop_due_timers(self.now + datetime.timedelta(seconds=2))
+        self.assertEqual([e[2] for e in due], ['soon'])
+        self.assertEqual(len(self.sched._timer_heap), 1)
+
+    def test_heap_pops_in_time_order(self):
+        for name, seconds in (('c', 30), ('a', 10), ('b', 20)):
+            self.sched.add(name, self._obj(), next=self.now + datetime.timedelta(seconds=seconds))
+        due = self.sched._pop_due_timers(self.now + datetime.timedelta(minutes=1))
+        self.assertEqual([e[2] for e in due], ['a', 'b', 'c'])
+
+    def test_change_reschedules_job(self):
+        self.sched.add('changed', self._obj(), cycle=60, offset=60)
+        self.sched.change('changed', cycle=10)
+        job = self.sched._scheduler['changed']
+        self.assertEqual(job['next'], self.now + datetime.timedelta(seconds=10))
+        self.assertEqual(self.sched._timer_heap[0][0], job['next'])
+
+    def test_removed_job_entry_is_stale(self):
+        self.sched.add('gone', self._obj(), cycle=60, offset=60)
+        self.sched.remove('gone')
+        due = self.sched._pop_due_timers(self.now + datetime.timedelta(minutes=5))
+        # the heap entry still exists but does not belong to a job anymore
+        self.assertEqual([e[2] for e in due], ['gone'])
+        self.assertNotIn('gone', self.sched._scheduler)
+
+    def test_rebuild_drops_outdated_entries(self):
+        self.sched.add('job', self._obj(), cycle=60, offset=60)
+        for _ in range(5):
+            self.sched.change('job', cycle=30)
+        with self.sched._timerc:
+            self.sched._rebuild_timer_heap()
+        self.assertEqual(len(self.sched._timer_heap), 1)
+
+    def test_push_earlier_timer_notifies_run_loop(self):
+        self.sched.alive = True
+        self.sched._housekeeping_interval = 5
+        self.sched.shtime.now.side_effect = lambda: datetime.datetime.now(datetime.timezone.utc)
+        self.sched.add(
+            'far', self._obj(), next=datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=1)
+        )
+        waiter = threading.Thread(target=self.sched._wait_for_next_timer)
+        waiter.start()
+        self.sched.add('near', self._obj(), next=datetime.datetime.now(datetime.timezone.utc))
+        waiter.join(timeout=2)
+        self.assertFalse(waiter.is_alive())
+
+
+# ===========================================================================
+# Scheduler — logic execution
+# ===========================================================================
+
+
+class _Logic:
+    """Minimal logic object with the attributes used by _execute_logic_task()."""
+
+    def __init__(self, code, name='test_logic'):
+        self.name = name
+        self._enabled = True
+        self._bytecode = compile(code, name, 'exec')
+        self._logics = MagicMock()
+        self._run_stats = LogicRunStatistics()
+        self.runs = 0
+
+    def set_last_run(self):
+        self.runs += 1
+
+    def get_method_triggers(self):
+        return []
+
+    def record_run(self, duration):
+        self._run_stats.add_run(duration)
+
+    def record_exception(self, text):
+        self._run_stats.add_exception(text, datetime.datetime(2024, 6, 21, 12, 0, 0))
+
+
+class TestLogicExecution(unittest.TestCase):
+    def setUp(self):
+        self.sched, self.now = _make_scheduler()
+        self.sched._sh.shng_status = {'code': 20}
+        self.sched.mqtt = MagicMock()
+
+    def _run(self, logic, value=None):
+        self.sched._execute_logic_task(logic, 'Test', None, None, value)
+
+    def test_globals_template_is_prepared_once(self):
+        logic = _Logic('logic.seen.append((trigger["value"], sh, items, logics))')
+        logic.seen = []
+        self._run(logic, 1)
+        template = logic._globals_template
+        self._run(logic, 2)
+        self.assertIs(logic._globals_template, template)
+        self.assertNotIn('trigger', template)
+        self.assertEqual([seen[0] for seen in logic.seen], [1, 2])
+        self.assertIs(logic.seen[0][1], self.sched._sh)
+        self.assertIs(logic.seen[0][2], self.sched.items)
+        self.assertIs(logic.seen[0][3], logic._logics)
+
+    def test_runs_do_not_share_variables(self):
+        logic = _Logic('logic.had_counter = "counter" in globals()\ncounter = 1')
+        self._run(logic)
+        self._run(logic)
+        self.assertFalse(logic.had_counter)
+        self.assertNotIn('counter', logic._globals_template)
+
+    def test_template_rebuilt_when_mqtt_changes(self):
+        logic = _Logic('logic.mqtt_seen = mqtt')
+        self._run(logic)
+        template = logic._globals_template
+        self.sched.mqtt = MagicMock()
+        self._run(logic)
+        self.assertIsNot(logic._globals_template, template)
+        self.assertIs(logic.mqtt_seen, self.sched.mqtt)
+
+    def test_run_statistics(self):
+        logic = _Logic('pass')
+        for _ in range(3):
+            self._run(logic)
+        stats = logic._run_stats.get()
+        self.assertEqual(stats['count'], 3)
+        self.assertEqual(logic.runs, 3)
+        self.assertEqual(stats['last_exception'], '')
+
+    def test_exception_is_recorded(self):
+        logic = _Logic('1 / 0')
+        self._run(logic)
+        stats = logic._run_stats.get()
+        self.assertEqual(stats['count'], 1)
+        self.assertIn('division by zero', stats['last_exception'])
+        self.assertEqual(stats['last_exception_time'], '2024-06-21 12:00:00')
+
+    def test_leave_logic_is_no_exception(self):
+        logic = _Logic('raise LeaveLogic("done")')
+        self._run(logic)
+        stats = logic._run_stats.get()
+        self.assertEqual(stats['count'], 1)
+        self.assertEqual(stats['last_exception'], '')
+
+    def test_process_executor(self):
+        logic = _Logic('pass')
+        logic.executor = 'process'
+        pool = MagicMock()
+        with patch('lib.scheduler.get_logic_process_pool', return_value=pool):
+            for result in (('ok', ''), ('leave', 'done'), ('exit', ''), ('error', "Datei 'x', Zeile 1")):
+                pool.run.return_value = result
+                self._run(logic, 3)
+        self.assertEqual(pool.run.call_args[0][:2], ('test_logic', logic._bytecode))
+        self.assertEqual(pool.run.call_args[0][2]['value'], 3)
+        self.assertIs(pool.run.call_args[0][3], self.sched.items)
+        stats = logic._run_stats.get()
+        self.assertEqual(stats['count'], 4)
+        self.assertEqual(logic.runs, 1)
+        self.assertEqual(stats['last_exception'], "Datei 'x', Zeile 1")
+
+
+class TestLogicRunStatistics(unittest.TestCase):
+    def test_empty(self):
+        stats = LogicRunStatistics().get()
+        self.assertEqual((stats['count'], stats['mean'], stats['p95'], stats['max']), (0, 0.0, 0.0, 0.0))
+
+    def test_mean_p95_max_in_ms(self):
+        rs = LogicRunStatistics()
+        for ms in range(1, 101):
+            rs.add_run(ms / 1000)
+        stats = rs.get()
+        self.assertEqual(stats['count'], 100)
+        self.assertAlmostEqual(stats['mean'], 50.5)
+        self.assertAlmostEqual(stats['p95'], 95.0)
+        self.assertAlmostEqual(stats['max'], 100.0)
+
+    def test_percentile_uses_last_runs_only(self):
+        rs = LogicRunStatistics(size=10)
+        rs.add_run(5.0)
+        for _ in range(10):
+            rs.add_run(0.001)
+        stats = rs.get()
+        self.assertAlmostEqual(stats['p95'], 1.0)
+        self.assertAlmostEqual(stats['max'], 5000.0)
+        self.assertEqual(stats['count'], 11)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+"""
+Tests for lib/scheduler_metrics.py
+
+Coverage
+--------
+Histogram:
+  bucket assignment, percentiles (bucket bounds, capped by the maximum),
+  values above the last bucket
+
+SchedulerMetrics:
+  per-job durations sorted by worker time, limit of tracked job names,
+  bounded queue depth samples, summary for the env items, reset
+
+Scheduler:
+  a task taken from the run queue records its queue latency and duration,
+  reset_metrics()
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import tests.common as common
+
+common.register_shng_log_levels()
+
+from lib.scheduler_metrics import BUCKETS_MS, OTHER_JOBS, Histogram, SchedulerMetrics
+import lib.scheduler as _scheduler_module
+
+
+class TestHistogram(unittest.TestCase):
+    def test_buckets(self):
+        h = Histogram()
+        for ms in (0.05, 0.1, 0.2, 3, 70000):
+            h.add(ms)
+        self.assertEqual(h.get()['buckets'], {'<=0.1': 2, '<=0.25': 1, '<=5': 1, '>60000': 1})
+        self.assertEqual(len(h.counts), len(BUCKETS_MS) + 1)
+
+    def test_percentiles(self):
+        h = Histogram()
+        for __ in range(95):
+            h.add(0.8)
+        for __ in range(5):
+            h.add(40)
+        # upper bound of the bucket, but never more than the maximum
+        self.assertEqual(h.percentile(50), 1)
+        self.assertEqual(h.percentile(95), 1)
+        self.assertEqual(h.percentile(99), 40)
+        self.assertEqual(h.get()['max'], 40)
+        self.assertAlmostEqual(h.get()['mean'], 2.76)
+
+    def test_overflow_bucket_uses_maximum(self):
+        h = Histogram()
+        h.add(90000)
+        self.assertEqual(h.percentile(95), 90000)
+
+    def test_empty(self):
+        result = Histogram().get()
+        self.assertEqual((result['count'], result['p95'], result['max'], result['buckets']), (0, 0.0, 0.0, {}))
+
+
+class TestSchedulerMetrics(unittest.TestCase):
+    def test_jobs_sorted_by_worker_time(self):
+        metrics = SchedulerMetrics()
+        metrics.add_run('short', 0.001)
+        metrics.add_run('short', 0.001)
+        metrics.add_run('long', 0.5)
+        jobs = metrics.get_jobs()
+        self.assertEqual([job['name'] for job in jobs], ['long', 'short'])
+        self.assertEqual(jobs[1]['count'], 2)
+        self.assertEqual(jobs[1]['total'], 2.0)
+        self.assertEqual([job['name'] for job in metrics.get_jobs(sort='count')], ['short', 'long'])
+        self.assertEqual(len(metrics.get_jobs(top=1)), 1)
+
+    def test_number_of_jobs_is_limited(self):
+        metrics = SchedulerMetrics(max_jobs=3)
+        for i in range(10):
+            metrics.add_run(f'job{i}', 0.001)
+        metrics.add_run('job1', 0.001)
+        jobs = {job['name']: job['count'] for job in metrics.get_jobs(top=0)}
+        self.assertEqual(jobs, {'job0': 1, 'job1': 2, 'job2': 1, OTHER_JOBS: 7})
+
+    def test_queue_depth_samples_are_bounded(self):
+        metrics = SchedulerMetrics(depth_samples=5)
+        for depth in (3, 9, 1, 0, 0, 2, 4):
+            metrics.sample_depth(depth)
+        result = metrics.get()['queue_depth']
+        self.assertEqual([sample[1] for sample in result['samples']], [1, 0, 0, 2, 4])
+        self.assertEqual((result['actual'], result['max']), (4, 9))
+
+    def test_summary_and_reset(self):
+        metrics = SchedulerMetrics()
+        metrics.add_timer_lateness(-0.5)  # a timer that fired early counts as on time
+        metrics.add_timer_lateness(0.02)
+        metrics.add_queue_latency(0.003)
+        metrics.add_run('logics.heavy', 2)
+        metrics.sample_depth(7)
+        summary = metrics.get_summary()
+        self.assertEqual(summary['timer_lateness_max'], 20)
+        self.assertEqual(summary['queue_latency_max'], 3)
+        self.assertEqual((summary['queue_depth'], summary['queue_depth_max']), (7, 7))
+        self.assertEqual((summary['top_job'], summary['top_job_time']), ('logics.heavy', 2000))
+        metrics.reset()
+        summary = metrics.get_summary()
+        self.assertEqual((summary['timer_lateness_max'], summary['top_job'], summary['queue_depth_max']), (0, '', 0))
+
+
+class TestSchedulerRecordsMetrics(unittest.TestCase):
+    def setUp(self):
+        _scheduler_module._scheduler_instance = None
+        with patch('lib.scheduler.Shtime'), patch('lib.scheduler.Items'), patch('lib.scheduler.TriggerTimes'):
+            self.sched = _scheduler_module.Scheduler(MagicMock())
+
+    def test_worker_records_latency_and_duration(self):
+        def task(*args):
+            time.sleep(0.01)
+            self.sched.alive = False
+
+        self.sched.alive = True
+        self.sched._task = task
+        self.sched.trigger('metrics.job', obj=MagicMock(), by='Test')
+        time.sleep(0.005)
+        worker = threading.Thread(target=self.sched._worker)
+        worker.start()
+        worker.join(timeout=5)
+        metrics = self.sched.get_metrics()
+        self.assertEqual(metrics['queue_latency']['count'], 1)
+        self.assertGreaterEqual(metrics['queue_latency']['max'], 5)
+        self.assertEqual(metrics['jobs'][0]['name'], 'metrics.job')
+        self.assertGreaterEqual(metrics['jobs'][0]['max'], 10)
+
+    def test_reset_metrics(self):
+        self.sched._metrics.add_run('metrics.job', 0.1)
+        self.sched.reset_metrics()
+        self.assertEqual(self.sched.get_metrics()['jobs'], [])
+        self.assertEqual(self.sched.get_metrics_summary()['top_job'], '')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,6 +5,11 @@ Tests for lib/shyaml.py
 
 Coverage:
   - yaml_load()             — valid file, missing file, malformed YAML
+  - yaml_load() parse cache — hit, invalidation on change, ordered/unordered entries
+  - prune_parse_cache()     — removes cache files of yaml files that no longer exist
+  - _fast_load()            — same results as the python SafeLoader, %YAML directive
+  - libyaml parser          — same results as the python parser for yaml 1.1 scalars and multi-line
+                              scalars (only if ruamel.yaml.clib is installed)
   - yaml_load_fromstring()  — string input, ordered dict
   - yaml_save()             — round-trip write + reload
   - yaml_save_roundtrip()   — ruamel-based round-trip preserving comments
@@ -19,6 +24,7 @@ import tempfile
 import textwrap
 import unittest
 from collections import OrderedDict
+from unittest.mock import patch
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
@@ -113,6 +119,160 @@ class TestYamlLoad(unittest.TestCase):
         self.assertIsNone(result)
 
 
+class TestYamlParseCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        shyaml.set_parse_cache_dir(self.cache_dir)
+        self.addCleanup(shyaml.set_parse_cache_dir, None)
+        fd, self.path = tempfile.mkstemp(suffix='.yaml')
+        os.close(fd)
+        self.addCleanup(os.unlink, self.path)
+
+    def _write(self, content):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(textwrap.dedent(content))
+
+    def test_second_load_is_a_cache_hit(self):
+        self._write("""
+            key: value
+            text: |
+                line1
+                line2
+        """)
+        before = shyaml.get_parse_cache_statistics()
+        first = shyaml.yaml_load(self.path)
+        second = shyaml.yaml_load(self.path)
+        after = shyaml.get_parse_cache_statistics()
+        self.assertEqual(first, second)
+        self.assertEqual(after['misses'] - before['misses'], 1)
+        self.assertEqual(after['hits'] - before['hits'], 1)
+
+    def test_changed_content_is_parsed_again(self):
+        self._write('key: old\n')
+        self.assertEqual(shyaml.yaml_load(self.path), {'key': 'old'})
+        self._write('key: new\n')
+        self.assertEqual(shyaml.yaml_load(self.path), {'key': 'new'})
+
+    def test_ordered_and_unordered_are_cached_separately(self):
+        self._write('b: 1\na: 2\n')
+        self.assertNotIsInstance(shyaml.yaml_load(self.path), OrderedDict)
+        result = shyaml.yaml_load(self.path, ordered=True)
+        self.assertIsInstance(result, OrderedDict)
+        self.assertEqual(list(result), ['b', 'a'])
+
+    def test_cached_result_is_a_copy(self):
+        self._write('key: [1, 2]\n')
+        shyaml.yaml_load(self.path)['key'].append(3)
+        self.assertEqual(shyaml.yaml_load(self.path), {'key': [1, 2]})
+
+    def test_prune_removes_cache_of_deleted_files(self):
+        self._write('key: value\n')
+        shyaml.yaml_load(self.path)
+        fd, other = tempfile.mkstemp(suffix='.yaml')
+        os.close(fd)
+        with open(other, 'w', encoding='utf-8') as f:
+            f.write('other: 1\n')
+        shyaml.yaml_load(other)
+        os.unlink(other)
+        with open(os.path.join(self.cache_dir, 'old.pickle'), 'wb') as f:
+            f.write(b'not a pickle')
+        open(os.path.join(self.cache_dir, 'x.pickle.tmp'), 'w').close()
+        self.assertEqual(shyaml.prune_parse_cache(), 3)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+        before = shyaml.get_parse_cache_statistics()
+        shyaml.yaml_load(self.path)
+        self.assertEqual(shyaml.get_parse_cache_statistics()['hits'] - before['hits'], 1)
+
+    def test_malformed_yaml_is_not_cached(self):
+        self._write('key: [unclosed bracket\n')
+        self.assertIsNone(shyaml.yaml_load(self.path))
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+
+class TestFastLoad(unittest.TestCase):
+    def test_same_result_as_safeloader(self):
+        data = textwrap.dedent("""
+            %YAML 1.1
+            ---
+            item:
+                type: bool
+                value: on
+                octal: 017
+                list: [a, 1, 2.5, null]
+                text: |
+                    line1
+                    line2
+        """)
+        for ordered in (False, True):
+            if ordered:
+                expected = shyaml._ordered_load(data, shyaml.yaml.SafeLoader)
+            else:
+                expected = shyaml.yaml.load(data, shyaml.yaml.SafeLoader)
+            self.assertEqual(shyaml._fast_load(data, ordered), expected)
+        self.assertIs(shyaml._fast_load(data)['item']['value'], True)
+
+
+@unittest.skipUnless(shyaml._CParser, 'ruamel.yaml.clib is not installed')
+class TestLibyamlParser(unittest.TestCase):
+    DATA = textwrap.dedent("""
+        %YAML 1.1
+        ---
+        item:
+            switch_on: on
+            switch_off: off
+            yes_no: [yes, no, y, n]
+            octal: 0755
+            sexagesimal: 1:30
+            literal: |
+                line1
+
+                line3
+            folded: >
+                folded
+                text
+
+                new paragraph
+            plain: multi
+                line plain
+            quoted: "quoted
+                multi-line"
+            keep: |+
+                keep trailing
+
+            strip: |-
+                strip
+    """)
+
+    def _python_load(self, data, ordered):
+        if ordered:
+            return shyaml._ordered_load(data, shyaml.yaml.SafeLoader)
+        return shyaml.yaml.load(data, shyaml.yaml.SafeLoader)
+
+    def test_libyaml_parser_is_used(self):
+        self.assertIs(shyaml.FastSafeLoader, shyaml._CSafeLoader)
+
+    def test_same_result_as_python_parser(self):
+        for data in (self.DATA, self.DATA.replace('%YAML 1.1\n---\n', '')):
+            for ordered in (False, True):
+                with self.subTest(directive=data.startswith('\n%YAML'), ordered=ordered):
+                    self.assertEqual(shyaml._fast_load(data, ordered), self._python_load(data, ordered))
+        result = shyaml._fast_load(self.DATA)['item']
+        self.assertIs(result['switch_on'], True)
+        self.assertIs(result['switch_off'], False)
+        self.assertEqual(result['octal'], 0o755)
+        self.assertEqual(result['literal'], 'line1\n\nline3\n')
+
+    def test_yaml_load_same_result_as_python_parser(self):
+        # yaml_load() doubles the newlines before parsing
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False, encoding='utf-8') as f:
+            f.write(self.DATA)
+        self.addCleanup(os.unlink, f.name)
+        for ordered in (False, True):
+            fast = shyaml.yaml_load(f.name, ordered=ordered)
+            with patch.object(shyaml, 'FastSafeLoader', shyaml.yaml.SafeLoader):
+                self.assertEqual(fast, shyaml.yaml_load(f.name, ordered=ordered))
+
+
 # ===========================================================================
 # yaml_load_fromstring
 # ===========================================================================
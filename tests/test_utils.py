@@ -23,7 +23,8 @@
 #########################################################################
 from . import common
 import unittest
-from lib.utils import Utils
+from unittest.mock import patch
+from lib.utils import Utils, get_mp_context
 
 
 # from wakeonlan import WakeOnLan
@@ -294,6 +295,13 @@ class LibUtilsTest(unittest.TestCase):
             )
         )
 
+    def test_get_mp_context(self):
+        # worker processes are never forked from the running process
+        with patch('multiprocessing.get_all_start_methods', return_value=['fork', 'spawn', 'forkserver']):
+            self.assertEqual(get_mp_context().get_start_method(), 'forkserver')
+        with patch('multiprocessing.get_all_start_methods', return_value=['spawn']):
+            self.assertEqual(get_mp_context().get_start_method(), 'spawn')
+
 
 if __name__ == '__main__':
     unittest.main(verbosity=2)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+"""
+Tests for modules/websocket/batching.py
+
+Coverage
+--------
+ItemUpdateBatcher:
+  updates of a client within the flush window are sent as one frame, per client,
+  the latest value of an item wins, window=0 sends every update immediately,
+  pending updates of a disconnected client are discarded,
+  the scheduled flush is kept referenced and runs after the window
+
+Websocket.get_update_statistics:
+  counters of the batchers of all payload protocols
+"""
+
+import asyncio
+import gc
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import tests.common as common
+
+common.register_shng_log_levels()
+
+from modules.websocket import Websocket
+from modules.websocket.batching import FRAME_OVERHEAD, ItemUpdateBatcher
+
+
+class _Sender:
+    def __init__(self):
+        self.frames = []
+
+    async def __call__(self, client_addr, websocket, items):
+        self.frames.append((client_addr, websocket, items))
+        return 10
+
+
+class TestItemUpdateBatcher(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.sender = _Sender()
+        self.batcher = ItemUpdateBatcher(self.sender, window=0.01)
+
+    async def test_updates_are_merged_per_client(self):
+        await self.batcher.add('c1', 'ws1', [['a', 1]])
+        await self.batcher.add('c2', 'ws2', [['a', 1]])
+        await self.batcher.add('c1', 'ws1', [['b', 2]])
+        self.assertEqual(self.sender.frames, [])
+        await self.batcher.flush()
+        self.assertEqual(sorted(self.sender.frames), [('c1', 'ws1', [['a', 1], ['b', 2]]), ('c2', 'ws2', [['a', 1]])])
+
+    async def test_latest_value_wins(self):
+        for value in range(5):
+            await self.batcher.add('c1', 'ws1', [['a', value]])
+        await self.batcher.flush()
+        self.assertEqual(self.sender.frames, [('c1', 'ws1', [['a', 4]])])
+
+    async def test_window_zero_sends_immediately(self):
+        self.batcher.window = 0
+        await self.batcher.add('c1', 'ws1', [['a', 1]])
+        await self.batcher.add('c1', 'ws1', [['a', 2]])
+        self.assertEqual(self.sender.frames, [('c1', 'ws1', [['a', 1]]), ('c1', 'ws1', [['a', 2]])])
+        self.assertIsNone(self.batcher._flush_task)
+
+    async def test_discard_on_disconnect(self):
+        await self.batcher.add('c1', 'ws1', [['a', 1]])
+        await self.batcher.add('c2', 'ws2', [['a', 1]])
+        self.batcher.discard('c1')
+        await self.batcher.flush()
+        self.assertEqual(self.sender.frames, [('c2', 'ws2', [['a', 1]])])
+
+    async def test_flush_runs_after_window(self):
+        await self.batcher.add('c1', 'ws1', [['a', 1]])
+        gc.collect()  # the scheduled flush must survive a garbage collection
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.sender.frames, [('c1', 'ws1', [['a', 1]])])
+        self.assertIsNone(self.batcher._flush_task)
+
+    async def test_explicit_flush_cancels_scheduled_flush(self):
+        await self.batcher.add('c1', 'ws1', [['a', 1]])
+        task = self.batcher._flush_task
+        await self.batcher.flush()
+        await asyncio.sleep(0.05)
+        self.assertTrue(task.cancelled())
+        self.assertEqual(len(self.sender.frames), 1)
+
+    async def test_statistics(self):
+        await self.batcher.add('c1', 'ws1', [['a', 1]])
+        await self.batcher.add('c1', 'ws1', [['a', 2]])
+        await self.batcher.add('c1', 'ws1', [['b', 3]])
+        await self.batcher.flush()
+        stats = self.batcher.get_statistics()
+        self.assertEqual((stats['updates'], stats['frames'], stats['frames_saved'], stats['bytes']), (3, 1, 2, 10))
+        self.assertEqual(stats['bytes_saved'], 2 * FRAME_OVERHEAD + len('["a", 1]') + 2)
+
+
+class TestGetUpdateStatistics(unittest.IsolatedAsyncioTestCase):
+    async def test_statistics_of_protocols(self):
+        batcher = ItemUpdateBatcher(_Sender(), window=0)
+        await batcher.add('c1', 'ws1', [['a', 1]])
+        protocol = type('Protocol', (), {})()
+        protocol.item_batcher = batcher
+        module = Websocket.__new__(Websocket)
+        module.protocols = {
+            '/sv': {'name': 'smartvisu', 'protocol': protocol},
+            '/other': {'name': 'other', 'protocol': object()},
+        }
+        self.assertEqual(
+            module.get_update_statistics(),
+            {'smartvisu': {'updates': 1, 'frames': 1, 'frames_saved': 0, 'bytes': 10, 'bytes_saved': 0}},
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+"""
+Tests for modules/websocket/series.py
+
+Coverage
+--------
+SeriesRegistry:
+  identical requests are queried once per cycle, different parameters are queried separately,
+  the start of the parameters is not part of the key,
+  results are reused until their update time, without update time only within the cycle,
+  outdated results are updated by querying only the points newer than their last point,
+  points that left the time window are dropped, results of series that are not subscribed any more are dropped
+
+last_timestamp:
+  timestamp of the last point of a series
+
+Protocol.update_series (smartvisu, admin):
+  clients with the same subscription share one incremental query and get the full series
+"""
+
+import logging
+import os
+import sys
+import threading
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import tests.common as common
+
+common.register_shng_log_levels()
+
+from modules.websocket.series import SeriesRegistry, last_timestamp
+import modules.websocket.admin as admin_protocol
+import modules.websocket.smartvisu as smartvisu_protocol
+
+NOW = datetime(2024, 1, 1, 12, 0, 0)
+PARAMS = {'item': 'a', 'func': 'avg', 'start': 1000, 'end': 'now', 'sid': 'a|avg|1h|now', 'update': True}
+
+
+class _Query:
+    def __init__(self, valid=60):
+        self.calls = 0
+        self.valid = valid
+
+    def __call__(self, **params):
+        self.calls += 1
+        return {
+            'series': [[params['start'] + 1, 1.0]],
+            'cmd': 'series',
+            'sid': params['sid'],
+            'update': NOW + timedelta(seconds=self.valid),
+            'params': dict(params, start=params['start'] + 1),
+        }
+
+
+class TestSeriesRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = SeriesRegistry()
+        self.query = _Query()
+        self.registry.next_cycle()
+
+    def test_identical_requests_queried_once(self):
+        replies = [self.registry.get(dict(PARAMS), NOW, self.query) for __ in range(3)]
+        self.assertEqual(self.query.calls, 1)
+        self.assertEqual(replies[0], replies[2])
+        stats = self.registry.get_statistics()
+        self.assertEqual((stats['cached'], stats['queries'], stats['shared']), (1, 1, 2))
+
+    def test_reply_is_a_copy(self):
+        first = self.registry.get(dict(PARAMS), NOW, self.query)
+        del first['update']
+        del first['params']
+        second = self.registry.get(dict(PARAMS), NOW, self.query)
+        self.assertIn('update', second)
+        self.assertIn('params', second)
+
+    def test_different_parameters_queried_separately(self):
+        self.registry.get(dict(PARAMS), NOW, self.query)
+        self.registry.get(dict(PARAMS, func='max', sid='a|max|1h|now'), NOW, self.query)
+        self.assertEqual(self.query.calls, 2)
+
+    def test_start_is_not_part_of_key(self):
+        self.assertEqual(self.registry.key(PARAMS), self.registry.key(dict(PARAMS, start=5000, update=False)))
+
+    def test_reused_until_update_time(self):
+        self.registry.get(dict(PARAMS), NOW, self.query)
+        later = NOW + timedelta(seconds=30)
+        self.registry.next_cycle()
+        self.registry.get(dict(PARAMS), later, self.query)
+        self.assertEqual(self.query.calls, 1)
+        expired = NOW + timedelta(seconds=61)
+        self.registry.next_cycle()
+        self.registry.get(dict(PARAMS), expired, self.query)
+        self.assertEqual(self.query.calls, 2)
+        stats = self.registry.get_statistics()
+        self.assertEqual((stats['queries'], stats['incremental'], stats['shared']), (1, 1, 1))
+
+    def test_without_update_time_only_within_cycle(self):
+        self.registry.get(dict(PARAMS), NOW, self.query, use_update_time=False)
+        self.registry.get(dict(PARAMS), NOW, self.query, use_update_time=False)
+        self.assertEqual(self.query.calls, 1)
+        self.registry.next_cycle()
+        self.registry.get(dict(PARAMS), NOW, self.query, use_update_time=False)
+        self.assertEqual(self.query.calls, 2)
+
+    def test_outdated_result_queries_only_new_points(self):
+        calls = []
+
+        def query(**params):
+            calls.append(params)
+            return {
+                'series': [[params['start'], 3.5], [40, 4.0], [50, 5.0]],
+                'cmd': 'series',
+                'sid': params['sid'],
+                'update': NOW + timedelta(seconds=120),
+                'params': dict(params, start=50),
+            }
+
+        self.registry.add(dict(PARAMS), {'series': [[0, 0.0], [10, 1.0], [30, 3.0]], 'update': NOW, 'sid': 's'})
+        self.registry.next_cycle()
+        reply = self.registry.get(dict(PARAMS), NOW, query)
+        self.assertEqual(calls, [dict(PARAMS, start=30, update=True)])
+        # the window of 30 is kept, the repeated point at the start of the query is not added again
+        self.assertEqual(reply['series'], [[30, 3.0], [40, 4.0], [50, 5.0]])
+        self.assertEqual(reply['update'], NOW + timedelta(seconds=120))
+        self.assertEqual(self.registry.get(dict(PARAMS), NOW, query)['series'], reply['series'])
+        self.assertEqual(len(calls), 1)
+
+    def test_add_keeps_existing_result(self):
+        self.registry.get(dict(PARAMS), NOW, self.query)
+        self.registry.add(dict(PARAMS, start=5000), {'series': [[1, 1.0]], 'update': NOW, 'sid': 's'})
+        self.assertEqual(self.registry.get(dict(PARAMS), NOW, self.query)['series'], [[1001, 1.0]])
+
+    def test_results_of_unsubscribed_series_are_dropped(self):
+        self.registry.get(dict(PARAMS), NOW, self.query)
+        self.registry.get(dict(PARAMS, sid='other'), NOW, self.query)
+        self.registry.next_cycle([dict(PARAMS, start=1001)])
+        self.assertEqual(self.registry.get_statistics()['cached'], 1)
+        self.registry.next_cycle()
+        self.assertEqual(self.registry.get_statistics()['cached'], 1)
+
+
+class TestLastTimestamp(unittest.TestCase):
+    def test_last_timestamp(self):
+        self.assertEqual(last_timestamp([[1, 1.0], [7, 2.0]]), 7)
+        self.assertIsNone(last_timestamp([]))
+        self.assertEqual(last_timestamp(None, 3), 3)
+
+
+class TestProtocolUpdateSeries(unittest.TestCase):
+    def _run(self, module, prefix):
+        protocol = module.Protocol.__new__(module.Protocol)
+        setattr(protocol, prefix + '_update_series', {})
+        protocol.logger = logging.getLogger(__name__)
+        protocol.shtime = MagicMock()
+        protocol.shtime.now.return_value = NOW
+        protocol._series_lock = threading.Lock()
+        protocol.series_registry = SeriesRegistry()
+        setattr(protocol, prefix + '_ser_upd_cycle', 0)
+        item = MagicMock()
+        item.series.side_effect = lambda **params: {
+            'series': [[params['start'], 2.0], [3, 3.0]],
+            'cmd': 'series',
+            'sid': 's',
+            'update': NOW + timedelta(seconds=60),
+            'params': dict(params, start=3),
+        }
+        protocol.items = MagicMock()
+        protocol.items.return_item.return_value = item
+        subscription = {'series': [[1, 1.0], [2, 2.0]], 'sid': 's', 'update': NOW - timedelta(seconds=1)}
+        for client_addr in ('client1', 'client2'):
+            protocol.set_periodic_series_updates(dict(subscription, params=dict(PARAMS)), client_addr)
+        protocol.series_registry.next_cycle()
+        replies = [protocol.update_series(client_addr) for client_addr in ('client1', 'client2')]
+        item.series.assert_called_once_with(**dict(PARAMS, start=2, update=True))
+        for reply in replies:
+            self.assertEqual(reply, [{'series': [[2, 2.0], [3, 3.0]], 'cmd': 'series', 'sid': 's'}])
+        # the subscription keeps its parameters
+        self.assertEqual(getattr(protocol, prefix + '_update_series')['client1']['s']['params'], PARAMS)
+
+    def test_smartvisu(self):
+        self._run(smartvisu_protocol, 'sv')
+
+    def test_admin(self):
+        self._run(admin_protocol, 'adm')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+"""
+Tests for modules/websocket/smartvisu.py
+
+Coverage
+--------
+Reverse index of monitored items (sv_item_index):
+  sv_index_monitor adds the items and properties a client monitors,
+  monitoring a new list replaces the entries of the client,
+  sv_unindex_monitor ('monitor' with no items) and sv_cancel_all_abos (disconnect) remove them
+
+Protocol.update_item:
+  updates reach only the clients that monitor the item (or one of its properties),
+  the client that changed the item gets no update of the item itself
+"""
+
+import logging
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import tests.common as common
+
+common.register_shng_log_levels()
+
+import modules.websocket.smartvisu as smartvisu_protocol
+from modules.websocket.batching import ItemUpdateBatcher
+
+
+class _Sender:
+    def __init__(self):
+        self.frames = []
+
+    async def __call__(self, client_addr, websocket, items):
+        self.frames.append((client_addr, items))
+        return 1
+
+
+class TestMonitorIndex(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        protocol = smartvisu_protocol.Protocol.__new__(smartvisu_protocol.Protocol)
+        protocol.logger = logging.getLogger(__name__)
+        protocol.sv_monitor_items = {}
+        protocol.sv_item_index = {}
+        protocol.sv_monitor_logs = {}
+        protocol.sv_update_series = {}
+        protocol.sv_clients = {addr: {'websocket': 'ws-' + addr} for addr in ('c1', 'c2', 'c3')}
+        protocol.build_log_info = lambda client_addr: client_addr
+        self.sender = _Sender()
+        protocol.item_batcher = ItemUpdateBatcher(self.sender, window=0)
+        item = MagicMock()
+        item.property = SimpleNamespace(last_change='yesterday')
+        protocol.items = MagicMock()
+        protocol.items.return_item.return_value = item
+        self.protocol = protocol
+
+    def _monitor(self, client_addr, paths):
+        self.protocol.sv_index_monitor(client_addr, paths)
+        self.protocol.sv_monitor_items[client_addr] = paths
+
+    async def _update(self, item_name, value=1, source=None):
+        self.sender.frames = []
+        await self.protocol.update_item(item_name, value, source)
+        return sorted(self.sender.frames)
+
+    def test_monitor(self):
+        self._monitor('c1', ['a', 'b.property.last_change'])
+        self._monitor('c2', ['a'])
+        self.assertEqual(
+            self.protocol.sv_item_index,
+            {'a': {'c1': [('a', None)], 'c2': [('a', None)]}, 'b': {'c1': [('b.property.last_change', 'last_change')]}},
+        )
+
+    async def test_updates_reach_only_indexed_clients(self):
+        self._monitor('c1', ['a', 'b.property.last_change'])
+        self._monitor('c2', ['a'])
+        self.assertEqual(await self._update('a', 5), [('c1', [['a', 5]]), ('c2', [['a', 5]])])
+        self.assertEqual(await self._update('b', 6), [('c1', [['b.property.last_change', 'yesterday']])])
+        self.assertEqual(await self._update('c'), [])
+
+    async def test_source_client_gets_no_update_of_the_item(self):
+        self._monitor('c1', ['a'])
+        self._monitor('c2', ['a'])
+        self.assertEqual(await self._update('a', 5, source='c1'), [('c2', [['a', 5]])])
+
+    async def test_remonitor_replaces_entries(self):
+        self._monitor('c1', ['a', 'b'])
+        self._monitor('c1', ['b', 'c'])
+        self.assertEqual(sorted(self.protocol.sv_item_index), ['b', 'c'])
+        self.assertEqual(await self._update('a'), [])
+        self.assertEqual(await self._update('c', 2), [('c1', [['c', 2]])])
+
+    async def test_unmonitor(self):
+        self._monitor('c1', ['a'])
+        self._monitor('c2', ['a'])
+        # 'monitor' command with items [None]
+        self.protocol.sv_unindex_monitor('c1')
+        self.protocol.sv_monitor_items['c1'] = []
+        self.assertEqual(self.protocol.sv_item_index, {'a': {'c2': [('a', None)]}})
+        self.assertEqual(await self._update('a', 3), [('c2', [['a', 3]])])
+
+    async def test_disconnect(self):
+        self._monitor('c1', ['a', 'b'])
+        self._monitor('c2', ['b'])
+        self.protocol.sv_cancel_all_abos('c1')
+        self.assertEqual(self.protocol.sv_item_index, {'b': {'c2': [('b', None)]}})
+        self.assertNotIn('c1', self.protocol.sv_monitor_items)
+        self.assertEqual(await self._update('a'), [])
+        self.assertEqual(await self._update('b', 4), [('c2', [['b', 4]])])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+#########################################################################
+#  Copyright 2016-       Martin Sinn                         m.sinn@gmx.de
+#########################################################################
+#  This file is part of SmartHomeNG
+#  https://github.com/smarthomeNG/smarthome
+#  http://knx-user-forum.de/
+#
+#  SmartHomeNG is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SmartHomeNG is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SmartHomeNG. If not, see <http://www.gnu.org/licenses/>.
+#########################################################################
+
+"""
+Compare the time needed to load the item files at startup in the main process
+and with worker processes (``item_parse_workers`` in etc/smarthome.yaml).
+
+The cache of parsed yaml files is not used, so every file is parsed. Both
+results are compared and have to be identical.
+
+    python3 tools/benchmark_item_parsing.py                      # generated item files
+    python3 tools/benchmark_item_parsing.py --items-dir items    # existing item files
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+BASE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE)
+
+import lib.config  # noqa: E402
+
+
+def generate(items_dir, files, items):
+    for f in range(files):
+        with open(os.path.join(items_dir, f'floor{f}.yaml'), 'w', encoding='utf-8') as fp:
+            fp.write(f'floor{f}:\n')
+            for i in range(items):
+                fp.write(
+                    f'    room{i}:\n'
+                    f'        name: Room {i} on floor {f}\n'
+                    f'        light:\n'
+                    f'            type: bool\n'
+                    f'            cache: yes\n'
+                    f'            enforce_updates: yes\n'
+                    f'            dimmer:\n'
+                    f'                type: num\n'
+                    f'                eval: value * 2.55\n'
+                    f'                eval_trigger: floor{f}.room{i}.light\n'
+                    f'        temperature:\n'
+                    f'            type: num\n'
+                    f'            database: init\n'
+                    f'            visu_acl: ro\n'
+                )
+
+
+def load(items_dir, workers):
+    start = time.perf_counter()
+    item_conf = lib.config.parse_itemsdir(items_dir, None, addfilenames=True, workers=workers)
+    return item_conf, time.perf_counter() - start
+
+
+def benchmark(items_dir, workers):
+    items_dir = os.path.join(items_dir, '')
+    files = len([name for name in os.listdir(items_dir) if name.endswith('.yaml')])
+    sequential, sequential_time = load(items_dir, 1)
+    parallel, parallel_time = load(items_dir, workers)
+
+    print(f'{files} item files, {os.cpu_count()} cpus')
+    print(f'main process:    loaded in {sequential_time * 1000:8.1f} ms')
+    print(f'{workers:2} workers:      loaded in {parallel_time * 1000:8.1f} ms')
+    if repr(sequential) != repr(parallel):
+        print('ERROR: the results differ')
+        sys.exit(1)
+    print('results are identical')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare loading item files with and without worker processes')
+    parser.add_argument(
+        '--items-dir', action='store', help='directory with item files (default: generated files)', metavar='dir'
+    )
+    parser.add_argument(
+        '--files', action='store', type=int, default=200, help='number of generated item files (default: 200)'
+    )
+    parser.add_argument(
+        '--items', action='store', type=int, default=25, help='number of rooms per generated file (default: 25)'
+    )
+    parser.add_argument(
+        '--workers',
+        action='store',
+        type=int,
+        default=os.cpu_count() or 1,
+        help='number of worker processes (default: number of cpus)',
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    lib.config.PARALLEL_MIN_FILES = 2
+
+    if args.items_dir:
+        benchmark(args.items_dir, args.workers)
+    else:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            generate(tmpdir, args.files, args.items)
+            benchmark(tmpdir, args.workers)
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+#########################################################################
+#  Copyright 2016-       Martin Sinn                         m.sinn@gmx.de
+#########################################################################
+#  This file is part of SmartHomeNG
+#  https://github.com/smarthomeNG/smarthome
+#  http://knx-user-forum.de/
+#
+#  SmartHomeNG is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SmartHomeNG is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SmartHomeNG. If not, see <http://www.gnu.org/licenses/>.
+#########################################################################
+
+"""
+Measure the latency of item updates while a CPU-heavy logic runs in the thread
+pool of the scheduler (``executor: thread``) and in a worker process
+(``executor: process``).
+
+An updater thread sets an item every few milliseconds and measures how late
+each update is finished. The logic fits a polynomial in pure Python and reads
+and writes items through the proxy protocol when it runs in a worker process.
+
+    python3 tools/benchmark_logic_executor.py
+    python3 tools/benchmark_logic_executor.py --seconds 5 --interval 2
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+BASE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE)
+
+from lib.logic_process import LogicProcessPool  # noqa: E402
+
+LOGIC = """
+import random
+
+def fit(points, degree):
+    # least squares fit with the normal equations, solved by gaussian elimination
+    n = degree + 1
+    a = [[sum(x ** (i + j) for x, __ in points) for j in range(n)] for i in range(n)]
+    b = [sum(y * x ** i for x, y in points) for i in range(n)]
+    for col in range(n):
+        for row in range(col + 1, n):
+            f = a[row][col] / a[col][col]
+            for k in range(col, n):
+                a[row][k] -= f * a[col][k]
+            b[row] -= f * b[col]
+    coef = [0.0] * n
+    for i in reversed(range(n)):
+        coef[i] = (b[i] - sum(a[i][k] * coef[k] for k in range(i + 1, n))) / a[i][i]
+    return coef
+
+rnd = random.Random(1)
+peak = sh.pv.peak()
+end = time.perf_counter() + trigger['value']
+fits = 0
+while time.perf_counter() < end:
+    points = [(x / 100, peak * (x / 100) * (1 - x / 100) + rnd.random()) for x in range(100)]
+    fit(points, 4)
+    fits += 1
+sh.pv.fits(fits)
+"""
+
+
+class _Item:
+    def __init__(self, value):
+        self.value = value
+
+    def __call__(self, value=None, caller='Logic', source=None):
+        if value is None:
+            return self.value
+        self.value = value
+
+
+class _Items:
+    def __init__(self):
+        self.items = {'pv.peak': _Item(5.0), 'pv.fits': _Item(0), 'sensor.value': _Item(0)}
+
+    def return_item(self, path):
+        return self.items.get(path)
+
+
+class _ItemsAttr:
+    """sh.<path> access to the items for the logic run in a thread"""
+
+    def __init__(self, items, path=''):
+        self._items = items
+        self._path = path
+
+    def __getattr__(self, name):
+        return _ItemsAttr(self._items, self._path + '.' + name if self._path else name)
+
+    def __call__(self, *args):
+        return self._items.return_item(self._path)(*args)
+
+
+def updater(items, interval, stop, latencies):
+    """
+    Set an item every *interval* seconds, record how late each update was finished
+    """
+    item = items.return_item('sensor.value')
+    due = time.perf_counter() + interval
+    while not stop.is_set():
+        time.sleep(max(due - time.perf_counter(), 0))
+        for i in range(200):
+            item(i)  # stands in for the processing of an item update
+        latencies.append(time.perf_counter() - due)
+        due += interval
+
+
+def measure(name, run_logic, items, seconds, interval):
+    latencies = []
+    stop = threading.Event()
+    thread = threading.Thread(target=updater, args=(items, interval, stop, latencies))
+    thread.start()
+    start = time.perf_counter()
+    if run_logic is None:
+        time.sleep(seconds)
+    else:
+        run_logic(seconds)
+    duration = time.perf_counter() - start
+    stop.set()
+    thread.join()
+    latencies.sort()
+    ms = [value * 1000 for value in latencies]
+    p95 = ms[int(len(ms) * 0.95)]
+    print(
+        f'{name:16} logic {duration:5.2f} s  updates {len(ms):5}  '
+        f'latency median {statistics.median(ms):7.2f} ms  p95 {p95:7.2f} ms  max {ms[-1]:7.2f} ms'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Item update latency while a CPU-heavy logic runs')
+    parser.add_argument('--seconds', type=float, default=3, help='run time of the logic (default: 3)')
+    parser.add_argument('--interval', type=float, default=5, help='interval of the item updates in ms (default: 5)')
+    args = parser.parse_args()
+    interval = args.interval / 1000
+
+    items = _Items()
+    code = compile(LOGIC, 'benchmark_logic', 'exec')
+    pool = LogicProcessPool(1)
+    pool.run('benchmark', compile('pass', 'warmup', 'exec'), {}, items)  # start the worker
+
+    def in_thread(seconds):
+        logic_globals = {'sh': _ItemsAttr(items), 'trigger': {'value': seconds}, 'time': time}
+        exec(code, logic_globals)
+
+    def in_process(seconds):
+        status, message = pool.run('benchmark', code, {'value': seconds}, items)
+        if status != 'ok':
+            print(f'logic failed: {message}')
+
+    print(f'{os.cpu_count()} cpus, item update every {args.interval} ms')
+    measure('no logic', None, items, args.seconds, interval)
+    measure('executor thread', in_thread, items, args.seconds, interval)
+    measure('executor process', in_process, items, args.seconds, interval)
+    print(f'fits in the worker process: {items.return_item("pv.fits")()}')
+    pool.stop()
+
+
+if __name__ == '__main__':
+    main()
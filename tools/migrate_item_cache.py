@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+#########################################################################
+# Copyright 2016-       Martin Sinn                         m.sinn@gmx.de
+#########################################################################
+#  This file is part of SmartHomeNG
+#  https://github.com/smarthomeNG/smarthome
+#  http://knx-user-forum.de/
+#
+#  SmartHomeNG is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SmartHomeNG is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SmartHomeNG. If not, see <http://www.gnu.org/licenses/>.
+#########################################################################
+
+"""
+Migrate the item cache from one file per item (var/cache/<item path>) to
+the single SQLite store that is used with ``item_cache_store: sqlite`` in
+etc/smarthome.yaml, and compare the time needed to load the cache at startup.
+
+Stop SmartHomeNG before migrating. The cache files are not deleted.
+
+    python3 tools/migrate_item_cache.py              # migrate var/cache to var/db/item_cache.db
+    python3 tools/migrate_item_cache.py --benchmark  # compare load times of both layouts
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BASE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE)
+
+import dateutil.tz  # noqa: E402
+
+from lib.constants import CACHE_FORMAT, CACHE_JSON, CACHE_PICKLE  # noqa: E402
+from lib.item.helpers import CACHE_STORE_FILENAME, SQLiteCacheStore, cache_read, cache_write, migrate_cache_files  # noqa: E402
+
+
+def migrate(cache_dir, db_file, cformat):
+    os.makedirs(os.path.dirname(db_file), exist_ok=True)
+    store = SQLiteCacheStore(db_file)
+    count, failed = migrate_cache_files(cache_dir, store, cformat)
+    print(f'{count} cached values migrated to {store.filename}')
+    for name in failed:
+        print(f'  could not read {name} - skipped')
+    if count:
+        print("Set 'item_cache_store: sqlite' in etc/smarthome.yaml to use the new store")
+
+
+def load_files(cache_dir, tz, cformat):
+    names = [entry.path for entry in os.scandir(cache_dir) if entry.is_file() and entry.name != CACHE_STORE_FILENAME]
+    start = time.perf_counter()
+    for name in names:
+        try:
+            cache_read(name, tz, cformat)
+        except Exception:
+            pass
+    return len(names), time.perf_counter() - start
+
+
+def load_store(store, names, tz):
+    start = time.perf_counter()
+    store.preload()
+    for name in names:
+        store.read(name, tz)
+    store.release_preloaded()
+    return len(names), time.perf_counter() - start
+
+
+def benchmark(cache_dir, count, cformat):
+    """
+    Compare loading all cached values from single files and from the SQLite store
+
+    If *count* is given, a temporary cache with that many items is generated,
+    otherwise the existing cache in *cache_dir* is used.
+    """
+    tz = dateutil.tz.tzlocal()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        if count:
+            cache_dir = tmpdir
+            for i in range(count):
+                cache_write(os.path.join(cache_dir, f'bench.room{i // 100}.value{i}'), i * 1.5, cformat)
+        store = SQLiteCacheStore(os.path.join(tmpdir, CACHE_STORE_FILENAME))
+        migrated, __ = migrate_cache_files(cache_dir, store, cformat)
+        names = [name for name in os.listdir(cache_dir) if name != CACHE_STORE_FILENAME]
+
+        files, files_time = load_files(cache_dir, tz, cformat)
+        __, store_time = load_store(store, names[:migrated], tz)
+
+    print(f'cache files:  {files:6} values loaded in {files_time * 1000:8.1f} ms')
+    print(f'sqlite store: {migrated:6} values loaded in {store_time * 1000:8.1f} ms')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Migrate the item cache to a single SQLite store')
+    parser.add_argument(
+        '--cache-dir',
+        action='store',
+        help='cache directory (default: var/cache)',
+        metavar='dir',
+        default=os.path.join(BASE, 'var', 'cache'),
+    )
+    parser.add_argument(
+        '--db',
+        action='store',
+        help=f'database of the sqlite store (default: var/db/{CACHE_STORE_FILENAME})',
+        metavar='file',
+        default=os.path.join(BASE, 'var', 'db', CACHE_STORE_FILENAME),
+    )
+    parser.add_argument(
+        '--format',
+        action='store',
+        choices=[CACHE_PICKLE, CACHE_JSON],
+        default=CACHE_FORMAT,
+        help=f'format of the cache files (default: {CACHE_FORMAT})',
+    )
+    parser.add_argument(
+        '--benchmark', action='store_true', help='compare load times of cache files and sqlite store, no migration'
+    )
+    parser.add_argument(
+        '--items',
+        action='store',
+        type=int,
+        default=0,
+        help='benchmark with this number of generated items instead of the existing cache',
+        metavar='n',
+    )
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.cache_dir, args.items, args.format)
+    elif not os.path.isdir(args.cache_dir):
+        print(f'Cache directory {args.cache_dir} not found')
+        sys.exit(1)
+    else:
+        migrate(args.cache_dir, args.db, args.format)